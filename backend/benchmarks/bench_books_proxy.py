@@ -0,0 +1,81 @@
+"""Proxy Google Books face à un faux Google local qui simule la latence réseau.
+
+Usage : python benchmarks/bench_books_proxy.py [latence_amont_ms]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from books_proxy import BooksCache  # noqa: E402
+
+# Réponse de taille réaliste : une page de 40 volumes avec descriptions
+PAYLOAD = json.dumps({"totalItems": 40, "items": [
+    {"id": f"vol{i}", "volumeInfo": {"title": f"Livre {i}", "description": "x" * 2000}} for i in range(40)
+]}).encode()
+
+
+class FixtureGoogleBooks(BaseHTTPRequestHandler):
+    hits = 0
+    delay = 0.15
+
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn, runs: int) -> list:
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+
+def main():
+    FixtureGoogleBooks.delay = (float(sys.argv[1]) if len(sys.argv) > 1 else 150) / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureGoogleBooks)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cache = BooksCache(
+        upstream_url=f"http://127.0.0.1:{server.server_port}/volumes",
+        path=os.path.join(tempfile.mkdtemp(), "books_cache.db"),
+        memory_entries=5,
+    )
+
+    for label, fn, runs in (
+        ("amont (MISS)", lambda i: cache.get({"q": f"miss {i}"}), 20),
+        ("LRU mémoire (HIT)", lambda i: cache.get({"q": "miss 19"}), 2000),
+        ("SQLite disque (HIT)", lambda i: cache.get({"q": f"miss {i % 20}"}), 2000),
+    ):
+        timings = timed(fn, runs)
+        print(f"{label:<22} p50 = {statistics.median(timings):8.3f} ms   p99 = {timings[int(len(timings) * 0.99) - 1]:8.3f} ms")
+
+    FixtureGoogleBooks.hits = 0
+    threads = [threading.Thread(target=cache.get, args=({"q": "populaire"},)) for _ in range(50)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"50 requêtes identiques simultanées : {FixtureGoogleBooks.hits} appel amont, "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms au total")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Taille et temps CPU de la compression gzip / brotli sur des réponses représentatives.
+
+Usage : python benchmarks/bench_compression.py
+"""
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import brotli  # noqa: E402
+
+
+def library_page(count: int) -> bytes:
+    random.seed(1)
+    items = [
+        {"id": i, "user_id": 7, "oeuvre_id": i, "title": f"Titre du livre numéro {i}",
+         "authors": [random.choice(["Victor Hugo", "Émile Zola", "George Sand", "Albert Camus"])],
+         "cover_url": f"https://books.google.com/books/content?id=vol{i:06d}&printsec=frontcover&img=1",
+         "info_link": f"https://books.google.fr/books?id=vol{i:06d}", "description": None,
+         "source": "google_books", "source_id": f"vol{i:06d}", "isbn": f"978{i:010d}",
+         "created_at": "2026-03-01T12:00:00"}
+        for i in range(count)
+    ]
+    return json.dumps({"items": items, "total": count, "page": 1, "page_size": count,
+                       "total_pages": 1, "next_cursor": None}).encode()
+
+
+def users_cities(users: int) -> bytes:
+    random.seed(2)
+    cities = {}
+    for i in range(users):
+        city = random.choice(["Paris", "Lyon", "Marseille", "Lille", "Nantes", "Bordeaux"])
+        cities.setdefault(city, []).append({"ID": i, "Name": f"Nom{i}", "Surname": f"Prénom{i}",
+                                            "books": [f"vol{random.randrange(5000):06d}" for _ in range(3)]})
+    return json.dumps({"version": 12, "cities": cities, "coordinates": {}}).encode()
+
+
+def message_history(count: int) -> bytes:
+    random.seed(3)
+    words = "bonjour livre échange merci demain possible rendez-vous gare samedi parfait".split()
+    rows = [{"id": i, "id_emprunt": 4, "id_sender": 1 + i % 2, "is_read": 1,
+             "message_text": " ".join(random.choice(words) for _ in range(12)),
+             "datetime": "2026-03-01T12:00:00", "sender_name": "Jean", "sender_surname": "Dupont",
+             "message_metadata": None} for i in range(count)]
+    return json.dumps(rows).encode()
+
+
+def codecs():
+    yield "gzip-1", lambda body: zlib.compress(body, 1)
+    yield "gzip-6", lambda body: zlib.compress(body, 6)
+    yield "gzip-9", lambda body: zlib.compress(body, 9)
+    if brotli is not None:
+        for quality in (1, 4, 5, 9, 11):
+            yield f"br-{quality}", lambda body, q=quality: brotli.compress(body, quality=q)
+
+
+def measure(codec, body: bytes):
+    runs = 3
+    start = time.perf_counter()
+    for _ in range(runs):
+        size = len(codec(body))
+    return size, (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    payloads = [
+        ("bibliothèque 10 000 livres", library_page(10_000)),
+        ("users-cities 5 000 utilisateurs", users_cities(5_000)),
+        ("historique 2 000 messages", message_history(2_000)),
+    ]
+    for label, body in payloads:
+        print(f"\n{label} : {len(body) / 1024:.0f} Ko")
+        for name, codec in codecs():
+            size, elapsed = measure(codec, body)
+            print(f"  {name:<7} {size / 1024:8.1f} Ko  ratio {len(body) / size:5.1f}  {elapsed:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
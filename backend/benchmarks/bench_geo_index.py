@@ -0,0 +1,74 @@
+"""Recherche des propriétaires les plus proches et agrégats de carte sur un index synthétique.
+
+Usage : python benchmarks/bench_geo_index.py [nb_utilisateurs]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_index import GeoIndex, book_keys  # noqa: E402
+
+FRANCE_BBOX = (42.3, 51.0, -4.8, 8.2)
+
+
+def build_index(nb_users: int, books_per_user: int = 5, nb_books: int = 20000) -> GeoIndex:
+    random.seed(42)
+    index = GeoIndex()
+    row_id = 0
+    popular = book_keys("Le Petit Prince", "popular")
+    for user_id in range(1, nb_users + 1):
+        lat = random.uniform(FRANCE_BBOX[0], FRANCE_BBOX[1])
+        lon = random.uniform(FRANCE_BBOX[2], FRANCE_BBOX[3])
+        index.set_point(user_id, (lat, lon), f"Ville {user_id % 500}")
+        for _ in range(books_per_user):
+            row_id += 1
+            title = f"Livre {random.randrange(nb_books)}"
+            index.add_row(row_id, user_id, book_keys(title), title)
+        if user_id % 3 == 0:
+            row_id += 1
+            index.add_row(row_id, user_id, popular)
+    return index
+
+
+def measure(index: GeoIndex, keys, runs: int = 200) -> list:
+    timings = []
+    for _ in range(runs):
+        lat = random.uniform(FRANCE_BBOX[0], FRANCE_BBOX[1])
+        lon = random.uniform(FRANCE_BBOX[2], FRANCE_BBOX[3])
+        start = time.perf_counter()
+        index.nearest(keys, lat, lon, k=10)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    nb_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    start = time.perf_counter()
+    index = build_index(nb_users)
+    print(f"Index de {nb_users} utilisateurs construit en {time.perf_counter() - start:.1f} s")
+
+    for label, keys in (
+        ("livre rare (~25 propriétaires)", book_keys("Livre 42")),
+        (f"livre populaire (~{nb_users // 3} propriétaires)", book_keys("Le Petit Prince", "popular")),
+    ):
+        timings = sorted(measure(index, keys))
+        p50 = statistics.median(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        print(f"{label:<45} p50 = {p50:.2f} ms   p99 = {p99:.2f} ms")
+
+    for zoom in (6, 9, 12):
+        timings = []
+        for _ in range(50):
+            start = time.perf_counter()
+            clusters = index.clusters(FRANCE_BBOX[0], FRANCE_BBOX[2], FRANCE_BBOX[1], FRANCE_BBOX[3], zoom)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{'clusters France zoom ' + str(zoom):<45} p50 = {statistics.median(timings):.2f} ms   "
+              f"{len(clusters)} clusters")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Recherche du catalogue : LIKE '%q%' (ancienne route), FTS5 et index inversé en mémoire.
+
+Usage : python benchmarks/bench_search.py [nb_livres]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+from models import Livre  # noqa: E402
+from search import SearchIndex, _fts_search, tokenize  # noqa: E402
+
+WORDS = (
+    "le la les du de des un une nuit jour prince petit grand mer terre ciel guerre paix amour "
+    "mort vie rouge noir blanc temps perdu histoire secret maison jardin voyage étranger peste "
+    "misérables château forêt rivière montagne étoile soleil lune enfant femme homme roi reine"
+).split()
+AUTHORS = ["Victor Hugo", "Émile Zola", "Albert Camus", "Marcel Proust", "George Sand", "Jules Verne"]
+GENRES = ["Roman", "Poésie", "Essai", "Conte", "Théâtre", "Policier", "Science-fiction"]
+QUERIES = ["prince", "miserables", "chateau foret", "hugo", "etr", "zola nuit", "livre123"]
+
+
+def populate(engine, nb_livres: int) -> None:
+    random.seed(42)
+    rows = []
+    for i in range(1, nb_livres + 1):
+        title = " ".join(random.choice(WORDS) for _ in range(random.randint(2, 6)))
+        rows.append((f"{title} livre{i % 50000}", random.choice(AUTHORS), random.choice(GENRES)))
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO Livre (Nom, Auteur, Genre) VALUES (?, ?, ?)", rows)
+
+
+def like(db, query: str) -> int:
+    livres = db.query(Livre.id).filter(
+        (Livre.nom.like(f"%{query}%")) |
+        (Livre.auteur.like(f"%{query}%")) |
+        (Livre.genre.like(f"%{query}%"))
+    ).all()
+    return len(livres)
+
+
+def report(label: str, fn, runs: int) -> None:
+    timings = []
+    for _ in range(runs):
+        for query in QUERIES:
+            start = time.perf_counter()
+            fn(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(f"{label:<20} p50 = {statistics.median(timings):8.2f} ms   p99 = {p99:8.2f} ms")
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    populate(engine, nb_livres)
+    print(f"{nb_livres} livres insérés (triggers FTS5 compris) en {time.perf_counter() - start:.1f} s")
+
+    db = sessionmaker(bind=engine)()
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.ensure_loaded(db)
+    print(f"Index en mémoire construit en {time.perf_counter() - start:.1f} s")
+
+    report("LIKE '%q%'", lambda query: like(db, query), runs=3)
+    report("FTS5 (page 1)", lambda query: _fts_search(db, tokenize(query), 0, 10), runs=20)
+    report("mémoire (page 1)", lambda query: index.search(tokenize(query), 0, 10), runs=20)
+    db.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
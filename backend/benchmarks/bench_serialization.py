@@ -0,0 +1,47 @@
+"""Coût de sérialisation d'une liste de 10 000 messages selon le chemin emprunté.
+
+Usage : python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from fast_json import dumps, orjson  # noqa: E402
+from schemas import MessageWithSender, MessagesWithSenderAdapter  # noqa: E402
+
+
+def rows(count: int):
+    return [{"id_emprunt": 4, "message_text": f"Bonjour, le livre est-il toujours disponible ? ({i})",
+             "id": i, "id_sender": 1 + i % 2, "datetime": datetime(2026, 3, 1, 12, 0, i % 60),
+             "is_read": 1, "message_metadata": None, "sender_name": "Jean", "sender_surname": "Dupont"}
+            for i in range(count)]
+
+
+def measure(label: str, fn, runs: int = 5):
+    fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        size = len(fn())
+    print(f"  {label:<48} {(time.perf_counter() - start) / runs * 1000:8.1f} ms  {size / 1024:6.0f} Ko")
+
+
+def main():
+    data = rows(10_000)
+    print(f"10 000 messages (orjson {'disponible' if orjson is not None else 'absent'})")
+    measure("modèles + jsonable_encoder + json.dumps",
+            lambda: json.dumps(jsonable_encoder([MessageWithSender(**row) for row in data])).encode())
+    measure("modèles + TypeAdapter.dump_json (response_model)",
+            lambda: MessagesWithSenderAdapter.dump_json([MessageWithSender(**row) for row in data]))
+    measure("dictionnaires + validate_python + dump_json",
+            lambda: MessagesWithSenderAdapter.dump_json(MessagesWithSenderAdapter.validate_python(data)))
+    measure("dictionnaires + fast_json.dumps", lambda: dumps(data))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Mémoire de pointe d'une liste JSON construite en entier ou encodée en flux.
+
+Usage : python benchmarks/bench_streaming.py [nb_utilisateurs_max]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+from models import User  # noqa: E402
+from schemas import User as UserSchema  # noqa: E402
+from streaming import stream_json_list  # noqa: E402
+
+
+def populate(session, count: int) -> None:
+    rows = [
+        {"name": f"Nom{i}", "surname": f"Prénom{i}", "email": f"user{i}@test.com", "mdp": "x" * 60,
+         "villes": "Lyon", "age": 30, "role": "Pauvre", "signalement": i % 7,
+         "liste_livres": [{"titre": f"Livre {j}"} for j in range(5)]}
+        for i in range(count)
+    ]
+    session.execute(insert(User), rows)
+    session.commit()
+
+
+def full_list(session) -> int:
+    users = session.query(User).order_by(User.id).all()
+    payload = json.dumps([UserSchema.model_validate(user).model_dump(mode="json") for user in users])
+    return len(payload)
+
+
+def streamed(session) -> int:
+    response = stream_json_list(session.query(User).order_by(User.id), UserSchema)
+
+    async def consume():
+        size = 0
+        async for chunk in response.body_iterator:
+            size += len(chunk)
+        return size
+
+    return asyncio.run(consume())
+
+
+def measure(fn, session):
+    session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(session)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak / 1024 / 1024, elapsed
+
+
+def main():
+    maximum = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    for count in (maximum // 10, maximum // 2, maximum):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        populate(session, count)
+        for label, fn in (("liste complète", full_list), ("flux", streamed)):
+            size, peak, elapsed = measure(fn, session)
+            print(f"{count:>7} utilisateurs  {label:<15} pic = {peak:7.1f} Mo   "
+                  f"{size / 1024 / 1024:6.1f} Mo de JSON en {elapsed:.2f} s")
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
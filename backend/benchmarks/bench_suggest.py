@@ -0,0 +1,72 @@
+"""Autocomplétion sur des titres et auteurs synthétiques.
+
+Usage : python benchmarks/bench_suggest.py [nb_exemplaires] [nb_titres_distincts]
+"""
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_trigram import make_title, vocabulary  # noqa: E402
+from suggest import SuggestIndex  # noqa: E402
+
+
+def main():
+    nb_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    nb_titles = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    random.seed(42)
+    words = vocabulary()
+    random.shuffle(words)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    titles = list({make_title(words, cum_weights) for _ in range(nb_titles)})
+    authors = [f"{random.choice(words).title()} {random.choice(words).title()}" for _ in range(20000)]
+
+    index = SuggestIndex()
+    index.version = 0
+    start = time.perf_counter()
+    for row_id in range(nb_rows):
+        # Quelques titres très possédés, une longue traîne d'exemplaires uniques
+        title = titles[min(int(random.paretovariate(0.8)), len(titles)) - 1] if random.random() < 0.5 \
+            else random.choice(titles)
+        index.add_row("perso", row_id, title, [random.choice(authors)])
+    print(f"{nb_rows} exemplaires ({len(index.weights)} titres et auteurs) indexés en "
+          f"{time.perf_counter() - start:.1f} s")
+
+    queries = []
+    for _ in range(2000):
+        text = random.choice(titles + authors)
+        queries.append(text[:random.randint(1, min(12, len(text)))])
+    for query in queries:
+        index.suggest(query)
+
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.suggest(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"suggest() p50 = {statistics.median(timings):.3f} ms   p99 = {timings[int(len(timings) * 0.99) - 1]:.3f} ms"
+          f"   ({len(index.top)} préfixes en cache)")
+
+    start = time.perf_counter()
+    for row_id in range(nb_rows, nb_rows + 5000):
+        index.add_row("perso", row_id, random.choice(titles), [random.choice(authors)])
+        index.remove_row("perso", row_id - nb_rows)
+    print(f"écriture incrémentale : {(time.perf_counter() - start) / 5000 * 1000:.3f} ms par ajout + retrait")
+
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.suggest(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"après écritures : p50 = {statistics.median(timings):.3f} ms   "
+          f"p99 = {timings[int(len(timings) * 0.99) - 1]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Recherche de titres proches (trigrammes) sur des bibliothèques synthétiques.
+
+Usage : python benchmarks/bench_trigram.py [nb_exemplaires] [nb_titres_distincts]
+"""
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gazetteer import get_cities  # noqa: E402
+from normalization import normalize_text  # noqa: E402
+from trigram_index import TrigramIndex, trigrams  # noqa: E402
+
+STOP_WORDS = "le la les du de des un une et au aux".split()
+
+
+def vocabulary() -> list:
+    # Les noms de communes du référentiel donnent un vocabulaire français réaliste
+    words = set()
+    for city in get_cities().values():
+        words.update(word for word in normalize_text(city.name).split() if len(word) > 2)
+    return sorted(words)
+
+
+def make_title(words: list, cum_weights: list) -> str:
+    # Mots pleins tirés selon une loi de Zipf, entrecoupés de mots vides
+    parts = []
+    for word in random.choices(words, cum_weights=cum_weights, k=random.randint(2, 5)):
+        if random.random() < 0.3:
+            parts.append(random.choice(STOP_WORDS))
+        parts.append(word)
+    return " ".join(parts)
+
+
+def typo(title: str) -> str:
+    # Une lettre supprimée et une lettre doublée, comme après un passage par l'OCR
+    chars = list(title)
+    i = random.randrange(len(chars))
+    del chars[i]
+    j = random.randrange(len(chars))
+    chars.insert(j, chars[j])
+    return "".join(chars)
+
+
+def main():
+    nb_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    nb_titles = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    random.seed(42)
+    words = vocabulary()
+    random.shuffle(words)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    titles = list({make_title(words, cum_weights) for _ in range(nb_titles)})
+
+    index = TrigramIndex()
+    start = time.perf_counter()
+    for row_id in range(nb_rows):
+        index.add_row(row_id, row_id % (nb_rows // 20 or 1), random.choice(titles))
+    print(f"{nb_rows} exemplaires ({len(index.titles)} titres distincts) indexés en "
+          f"{time.perf_counter() - start:.1f} s")
+
+    timings = []
+    for _ in range(500):
+        query = typo(random.choice(titles))
+        start = time.perf_counter()
+        index.similar(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"similar() p50 = {statistics.median(timings):.2f} ms   p99 = {timings[int(len(timings) * 0.99) - 1]:.2f} ms")
+
+    # Les budgets de parcours rendent la recherche approchée : on la compare à un parcours exhaustif
+    found = 0
+    for _ in range(50):
+        query = typo(random.choice(titles))
+        grams = trigrams(query)
+        best = max(len(grams & g) / len(grams | g) for g in index.grams.values())
+        results = index.similar(query, limit=1)
+        found += bool(results) and results[0].similarity == round(best, 3)
+    print(f"meilleur titre retrouvé : {found}/50 requêtes")
+
+    start = time.perf_counter()
+    for row_id in range(0, 10000):
+        index.remove_row(row_id)
+        index.add_row(row_id, 1, random.choice(titles))
+    print(f"mise à jour incrémentale : {(time.perf_counter() - start) / 10000 * 1e6:.1f} µs par exemplaire")
+
+
+if __name__ == "__main__":
+    main()
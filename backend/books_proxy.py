@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+
+# URL remplaçable : les tests et benchmarks pointent vers un serveur local de fixtures
+GOOGLE_BOOKS_URL = os.getenv("GOOGLE_BOOKS_URL", "https://www.googleapis.com/books/v1/volumes")
+GOOGLE_BOOKS_API_KEY = os.getenv("GOOGLE_BOOKS_API_KEY", "")
+BOOKS_CACHE_PATH = os.getenv(
+    "BOOKS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "books_cache.db"),
+)
+BOOKS_CACHE_TTL_SECONDS = int(os.getenv("BOOKS_CACHE_TTL_SECONDS", "86400"))
+# Fenêtre pendant laquelle une réponse périmée est servie pendant son rafraîchissement
+BOOKS_CACHE_STALE_SECONDS = int(os.getenv("BOOKS_CACHE_STALE_SECONDS", "604800"))
+BOOKS_CACHE_MEMORY_ENTRIES = int(os.getenv("BOOKS_CACHE_MEMORY_ENTRIES", "2000"))
+UPSTREAM_TIMEOUT_SECONDS = 10
+
+# Seuls ces paramètres sont transmis à Google Books et entrent dans la clé de cache
+FORWARDED_PARAMS = ("q", "startIndex", "maxResults", "printType", "orderBy", "langRestrict", "filter", "projection")
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    fetched_at: float
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, body: bytes):
+        super().__init__(f"Google Books a répondu {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.body: Optional[bytes] = None
+        self.error: Optional[Exception] = None
+
+
+def cache_key(params: Dict[str, str]) -> str:
+    return urlencode(sorted((name, params[name]) for name in FORWARDED_PARAMS if params.get(name)))
+
+
+class BooksCache:
+    def __init__(self, upstream_url: str = GOOGLE_BOOKS_URL, path: str = BOOKS_CACHE_PATH,
+                 ttl: int = BOOKS_CACHE_TTL_SECONDS, stale: int = BOOKS_CACHE_STALE_SECONDS,
+                 memory_entries: int = BOOKS_CACHE_MEMORY_ENTRIES, api_key: str = GOOGLE_BOOKS_API_KEY):
+        self.upstream_url = upstream_url
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.memory_entries = memory_entries
+        self.api_key = api_key
+        self.memory: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self.inflight: Dict[str, _Call] = {}
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.session = requests.Session()
+        self._db: Optional[sqlite3.Connection] = None
+
+    # --- Niveau 2 : SQLite sur disque, partagé entre redémarrages et workers ---
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS volumes (key TEXT PRIMARY KEY, body BLOB NOT NULL, fetched_at REAL NOT NULL)")
+            self._db = db
+        return self._db
+
+    def _read_disk(self, key: str) -> Optional[CachedBody]:
+        try:
+            with self.db_lock:
+                row = self._connection().execute(
+                    "SELECT body, fetched_at FROM volumes WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache Google Books illisible: {e}")
+            return None
+        return CachedBody(bytes(row[0]), row[1]) if row else None
+
+    def _write_disk(self, key: str, entry: CachedBody) -> None:
+        try:
+            with self.db_lock:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO volumes (key, body, fetched_at) VALUES (?, ?, ?)",
+                    (key, entry.body, entry.fetched_at),
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ Écriture du cache Google Books impossible: {e}")
+
+    # --- Niveau 1 : LRU en mémoire ---
+
+    def _remember(self, key: str, entry: CachedBody) -> None:
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[CachedBody]:
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                return entry
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def _store(self, key: str, body: bytes) -> None:
+        entry = CachedBody(body, time.time())
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    # --- Appel amont, une seule requête par clé à la fois ---
+
+    def _fetch(self, key: str) -> bytes:
+        url = f"{self.upstream_url}?{key}"
+        if self.api_key:
+            url += "&" + urlencode({"key": self.api_key})
+        response = self.session.get(url, timeout=UPSTREAM_TIMEOUT_SECONDS)
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response.content)
+        return response.content
+
+    def _coalesced_fetch(self, key: str) -> bytes:
+        with self.lock:
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self.inflight[key] = _Call()
+        if leader:
+            try:
+                call.body = self._fetch(key)
+                self._store(key, call.body)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.inflight[key]
+                call.done.set()
+        elif not call.done.wait(UPSTREAM_TIMEOUT_SECONDS + 1):
+            raise requests.Timeout("Google Books ne répond pas")
+        if call.error is not None:
+            raise call.error
+        return call.body
+
+    def _revalidate(self, key: str) -> None:
+        with self.lock:
+            if key in self.inflight:
+                return
+
+        def refresh():
+            try:
+                self._coalesced_fetch(key)
+            except Exception as e:
+                print(f"⚠️ Rafraîchissement Google Books échoué ({key}): {e}")
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get(self, params: Dict[str, str]) -> Tuple[bytes, str]:
+        key = cache_key(params)
+        entry = self._read(key)
+        if entry is not None:
+            age = time.time() - entry.fetched_at
+            if age < self.ttl:
+                return entry.body, "HIT"
+            if age < self.ttl + self.stale:
+                self._revalidate(key)
+                return entry.body, "STALE"
+        try:
+            return self._coalesced_fetch(key), "MISS"
+        except (requests.RequestException, UpstreamError) as e:
+            # Google indisponible ou quota dépassé : une vieille réponse vaut mieux qu'une erreur
+            unavailable = not isinstance(e, UpstreamError) or e.status_code == 429 or e.status_code >= 500
+            if entry is not None and unavailable:
+                return entry.body, "STALE"
+            raise
+
+
+books_cache = BooksCache()
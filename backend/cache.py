@@ -0,0 +1,90 @@
+import secrets
+import threading
+from abc import ABC, abstractmethod
+
+from state import state
+
+
+def _shared_epoch() -> str:
+    # Identifiant stocké à côté des compteurs : un ETag émis avant une remise à zéro des compteurs
+    # (redémarrage avec l'état en mémoire, base Redis vidée) ne doit jamais correspondre à nouveau.
+    # Partagé, il reste le même d'un worker à l'autre.
+    state.add("epoch", secrets.token_hex(4))
+    return state.get("epoch")
+
+
+EPOCH = _shared_epoch()
+
+
+def get_version(tag: str) -> int:
+    return state.get(f"version:{tag}") or 0
+
+
+def bump(tag: str) -> int:
+    return state.incr(f"version:{tag}")
+
+
+def invalidate(*tags: str) -> None:
+    for tag in tags:
+        bump(tag)
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in (EPOCH,) + parts) + '"'
+
+
+def _opaque(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Comparaison faible (RFC 9110) : le préfixe W/ est ignoré des deux côtés
+    candidates = [_opaque(value) for value in if_none_match.split(",")]
+    return "*" in candidates or _opaque(etag) in candidates
+
+
+class VersionedIndex(ABC):
+    # Index en mémoire maintenu par les hooks de commit. Le compteur de version partagé
+    # permet de détecter les écritures qui n'ont pas été vues par ce processus.
+    tag = ""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    @abstractmethod
+    def reset(self) -> None:
+        ...
+
+    @abstractmethod
+    def load(self, db) -> None:
+        ...
+
+    @abstractmethod
+    def apply_change(self, change) -> None:
+        ...
+
+    def ensure_loaded(self, db) -> None:
+        if self.version == get_version(self.tag):
+            return
+        with self.lock:
+            current = get_version(self.tag)
+            if self.version != current:
+                self.reset()
+                self.load(db)
+                self.version = current
+
+    def apply(self, change) -> None:
+        new_version = bump(self.tag)
+        with self.lock:
+            if self.version is None:
+                return
+            if new_version != self.version + 1:
+                # Un autre processus a modifié les données : rechargement complet au prochain appel
+                self.version = None
+                return
+            self.apply_change(change)
+            self.version = new_version
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Emprunt, Message, MessageArchive, User
+
+ASSISTANT_EMAIL = "assistant@livre2main.com"
+
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "30"))
+COMPACTION_INTERVAL_SECONDS = int(os.getenv("COMPACTION_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+
+_stop_event = threading.Event()
+_worker: Optional[threading.Thread] = None
+
+
+def is_resolved(message: Message) -> bool:
+    # Une proposition encore "pending" doit rester dans le fil : respond_to_proposal la relit.
+    metadata = message.message_metadata or {}
+    return metadata.get("status") != "pending"
+
+
+def encode_messages(messages: List[Message]) -> bytes:
+    rows = [
+        {
+            "id": m.id,
+            "id_emprunt": m.id_emprunt,
+            "id_sender": m.id_sender,
+            "message_text": m.message_text,
+            "datetime": m.datetime.isoformat(),
+            "is_read": m.is_read,
+            "message_metadata": m.message_metadata,
+        }
+        for m in messages
+    ]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False).encode("utf-8"), 9)
+
+
+def decode_messages(payload: bytes) -> List[dict]:
+    rows = json.loads(zlib.decompress(payload).decode("utf-8"))
+    for row in rows:
+        row["datetime"] = datetime.fromisoformat(row["datetime"])
+    return rows
+
+
+def compact_assistant_threads(
+    db: Session,
+    retention_days: int = MESSAGE_RETENTION_DAYS,
+    now: Optional[datetime] = None,
+) -> int:
+    assistant = db.query(User).filter(User.email == ASSISTANT_EMAIL).first()
+    if not assistant:
+        return 0
+
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+
+    emprunt_ids = [
+        row.id
+        for row in db.query(Emprunt.id).filter(
+            or_(Emprunt.id_user1 == assistant.id, Emprunt.id_user2 == assistant.id)
+        )
+    ]
+
+    archived = 0
+    for emprunt_id in emprunt_ids:
+        messages = (
+            db.query(Message)
+            .filter(
+                Message.id_emprunt == emprunt_id,
+                Message.id_sender == assistant.id,
+                Message.datetime < cutoff,
+            )
+            .order_by(Message.datetime, Message.id)
+            .all()
+        )
+        resolved = [m for m in messages if is_resolved(m)]
+        if not resolved:
+            continue
+
+        for start in range(0, len(resolved), ARCHIVE_BATCH_SIZE):
+            batch = resolved[start:start + ARCHIVE_BATCH_SIZE]
+            db.add(MessageArchive(
+                id_emprunt=emprunt_id,
+                first_message_at=batch[0].datetime,
+                last_message_at=batch[-1].datetime,
+                message_count=len(batch),
+                payload=encode_messages(batch),
+            ))
+            for message in batch:
+                db.delete(message)
+
+        db.commit()
+        archived += len(resolved)
+
+    return archived
+
+
+def _run_forever(interval: int) -> None:
+    while not _stop_event.wait(interval):
+        db = SessionLocal()
+        try:
+            archived = compact_assistant_threads(db)
+            if archived:
+                print(f"Compaction: {archived} notification(s) archivée(s)")
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Erreur lors de la compaction: {e}")
+        finally:
+            db.close()
+
+
+def start_compaction_worker(interval: int = COMPACTION_INTERVAL_SECONDS) -> None:
+    global _worker
+    if interval <= 0 or (_worker and _worker.is_alive()):
+        return
+    _stop_event.clear()
+    _worker = threading.Thread(target=_run_forever, args=(interval,), name="message-compaction", daemon=True)
+    _worker.start()
+
+
+def stop_compaction_worker() -> None:
+    _stop_event.set()
@@ -0,0 +1,104 @@
+import hashlib
+import re
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.responses import Response
+from starlette.routing import compile_path
+
+from auth import decode_token
+from cache import etag_matches, get_version, make_etag
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+class ConditionalRoute(NamedTuple):
+    regex: re.Pattern
+    convertors: dict
+    tags: Callable[..., Iterable[str]]
+    cache_control: str
+    auth: bool
+
+
+_routes: Dict[str, ConditionalRoute] = {}
+
+
+def conditional_get(path: str, tags: Callable[..., Iterable[str]], cache_control: str = DEFAULT_CACHE_CONTROL,
+                    auth: bool = True) -> None:
+    """Déclare une route GET dont l'ETag se déduit des versions de ses tags.
+
+    Les paramètres numériques se déclarent avec :int (/livres/{livre_id:int}) pour que /livres/search
+    ne soit pas pris pour une fiche. tags reçoit les paramètres de chemin et current_user_id (identifiant
+    du token, None sans token). Une route avec auth=True n'est jamais validée sans token : le handler
+    garde la main sur le 401.
+    """
+    regex, _, convertors = compile_path(path)
+    _routes[path] = ConditionalRoute(regex, convertors, tags, cache_control, auth)
+
+
+def _principal(authorization: Optional[str]) -> Optional[int]:
+    # Signature et expiration vérifiées ; les tokens émis avant l'ajout de uid passent simplement par le handler
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    payload = decode_token(authorization.split(" ")[1])
+    return payload.get("uid") if payload else None
+
+
+def _resolve(path: str) -> Optional[tuple]:
+    for template, rule in _routes.items():
+        match = rule.regex.match(path)
+        if match:
+            params = {name: rule.convertors[name].convert(value) for name, value in match.groupdict().items()}
+            return template, rule, params
+    return None
+
+
+def compute_etag(path: str, rule: ConditionalRoute, params: dict, user_id: Optional[int], query: QueryParams) -> str:
+    versions = [f"{tag}={get_version(tag)}" for tag in rule.tags(current_user_id=user_id, **params)]
+    key = "\n".join([path, str(user_id), *versions, *(f"{k}={v}" for k, v in sorted(query.multi_items()))])
+    return make_etag(hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest())
+
+
+class ConditionalGetMiddleware:
+    """ETag faibles calculés depuis les compteurs de version : un If-None-Match à jour reçoit
+    un 304 sans que le handler (ni la base) soit sollicité."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not _routes:
+            await self.app(scope, receive, send)
+            return
+        resolved = _resolve(scope["path"])
+        if resolved is None:
+            await self.app(scope, receive, send)
+            return
+
+        path, rule, params = resolved
+        headers = Headers(scope=scope)
+        user_id = _principal(headers.get("authorization"))
+        if rule.auth and user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        # L'état partagé peut être un fichier SQLite ou Redis : pas d'accès bloquant dans la boucle
+        etag = await run_in_threadpool(compute_etag, path, rule, params, user_id, QueryParams(scope["query_string"]))
+        policy = {"ETag": etag, "Cache-Control": rule.cache_control}
+        if rule.auth:
+            policy["Vary"] = "Authorization"
+
+        if etag_matches(headers.get("if-none-match"), etag):
+            await Response(status_code=304, headers=policy)(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = MutableHeaders(scope=message)
+                for name, value in policy.items():
+                    if name.lower() not in response_headers:
+                        response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
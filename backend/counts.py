@@ -0,0 +1,51 @@
+import os
+from typing import Callable
+
+from cache import get_version, invalidate
+from hooks import on_commit
+from models import BibliothequePersonnelle, Livre
+from state import state
+
+# Filet de sécurité pour les écritures qui ne passent pas par les hooks (SQL brut, autre service)
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+
+LIVRES_COUNT_TAG = "count:livres"
+
+
+def library_count_tag(user_id: int) -> str:
+    return f"count:bibliotheque:{user_id}"
+
+
+class CountCache:
+    # Un total reste valable tant que la version de son tag n'a pas bougé et que le TTL court.
+    # Stocké dans l'état partagé : un total calculé par un worker sert aux autres.
+    def __init__(self, ttl: int = COUNT_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+
+    def reset(self) -> None:
+        state.clear("total:")
+
+    def get(self, tag: str, compute: Callable[[], int]) -> int:
+        version = get_version(tag)
+        entry = state.get(f"total:{tag}")
+        if entry is not None and entry[1] == version:
+            return entry[0]
+        value = compute()
+        state.set(f"total:{tag}", [value, version], ttl=self.ttl)
+        return value
+
+
+count_cache = CountCache()
+
+
+@on_commit(Livre)
+def _invalidate_livres_count(change):
+    if change.action != "update":
+        invalidate(LIVRES_COUNT_TAG)
+
+
+@on_commit(BibliothequePersonnelle)
+def _invalidate_library_count(change):
+    user_ids = {change.values.get("user_id"), change.previous.get("user_id")} - {None}
+    if change.action != "update" or "user_id" in change.previous:
+        invalidate(*(library_count_tag(user_id) for user_id in user_ids))
@@ -0,0 +1,201 @@
+import hashlib
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+from io import BytesIO
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from PIL import Image, ImageOps
+
+COVERS_CACHE_DIR = os.getenv(
+    "COVERS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "covers_cache"),
+)
+COVER_MAX_BYTES = int(os.getenv("COVER_MAX_BYTES", str(5 * 1024 * 1024)))
+COVER_FETCH_TIMEOUT_SECONDS = 10
+COVER_MAX_REDIRECTS = 3
+# Un échec (URL refusée, hébergeur en erreur) est retenu : sans cela chaque affichage relance le téléchargement
+COVER_FAILURE_TTL_SECONDS = int(os.getenv("COVER_FAILURE_TTL_SECONDS", "300"))
+COVER_FAILURE_MAX_ENTRIES = 10000
+# L'URL vient des utilisateurs : seuls ces hébergeurs (et leurs sous-domaines) sont contactés
+COVER_ALLOWED_HOSTS = tuple(
+    host.strip().lower()
+    for host in os.getenv(
+        "COVER_ALLOWED_HOSTS",
+        "books.google.com,books.googleusercontent.com,covers.openlibrary.org,archive.org",
+    ).split(",")
+    if host.strip()
+)
+# Boîtes englobantes (largeur, hauteur) : les proportions de la couverture sont conservées
+COVER_VARIANTS = {"thumb": (128, 192), "medium": (320, 480)}
+JPEG_QUALITY = 85
+
+
+class CoverError(Exception):
+    pass
+
+
+def check_cover_url(url: str) -> str:
+    """Hôte de l'URL s'il fait partie des hébergeurs de couvertures autorisés, CoverError sinon."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    allowed = any(host == allowed or host.endswith("." + allowed) for allowed in COVER_ALLOWED_HOSTS)
+    if parts.scheme not in ("http", "https") or not allowed:
+        raise CoverError(f"URL de couverture non autorisée: {url}")
+    return host
+
+
+def is_public_host(host: str) -> bool:
+    # Toutes les adresses doivent être publiques : ni boucle locale, ni réseau privé, ni lien local, ni réservée
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except (socket.gaierror, UnicodeError):
+        return False
+    for value in addresses:
+        address = ipaddress.ip_address(value.split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            return False
+    return True
+
+
+def http_fetcher(url: str) -> bytes:
+    # Redirections suivies à la main : chaque saut est revérifié avant d'être contacté
+    for _ in range(COVER_MAX_REDIRECTS + 1):
+        host = check_cover_url(url)
+        if not is_public_host(host):
+            raise CoverError(f"Hôte de couverture non public: {host}")
+        with requests.get(url, timeout=COVER_FETCH_TIMEOUT_SECONDS, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            if response.status_code != 200:
+                raise CoverError(f"{url} a répondu {response.status_code}")
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > COVER_MAX_BYTES:
+                    raise CoverError(f"Couverture trop volumineuse: {url}")
+        return bytes(body)
+    raise CoverError(f"Trop de redirections pour la couverture: {url}")
+
+
+def render_variants(original: bytes) -> Dict[str, bytes]:
+    try:
+        image = Image.open(BytesIO(original))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except Exception as e:
+        raise CoverError(f"Image de couverture illisible: {e}")
+    variants = {}
+    for name, size in COVER_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        output = BytesIO()
+        resized.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        variants[name] = output.getvalue()
+    return variants
+
+
+class CoverStore:
+    # Cache adressé par contenu : blobs/<sha256 de l'image>.jpg, et refs/<sha256 de l'URL>.<variante>
+    # qui pointe vers le blob. Deux URL servant la même image partagent le même fichier.
+    def __init__(self, directory: str = COVERS_CACHE_DIR, fetcher: Callable[[str], bytes] = http_fetcher):
+        self.directory = directory
+        self.fetcher = fetcher
+        self.lock = threading.Lock()
+        # empreinte de l'URL -> [verrou, nombre de threads qui le tiennent ou l'attendent]
+        self.url_locks: Dict[str, list] = {}
+        self.failures: Dict[str, Tuple[float, str]] = {}
+
+    def _ref_path(self, url_hash: str, variant: str) -> str:
+        return os.path.join(self.directory, "refs", url_hash[:2], f"{url_hash}.{variant}")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], f"{digest}.jpg")
+
+    def _write(self, path: str, data: bytes) -> None:
+        # Écriture atomique : un lecteur concurrent ne voit jamais un fichier tronqué
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _lookup(self, url_hash: str, variant: str):
+        try:
+            with open(self._ref_path(url_hash, variant)) as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = self.blob_path(digest)
+        return (path, digest) if os.path.exists(path) else None
+
+    def _recent_failure(self, url_hash: str) -> Optional[str]:
+        with self.lock:
+            failure = self.failures.get(url_hash)
+            if failure is None:
+                return None
+            if failure[0] <= time.monotonic():
+                del self.failures[url_hash]
+                return None
+            return failure[1]
+
+    def _remember_failure(self, url_hash: str, error: Exception) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if len(self.failures) >= COVER_FAILURE_MAX_ENTRIES:
+                self.failures = {key: value for key, value in self.failures.items() if value[0] > now}
+                while len(self.failures) >= COVER_FAILURE_MAX_ENTRIES:
+                    del self.failures[next(iter(self.failures))]
+            self.failures[url_hash] = (now + COVER_FAILURE_TTL_SECONDS, str(error))
+
+    def _fetch(self, url: str, url_hash: str, variant: str) -> Tuple[str, str]:
+        cached = self._lookup(url_hash, variant)
+        if cached:
+            return cached
+        failure = self._recent_failure(url_hash)
+        if failure:
+            raise CoverError(failure)
+        try:
+            variants = render_variants(self.fetcher(url))
+        except (CoverError, requests.RequestException) as e:
+            self._remember_failure(url_hash, e)
+            raise
+        for name, data in variants.items():
+            digest = hashlib.sha256(data).hexdigest()
+            if not os.path.exists(self.blob_path(digest)):
+                self._write(self.blob_path(digest), data)
+            self._write(self._ref_path(url_hash, name), digest.encode())
+        return self._lookup(url_hash, variant)
+
+    def get(self, url: str, variant: str) -> Tuple[str, str]:
+        """Chemin et empreinte de la variante demandée, téléchargée au premier appel."""
+        url_hash = hashlib.sha256(url.encode()).hexdigest()
+        cached = self._lookup(url_hash, variant)
+        if cached:
+            return cached
+        failure = self._recent_failure(url_hash)
+        if failure:
+            raise CoverError(failure)
+        with self.lock:
+            entry = self.url_locks.setdefault(url_hash, [threading.Lock(), 0])
+            entry[1] += 1
+        # Une seule récupération par URL, même si plusieurs pages la demandent en même temps :
+        # le verrou ne quitte le dictionnaire qu'une fois le dernier thread en attente servi
+        try:
+            with entry[0]:
+                return self._fetch(url, url_hash, variant)
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.url_locks[url_hash]
+
+
+cover_store = CoverStore()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -22,3 +22,15 @@ def get_db():
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+
+def ensure_indexes(bind):
+    # create_all ne touche pas aux tables existantes : les index ajoutés depuis sont créés ici
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            # Une colonne encore absente sera ajoutée (avec son index) par sa migration
+            if index.name not in existing and {column.name for column in index.columns} <= columns:
+                index.create(bind=bind)
@@ -0,0 +1,39 @@
+import json
+from typing import Any, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.responses import Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    # Optionnel : sans orjson, même sortie via json (plus lent)
+    orjson = None
+
+
+def _fallback(obj: Any) -> Any:
+    # Modèles Pydantic, Decimal… : tout ce qu'orjson ne connaît pas passe par l'encodeur de FastAPI
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_fallback, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encodée par orjson : datetime, listes et dictionnaires sans passer par jsonable_encoder.
+
+    Les routes qui déclarent un response_model gardent la sérialisation Pydantic de FastAPI, déjà en Rust.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def validated_json(adapter: TypeAdapter, rows: List[Any], **kwargs) -> Response:
+    """Liste validée et sérialisée en une passe par un TypeAdapter compilé une seule fois."""
+    return Response(adapter.dump_json(adapter.validate_python(rows)), media_type="application/json", **kwargs)
@@ -0,0 +1,59 @@
+from typing import Iterable, Optional, Set, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query, joinedload, lazyload, load_only
+
+FIELDS_DESCRIPTION = "Champs à renvoyer, séparés par des virgules (ex. id,title,authors)"
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Set[str]]:
+    """Champs demandés, toujours avec l'identifiant ; None si la réponse doit rester complète."""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Champs inconnus : {', '.join(sorted(unknown))}")
+    return requested | ({"id"} & set(schema.model_fields))
+
+
+def load_fields(query: Query, model, fields: Optional[Set[str]], always: Iterable = ()) -> Query:
+    """Ne charge que les colonnes demandées ; une relation n'est jointe que si l'un de ses champs l'est."""
+    if fields is None:
+        return query
+    mapper = inspect(model)
+    columns = {getattr(model, name) for name in fields if name in mapper.column_attrs}
+    columns.update(always)
+    options = []
+    for relationship in mapper.relationships:
+        if relationship.uselist:
+            continue
+        related = relationship.mapper
+        wanted = [
+            getattr(related.class_, name) for name in fields
+            if name not in mapper.column_attrs and name in related.column_attrs
+        ]
+        attribute = getattr(model, relationship.key)
+        if wanted:
+            options.append(joinedload(attribute).load_only(*wanted))
+            columns.update(getattr(model, mapper.get_property_by_column(column).key)
+                           for column in relationship.local_columns)
+        else:
+            options.append(lazyload(attribute))
+    return query.options(load_only(*columns), *options)
+
+
+def project(obj, schema: Type[BaseModel], fields: Set[str]) -> dict:
+    # Accès limité aux attributs chargés : lire un autre champ relancerait une requête par ligne
+    item = {}
+    for name in schema.model_fields:
+        if name not in fields:
+            continue
+        if hasattr(type(obj), name):
+            item[name] = getattr(obj, name)
+        else:
+            item[name] = schema.model_fields[name].get_default(call_default_factory=True)
+    # Valeurs brutes (datetime compris) : fast_json.dumps les encode sans passer par jsonable_encoder
+    return item
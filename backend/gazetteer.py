@@ -0,0 +1,90 @@
+import csv
+import os
+import re
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import Float, inspect, text
+
+from normalization import strip_accents
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "villes_fr.csv"),
+)
+
+ABBREVIATIONS = {"st": "saint", "ste": "sainte"}
+# Codes postaux et arrondissements ("75015 Paris", "Lyon 3e", "Paris 1er")
+NOISE_TOKEN = re.compile(r"^\d+(e|er|eme|ème)?$")
+
+
+class City(NamedTuple):
+    name: str
+    latitude: float
+    longitude: float
+
+
+_cities: Optional[Dict[str, City]] = None
+_lock = threading.Lock()
+
+
+def normalize_city(value: str) -> str:
+    value = strip_accents(value or "").lower()
+    value = re.sub(r"[-'’_,./()]", " ", value)
+    tokens = [ABBREVIATIONS.get(token, token) for token in value.split() if not NOISE_TOKEN.match(token)]
+    return " ".join(tokens)
+
+
+def _load() -> Dict[str, City]:
+    cities = {}
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        rows = csv.DictReader(line for line in f if not line.startswith("#"))
+        # Le fichier est trié par population décroissante : en cas d'homonymes,
+        # la commune la plus peuplée l'emporte.
+        for row in rows:
+            key = normalize_city(row["nom"])
+            if key and key not in cities:
+                cities[key] = City(row["nom"], float(row["latitude"]), float(row["longitude"]))
+    return cities
+
+
+def get_cities() -> Dict[str, City]:
+    global _cities
+    if _cities is None:
+        with _lock:
+            if _cities is None:
+                _cities = _load()
+    return _cities
+
+
+def resolve_city(value: Optional[str]) -> Optional[City]:
+    if not value:
+        return None
+    return get_cities().get(normalize_city(value))
+
+
+def apply_city(user, villes: Optional[str]) -> None:
+    city = resolve_city(villes)
+    if city:
+        user.villes = city.name
+        user.latitude = city.latitude
+        user.longitude = city.longitude
+    else:
+        user.villes = villes.strip() if villes else villes
+        user.latitude = None
+        user.longitude = None
+
+
+def migrate_user_coordinates(engine) -> int:
+    """Ajoute Latitude / Longitude à une table User créée avant le gazetier (create_all ne modifie pas les tables)."""
+    columns = {column["name"] for column in inspect(engine).get_columns("User")}
+    missing = [name for name in ("Latitude", "Longitude") if name not in columns]
+    if not missing:
+        return 0
+    table = engine.dialect.identifier_preparer.quote("User")
+    column_type = Float().compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        for name in missing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type} NULL"))
+    print(f"✅ Colonnes {', '.join(missing)} ajoutées à User")
+    return len(missing)
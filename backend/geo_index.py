@@ -0,0 +1,401 @@
+import heapq
+import math
+import os
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import VersionedIndex
+from gazetteer import resolve_city
+from hooks import on_commit
+from models import BibliothequePersonnelle, User
+from normalization import normalize_text
+
+ASSISTANT_EMAIL = "assistant@livre2main.com"
+GEO_INDEX_TAG = "geo-index"
+CELL_SIZE_DEG = float(os.getenv("GEO_CELL_SIZE_DEG", "0.25"))
+# En dessous de ce nombre de propriétaires, un parcours direct est plus rapide que la grille
+BRUTE_FORCE_LIMIT = 2048
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+# Niveaux de zoom Leaflet pour lesquels les agrégats de la carte sont maintenus
+CLUSTER_ZOOMS = tuple(sorted(int(z) for z in os.getenv("MAP_CLUSTER_ZOOMS", "5,7,9,11,13").split(",")))
+CLUSTER_PX = 60
+MAX_CLUSTERS = 300
+TOP_BOOKS = 3
+TOP_CITIES = 3
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def book_keys(title: Optional[str] = None, source_id: Optional[str] = None) -> Tuple[str, ...]:
+    keys = []
+    if source_id:
+        keys.append(sys.intern("source:" + source_id))
+    normalized = normalize_text(title)
+    if normalized:
+        keys.append(sys.intern("title:" + normalized))
+    return tuple(keys)
+
+
+def user_point(latitude, longitude, villes) -> Optional[Tuple[float, float]]:
+    if latitude is not None and longitude is not None:
+        return (latitude, longitude)
+    city = resolve_city(villes)
+    return (city.latitude, city.longitude) if city else None
+
+
+def is_title_key(key: str) -> bool:
+    return key.startswith("title:")
+
+
+class ClusterLevel:
+    def __init__(self, zoom: int):
+        self.zoom = zoom
+        # Environ CLUSTER_PX pixels à l'écran pour ce niveau de zoom
+        self.cell_size = 360.0 * CLUSTER_PX / (256 * 2 ** zoom)
+        self.cells: Dict[Tuple[int, int], list] = {}
+
+    def cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def add_user(self, point: Tuple[float, float], villes: Optional[str], keys: Iterable[str]) -> None:
+        aggregate = self.cells.get(self.cell(*point))
+        if aggregate is None:
+            aggregate = self.cells[self.cell(*point)] = [0, 0.0, 0.0, Counter(), Counter(), None]
+        aggregate[5] = None
+        aggregate[0] += 1
+        aggregate[1] += point[0]
+        aggregate[2] += point[1]
+        aggregate[3].update(keys)
+        if villes:
+            aggregate[4][villes] += 1
+
+    def remove_user(self, point: Tuple[float, float], villes: Optional[str], keys: Iterable[str]) -> None:
+        cell = self.cell(*point)
+        aggregate = self.cells[cell]
+        aggregate[0] -= 1
+        if aggregate[0] <= 0:
+            del self.cells[cell]
+            return
+        aggregate[1] -= point[0]
+        aggregate[2] -= point[1]
+        aggregate[5] = None
+        for key in keys:
+            self._decrement(aggregate[3], key)
+        if villes:
+            self._decrement(aggregate[4], villes)
+
+    def add_book(self, point: Tuple[float, float], key: str) -> None:
+        aggregate = self.cells[self.cell(*point)]
+        aggregate[3][key] += 1
+        aggregate[5] = None
+
+    def remove_book(self, point: Tuple[float, float], key: str) -> None:
+        aggregate = self.cells[self.cell(*point)]
+        self._decrement(aggregate[3], key)
+        aggregate[5] = None
+
+    def summary(self, cell: Tuple[int, int]) -> tuple:
+        # Les classements sont recalculés uniquement pour les cellules modifiées
+        aggregate = self.cells[cell]
+        if aggregate[5] is None:
+            aggregate[5] = (aggregate[3].most_common(TOP_BOOKS), [city for city, _ in aggregate[4].most_common(TOP_CITIES)])
+        return aggregate[5]
+
+    @staticmethod
+    def _decrement(counter: Counter, key) -> None:
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    def cells_in_bbox(self, south: float, west: float, north: float, east: float) -> List[Tuple[int, int]]:
+        i_min, j_min = self.cell(south, west)
+        i_max, j_max = self.cell(north, east)
+        span = (i_max - i_min + 1) * (j_max - j_min + 1)
+        if span <= len(self.cells):
+            return [
+                (i, j)
+                for i in range(i_min, i_max + 1)
+                for j in range(j_min, j_max + 1)
+                if (i, j) in self.cells
+            ]
+        return [
+            cell for cell in self.cells
+            if i_min <= cell[0] <= i_max and j_min <= cell[1] <= j_max
+        ]
+
+
+class GeoIndex(VersionedIndex):
+    tag = GEO_INDEX_TAG
+
+    def __init__(self, cell_size: float = CELL_SIZE_DEG):
+        self.cell_size = cell_size
+        super().__init__()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.points: Dict[int, Tuple[float, float]] = {}
+            self.grid: Dict[Tuple[int, int], set] = defaultdict(set)
+            self.rows: Dict[int, Tuple[int, Tuple[str, ...]]] = {}
+            self.owners: Dict[str, Dict[int, int]] = defaultdict(dict)
+            self.user_cities: Dict[int, str] = {}
+            self.user_titles: Dict[int, set] = defaultdict(set)
+            self.titles: Dict[str, str] = {}
+            self.levels = [ClusterLevel(zoom) for zoom in CLUSTER_ZOOMS]
+            self.version: Optional[int] = None
+
+    def cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def set_point(self, user_id: int, point: Optional[Tuple[float, float]], villes: Optional[str] = None) -> None:
+        old = self.points.pop(user_id, None)
+        old_villes = self.user_cities.pop(user_id, None)
+        titles = self.user_titles.get(user_id, ())
+        if old is not None:
+            cell = self.cell(*old)
+            self.grid[cell].discard(user_id)
+            if not self.grid[cell]:
+                del self.grid[cell]
+            for level in self.levels:
+                level.remove_user(old, old_villes, titles)
+        if point is not None:
+            self.points[user_id] = point
+            self.grid[self.cell(*point)].add(user_id)
+            if villes:
+                self.user_cities[user_id] = villes
+            for level in self.levels:
+                level.add_user(point, villes, titles)
+
+    def add_row(self, row_id: int, user_id: int, keys: Iterable[str], title: Optional[str] = None) -> None:
+        if row_id in self.rows:
+            return
+        keys = tuple(keys)
+        self.rows[row_id] = (user_id, keys)
+        for key in keys:
+            owners = self.owners[key]
+            owners[user_id] = owners.get(user_id, 0) + 1
+            if owners[user_id] == 1 and is_title_key(key):
+                self.titles.setdefault(key, title or key[len("title:"):])
+                self.user_titles[user_id].add(key)
+                point = self.points.get(user_id)
+                if point is not None:
+                    for level in self.levels:
+                        level.add_book(point, key)
+
+    def remove_row(self, row_id: int) -> None:
+        entry = self.rows.pop(row_id, None)
+        if entry is None:
+            return
+        user_id, keys = entry
+        for key in keys:
+            owners = self.owners.get(key)
+            if not owners or user_id not in owners:
+                continue
+            owners[user_id] -= 1
+            if owners[user_id] <= 0:
+                del owners[user_id]
+                if is_title_key(key):
+                    self.user_titles[user_id].discard(key)
+                    point = self.points.get(user_id)
+                    if point is not None:
+                        for level in self.levels:
+                            level.remove_book(point, key)
+            if not owners:
+                del self.owners[key]
+                self.titles.pop(key, None)
+
+    def load(self, db: Session) -> None:
+        users = db.query(User.id, User.latitude, User.longitude, User.villes).filter(User.email != ASSISTANT_EMAIL)
+        for user_id, latitude, longitude, villes in users:
+            self.set_point(user_id, user_point(latitude, longitude, villes), villes)
+        rows = db.query(BibliothequePersonnelle.id, BibliothequePersonnelle.user_id,
+                        BibliothequePersonnelle.title, BibliothequePersonnelle.source_id)
+        for row_id, user_id, title, source_id in rows.yield_per(5000):
+            self.add_row(row_id, user_id, book_keys(title, source_id), title)
+
+    def apply_change(self, change) -> None:
+        values = change.values
+        if change.model is User:
+            if change.action == "delete" or values.get("email") == ASSISTANT_EMAIL:
+                self.set_point(values["id"], None)
+            else:
+                point = user_point(values.get("latitude"), values.get("longitude"), values.get("villes"))
+                self.set_point(values["id"], point, values.get("villes"))
+        else:
+            self.remove_row(values["id"])
+            if change.action != "delete":
+                title = values.get("title")
+                self.add_row(values["id"], values["user_id"], book_keys(title, values.get("source_id")), title)
+
+    def _cell_lower_bound_km(self, cell: Tuple[int, int], latitude: float, longitude: float) -> float:
+        lat_min = cell[0] * self.cell_size
+        lon_min = cell[1] * self.cell_size
+        dlat = max(0.0, lat_min - latitude, latitude - (lat_min + self.cell_size))
+        dlon = max(0.0, lon_min - longitude, longitude - (lon_min + self.cell_size))
+        max_lat = min(89.9, max(abs(latitude), abs(lat_min), abs(lat_min + self.cell_size)))
+        return KM_PER_DEG * math.hypot(dlat, dlon * math.cos(math.radians(max_lat)))
+
+    def nearest(
+        self,
+        keys: Iterable[str],
+        latitude: float,
+        longitude: float,
+        k: int = 10,
+        exclude: Optional[int] = None,
+        max_distance_km: Optional[float] = None,
+    ) -> List[Tuple[float, int]]:
+        with self.lock:
+            owner_maps = [self.owners[key] for key in keys if key in self.owners]
+            if len(owner_maps) == 1:
+                candidates = owner_maps[0]
+            else:
+                candidates = set()
+                for owners in owner_maps:
+                    candidates.update(owners)
+
+            if len(candidates) <= BRUTE_FORCE_LIMIT:
+                scored = (
+                    (haversine_km(latitude, longitude, *self.points[user_id]), user_id)
+                    for user_id in candidates if user_id != exclude and user_id in self.points
+                )
+                best = heapq.nsmallest(k, scored)
+            else:
+                best = self._best_first(candidates, latitude, longitude, k, exclude)
+
+        if max_distance_km is not None:
+            best = [(distance, user_id) for distance, user_id in best if distance <= max_distance_km]
+        return best
+
+    def _visit(self, cell, candidates, latitude, longitude, k, exclude, heap) -> None:
+        for user_id in self.grid.get(cell, ()):
+            if user_id == exclude or user_id not in candidates:
+                continue
+            distance = haversine_km(latitude, longitude, *self.points[user_id])
+            if len(heap) < k:
+                heapq.heappush(heap, (-distance, user_id))
+            elif distance < -heap[0][0]:
+                heapq.heapreplace(heap, (-distance, user_id))
+
+    def _ring(self, center: Tuple[int, int], radius: int):
+        ci, cj = center
+        if radius == 0:
+            yield center
+            return
+        for j in range(cj - radius, cj + radius + 1):
+            yield (ci - radius, j)
+            yield (ci + radius, j)
+        for i in range(ci - radius + 1, ci + radius):
+            yield (i, cj - radius)
+            yield (i, cj + radius)
+
+    def _best_first(self, candidates, latitude: float, longitude: float, k: int, exclude: Optional[int]) -> List[Tuple[float, int]]:
+        heap: List[Tuple[float, int]] = []
+        center = self.cell(latitude, longitude)
+        # Anneaux de cellules autour du point : un point de l'anneau r est au moins à r - 1
+        # cellules de distance sur l'un des deux axes.
+        max_radius = int(math.sqrt(len(self.grid))) + 1
+        for radius in range(max_radius + 1):
+            if len(heap) == k:
+                max_lat = min(89.9, abs(latitude) + (radius + 1) * self.cell_size)
+                bound = (radius - 1) * self.cell_size * KM_PER_DEG * math.cos(math.radians(max_lat))
+                if bound > -heap[0][0]:
+                    return sorted((-distance, user_id) for distance, user_id in heap)
+            for cell in self._ring(center, radius):
+                self._visit(cell, candidates, latitude, longitude, k, exclude, heap)
+
+        # Point éloigné des zones peuplées : les cellules occupées sont visitées par
+        # distance minimale croissante jusqu'à ne plus pouvoir améliorer le k-ième résultat.
+        heap = []
+        cells = sorted(
+            (self._cell_lower_bound_km(cell, latitude, longitude), cell) for cell in self.grid
+        )
+        for bound, cell in cells:
+            if len(heap) == k and bound > -heap[0][0]:
+                break
+            self._visit(cell, candidates, latitude, longitude, k, exclude, heap)
+        return sorted((-distance, user_id) for distance, user_id in heap)
+
+    def clusters(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        zoom: int,
+        keys: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        with self.lock:
+            candidates = [level for level in self.levels if level.zoom <= zoom] or self.levels[:1]
+            # Le niveau le plus fin dont le nombre de cellules visibles reste borné
+            for level in reversed(candidates):
+                cells = level.cells_in_bbox(south, west, north, east)
+                if len(cells) <= MAX_CLUSTERS:
+                    break
+
+            if keys is not None:
+                return self._owner_clusters(level, keys, south, west, north, east)
+
+            clusters = []
+            for cell in cells:
+                count, sum_lat, sum_lon = level.cells[cell][:3]
+                top_books, cities = level.summary(cell)
+                clusters.append({
+                    "latitude": round(sum_lat / count, 5),
+                    "longitude": round(sum_lon / count, 5),
+                    "count": count,
+                    "top_books": [
+                        {"title": self.titles.get(key, key), "owners": owners}
+                        for key, owners in top_books
+                    ],
+                    "cities": cities,
+                })
+        clusters.sort(key=lambda cluster: -cluster["count"])
+        return clusters[:MAX_CLUSTERS]
+
+    def _owner_clusters(self, level: ClusterLevel, keys, south, west, north, east) -> List[dict]:
+        owner_ids = set()
+        for key in keys:
+            owner_ids.update(self.owners.get(key, ()))
+        aggregates = {}
+        for user_id in owner_ids:
+            point = self.points.get(user_id)
+            if point is None or not (south <= point[0] <= north and west <= point[1] <= east):
+                continue
+            aggregate = aggregates.setdefault(level.cell(*point), [0, 0.0, 0.0, Counter()])
+            aggregate[0] += 1
+            aggregate[1] += point[0]
+            aggregate[2] += point[1]
+            if user_id in self.user_cities:
+                aggregate[3][self.user_cities[user_id]] += 1
+        clusters = [
+            {
+                "latitude": round(sum_lat / count, 5),
+                "longitude": round(sum_lon / count, 5),
+                "count": count,
+                "top_books": [],
+                "cities": [city for city, _ in cities.most_common(TOP_CITIES)],
+            }
+            for count, sum_lat, sum_lon, cities in aggregates.values()
+        ]
+        clusters.sort(key=lambda cluster: -cluster["count"])
+        return clusters[:MAX_CLUSTERS]
+
+
+geo_index = GeoIndex()
+
+
+@on_commit(User, BibliothequePersonnelle)
+def _update_geo_index(change):
+    if change.model is User and change.action == "update" and not {"latitude", "longitude", "villes", "email"} & set(change.previous):
+        return
+    geo_index.apply(change)
@@ -0,0 +1,80 @@
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_listeners: Dict[type, List[Callable]] = defaultdict(list)
+
+
+class Change:
+    def __init__(self, model: type, action: str, values: dict, previous: dict):
+        self.model = model
+        self.action = action
+        self.values = values
+        self.previous = previous
+
+    def __repr__(self):
+        return f"Change({self.model.__name__}, {self.action}, {self.values.get('id')})"
+
+
+def on_commit(*models):
+    def decorator(fn):
+        for model in models:
+            _listeners[model].append(fn)
+        return fn
+    return decorator
+
+
+def _capture(obj, action: str) -> Change:
+    state = inspect(obj)
+    values = {}
+    previous = {}
+    for attr in state.mapper.column_attrs:
+        values[attr.key] = state.dict.get(attr.key)
+        if action == "update":
+            history = state.attrs[attr.key].history
+            if history.has_changes():
+                previous[attr.key] = history.deleted[0] if history.deleted else None
+    return Change(type(obj), action, values, previous)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if not _listeners:
+        return
+    pending = session.info.setdefault("pending_changes", [])
+    for action, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if type(obj) not in _listeners:
+                continue
+            if action == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            pending.append(_capture(obj, action))
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    changes = session.info.pop("pending_changes", None)
+    if not changes:
+        return
+    # Ordre des dépendances : une oeuvre est signalée avant les exemplaires qui la référencent
+    tables = inspect(changes[0].model).local_table.metadata.sorted_tables
+    order = {table: rank for rank, table in enumerate(tables)}
+
+    def dependency_rank(change):
+        rank = order.get(inspect(change.model).local_table, 0)
+        return -rank if change.action == "delete" else rank
+
+    changes.sort(key=dependency_rank)
+    for change in changes:
+        for listener in _listeners.get(change.model, ()):
+            try:
+                listener(change)
+            except Exception as e:
+                print(f"❌ Erreur dans un hook de commit ({change}): {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("pending_changes", None)
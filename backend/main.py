@@ -1,6 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db
+from database import engine, init_db
+from search import ensure_search_index
+from migrations import run_migrations
+from compaction import start_compaction_worker, stop_compaction_worker
+from state import start_state_sweeper, stop_state_sweeper
 from routes import (
     auth_routes,
     user_routes,
@@ -9,15 +15,38 @@ from routes import (
     ai_routes,
     bibliotheque_routes,
     cities,
-    message_routes
+    message_routes,
+    google_books_routes,
+    cover_routes,
+    batch_routes
 
 )
 from routes.cities import router as cities_router
+from compression import CompressionMiddleware
+from conditional import ConditionalGetMiddleware
+from query_stats import QueryStatsMiddleware
+from metrics import (
+    METRICS_TOKEN,
+    MetricsMiddleware,
+    collect_all,
+    instrument_engine,
+    start_metrics_publisher,
+    stop_metrics_publisher,
+    update_threadpool,
+)
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
 
 app = FastAPI(title="Livre2main API", version="1.0.0")
+instrument_engine(engine)
+
+# Le dernier ajouté est le plus externe : CORS englobe les 304, la compression ne voit que les corps complets
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +57,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Sans cela, le navigateur masque l'en-tête au code du front
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth_routes.router)
@@ -38,11 +69,25 @@ app.include_router(ai_routes.router)
 app.include_router(bibliotheque_routes.router)
 app.include_router(cities.router)
 app.include_router(message_routes.router)
+app.include_router(google_books_routes.router)
+app.include_router(cover_routes.router)
+app.include_router(batch_routes.router)
 
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    run_migrations(engine)
+    ensure_search_index(engine)
+    start_compaction_worker()
+    start_state_sweeper()
+    start_metrics_publisher()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_compaction_worker()
+    stop_metrics_publisher()
+    stop_state_sweeper()
 
 @app.get("/")
 def root():
@@ -51,3 +96,11 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    update_threadpool()
+    # Lecture de l'état partagé (autres workers) hors de la boucle asyncio
+    return PlainTextResponse(await run_in_threadpool(collect_all), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,326 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from state import MemoryBackend, state
+
+METRICS_PUBLISH_INTERVAL_SECONDS = int(os.getenv("METRICS_PUBLISH_INTERVAL_SECONDS", "15"))
+METRICS_MAX_WORKERS = int(os.getenv("METRICS_MAX_WORKERS", "32"))
+# Vide : /metrics public ; sinon Authorization: Bearer <METRICS_TOKEN> exigé
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values: Dict[LabelValues, object] = {}
+        registry[name] = self
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> List[list]:
+        with self.lock:
+            return [[list(key), value if not isinstance(value, list) else list(value)] for key, value in self.values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            # [compte par seau (non cumulé)..., +Inf, somme]
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+
+registry: Dict[str, _Metric] = {}
+_collectors: List[Callable[[], None]] = []
+
+
+def collector(fn: Callable[[], None]) -> Callable[[], None]:
+    """Mise à jour de jauges lue au moment de l'export (pool SQL, caches…)."""
+    _collectors.append(fn)
+    return fn
+
+
+http_requests = Counter("http_requests_total", "Requêtes HTTP terminées", ("method", "route", "status"))
+http_duration = Histogram("http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "Requêtes HTTP en cours")
+threadpool_busy = Gauge("threadpool_busy_threads", "Threads du pool anyio occupés (handlers synchrones)")
+threadpool_size = Gauge("threadpool_max_threads", "Taille du pool de threads anyio")
+db_pool_checked_out = Gauge("db_pool_checked_out", "Connexions SQL empruntées au pool")
+db_pool_size = Gauge("db_pool_size", "Connexions SQL gardées ouvertes par le pool")
+db_pool_overflow = Gauge("db_pool_overflow", "Connexions SQL ouvertes au-delà de la taille du pool")
+db_pool_checkouts = Counter("db_pool_checkouts_total", "Emprunts de connexion au pool SQL")
+db_pool_wait = Histogram("db_pool_checkout_wait_seconds", "Attente pour obtenir une connexion du pool SQL")
+cache_requests = Counter("cache_requests_total", "Lectures de cache", ("cache", "result"))
+ollama_duration = Histogram("ollama_request_duration_seconds", "Durée des appels Ollama", buckets=SLOW_BUCKETS)
+ollama_errors = Counter("ollama_errors_total", "Appels Ollama en échec", ("reason",))
+
+
+def update_threadpool() -> None:
+    # À appeler depuis la boucle asyncio : le limiteur par défaut d'anyio lui est attaché
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+        limiter = current_default_thread_limiter()
+    except Exception:
+        return
+    threadpool_busy.set(limiter.borrowed_tokens)
+    threadpool_size.set(limiter.total_tokens)
+
+
+def instrument_engine(engine: Engine) -> None:
+    pool = engine.pool
+    if not hasattr(pool, "_do_get"):
+        return
+    original = pool._do_get
+
+    # Pas d'événement SQLAlchemy avant l'emprunt : l'attente se mesure autour de la prise dans la file du pool
+    def timed_get():
+        started_at = time.perf_counter()
+        try:
+            return original()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started_at)
+
+    pool._do_get = timed_get
+    event.listen(pool, "checkout", lambda *args: db_pool_checkouts.inc())
+
+    @collector
+    def collect_pool():
+        for gauge, method in ((db_pool_checked_out, "checkedout"), (db_pool_size, "size"), (db_pool_overflow, "overflow")):
+            if hasattr(pool, method):
+                gauge.set(max(getattr(pool, method)(), 0))
+
+
+@collector
+def _collect_caches():
+    from response_cache import response_cache
+    from singleflight import singleflight
+
+    cache_stats = response_cache.stats()
+    flight_stats = singleflight.stats()
+    # Compteurs cumulés des modules de cache, recopiés tels quels
+    with cache_requests.lock:
+        cache_requests.values[("response", "hit")] = cache_stats["hits"]
+        cache_requests.values[("response", "miss")] = cache_stats["misses"]
+        cache_requests.values[("singleflight", "hit")] = flight_stats["saved_executions"]
+        cache_requests.values[("singleflight", "miss")] = flight_stats["executions"]
+
+
+def snapshot() -> Dict[str, list]:
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            print(f"⚠️ Collecte de métriques échouée: {e}")
+    return {name: metric.samples() for name, metric in registry.items()}
+
+
+def merge(snapshots: List[Dict[str, list]]) -> Dict[str, Dict[LabelValues, object]]:
+    merged: Dict[str, Dict[LabelValues, object]] = {name: {} for name in registry}
+    for worker in snapshots:
+        for name, samples in worker.items():
+            if name not in merged:
+                continue
+            series = merged[name]
+            for labels, value in samples:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    current = series.get(key)
+                    series[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    series[key] = series.get(key, 0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(merged: Dict[str, Dict[LabelValues, object]]) -> str:
+    """Format texte Prometheus 0.0.4."""
+    lines = []
+    for name, metric in registry.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(merged.get(name, {}).items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_format_labels(metric.labels, key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric.buckets) + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_format_labels(metric.labels, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(metric.labels, key)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(metric.labels, key)} {cumulative}")
+
+    # Ratios dérivés après agrégation : la moyenne des ratios par worker serait fausse
+    requests = merged.get(cache_requests.name, {})
+    lines.append("# HELP cache_hit_ratio Part des lectures servies sans recalcul")
+    lines.append("# TYPE cache_hit_ratio gauge")
+    for cache in sorted({key[0] for key in requests}):
+        hits, misses = requests.get((cache, "hit"), 0), requests.get((cache, "miss"), 0)
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f'cache_hit_ratio{{cache="{cache}"}} {ratio:.4f}')
+    return "\n".join(lines) + "\n"
+
+
+# Agrégation multi-workers : chaque worker publie son instantané cumulé dans un emplacement de l'état partagé.
+# Un worker arrêté disparaît à l'expiration de son emplacement (vu comme une remise à zéro par Prometheus).
+_slot: Optional[int] = None
+_stop_event = threading.Event()
+_publisher: Optional[threading.Thread] = None
+
+
+def _shared() -> bool:
+    return not isinstance(state, MemoryBackend)
+
+
+def _slot_key(slot: int) -> str:
+    return f"metrics:worker:{slot}"
+
+
+def publish() -> None:
+    global _slot
+    ttl = METRICS_PUBLISH_INTERVAL_SECONDS * 3
+    data = {"pid": os.getpid(), "metrics": snapshot()}
+    if _slot is None:
+        for slot in range(METRICS_MAX_WORKERS):
+            if state.add(_slot_key(slot), data, ttl=ttl):
+                _slot = slot
+                return
+        print("⚠️ Aucun emplacement libre pour publier les métriques de ce worker")
+        return
+    state.set(_slot_key(_slot), data, ttl=ttl)
+
+
+def collect_all() -> str:
+    local = snapshot()
+    snapshots = [local]
+    if _shared():
+        for slot in range(METRICS_MAX_WORKERS):
+            if slot == _slot:
+                continue
+            data = state.get(_slot_key(slot))
+            if data and data.get("pid") != os.getpid():
+                snapshots.append(data["metrics"])
+    return render(merge(snapshots))
+
+
+def _run_publisher(interval: int) -> None:
+    while not _stop_event.wait(interval):
+        try:
+            publish()
+        except Exception as e:
+            print(f"❌ Erreur lors de la publication des métriques: {e}")
+
+
+def start_metrics_publisher(interval: int = METRICS_PUBLISH_INTERVAL_SECONDS) -> None:
+    global _publisher
+    if not _shared() or interval <= 0 or (_publisher and _publisher.is_alive()):
+        return
+    _stop_event.clear()
+    publish()
+    _publisher = threading.Thread(target=_run_publisher, args=(interval,), name="metrics-publisher", daemon=True)
+    _publisher.start()
+
+
+def stop_metrics_publisher() -> None:
+    global _slot
+    _stop_event.set()
+    if _shared() and _slot is not None:
+        state.delete(_slot_key(_slot))
+        _slot = None
+
+
+class MetricsMiddleware:
+    """Latence par route (modèle de chemin, pas l'URL : cardinalité bornée), requêtes en cours, pool de threads."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        http_in_flight.inc()
+        update_threadpool()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            update_threadpool()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            http_duration.observe(time.perf_counter() - started_at, method=scope["method"], route=template)
+            http_requests.inc(method=scope["method"], route=template, status=status_code)
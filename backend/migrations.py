@@ -0,0 +1,111 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Set, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+from gazetteer import migrate_user_coordinates
+from oeuvres import migrate_personal_books
+
+# Au-delà, un verrou fichier est considéré comme abandonné (processus tué pendant une migration)
+MIGRATION_LOCK_TIMEOUT_SECONDS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "600"))
+MIGRATION_LOCK_NAME = "livre2main_migrations"
+
+# Appliquées dans l'ordre ; un nom enregistré dans SchemaMigration n'est jamais rejoué
+MIGRATIONS: List[Tuple[str, Callable]] = [
+    ("user_coordinates", migrate_user_coordinates),
+    ("personal_books_oeuvres", migrate_personal_books),
+]
+
+schema_migrations = Table(
+    "SchemaMigration", MetaData(),
+    Column("Name", String(100), primary_key=True),
+    Column("AppliedAt", DateTime, nullable=False),
+)
+
+
+def _applied(engine) -> Set[str]:
+    if not inspect(engine).has_table(schema_migrations.name):
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.Name)).scalars())
+
+
+@contextmanager
+def _file_lock(path: str):
+    deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > MIGRATION_LOCK_TIMEOUT_SECONDS:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Verrou de migration toujours pris: {path}")
+            time.sleep(0.2)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(path)
+
+
+@contextmanager
+def migration_lock(engine):
+    """Un seul processus migre à la fois ; les autres attendent qu'il ait fini."""
+    if engine.dialect.name == "mysql":
+        # Verrou nommé attaché à la connexion : libéré aussi si le processus meurt
+        with engine.connect() as conn:
+            acquired = conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS},
+            ).scalar()
+            if acquired != 1:
+                raise RuntimeError("Verrou de migration non obtenu")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+        return
+    database = engine.url.database
+    if engine.dialect.name == "sqlite" and database and database != ":memory:":
+        with _file_lock(f"{database}.migrations.lock"):
+            yield
+        return
+    yield
+
+
+def run_migrations(engine) -> List[str]:
+    # Cas courant au démarrage d'un worker : tout est déjà appliqué, aucun verrou
+    if {name for name, _ in MIGRATIONS} <= _applied(engine):
+        return []
+
+    done = []
+    with migration_lock(engine):
+        schema_migrations.create(bind=engine, checkfirst=True)
+        # Un autre worker a pu tout appliquer pendant l'attente du verrou
+        applied = _applied(engine)
+        for name, migrate in MIGRATIONS:
+            if name in applied:
+                continue
+            migrate(engine)
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.insert().values(Name=name, AppliedAt=datetime.utcnow()))
+            print(f"✅ Migration {name} appliquée")
+            done.append(name)
+    return done
+
+
+if __name__ == "__main__":
+    from database import engine, init_db
+
+    init_db()
+    run_migrations(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, LargeBinary, Float, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -23,6 +23,8 @@ class User(Base):
     surname = Column("Surname", String(100), nullable=False)
     role = Column("Role", String(20), nullable=False, default="Pauvre")
     villes = Column("Villes", String(100))
+    latitude = Column("Latitude", Float, nullable=True)
+    longitude = Column("Longitude", Float, nullable=True)
     mdp = Column("MDP", String(255), nullable=False)
     email = Column("Email", String(191), unique=True, nullable=False, index=True)
     age = Column("Age", Integer)
@@ -47,23 +49,67 @@ class Emprunt(Base):
     emprunter = relationship("User", foreign_keys=[id_user2], back_populates="emprunts_emprunter")
     livre = relationship("Livre", back_populates="emprunts")
     messages = relationship("Message", back_populates="emprunt", cascade="all, delete-orphan")
+    message_archives = relationship("MessageArchive", back_populates="emprunt", cascade="all, delete-orphan")
 
 
-class BibliothequePersonnelle(Base):
-    __tablename__ = "BibliothequePersonnelle"
+class Oeuvre(Base):
+    __tablename__ = "Oeuvre"
+    __table_args__ = (Index("idx_oeuvre_source", "Source", "SourceID"),)
 
     id = Column("ID", Integer, primary_key=True, index=True)
-    user_id = Column("UserID", Integer, ForeignKey("User.ID"), nullable=False, index=True)
+    # isbn:…, <source>:<id> ou titre:<titre normalisé>|<auteur normalisé>
+    cle = Column("Cle", String(191), unique=True, nullable=False)
+    isbn = Column("ISBN", String(13), nullable=True, index=True)
+    source = Column("Source", String(50), nullable=False, default="google_books")
+    source_id = Column("SourceID", String(255), nullable=True)
     title = Column("Title", String(255), nullable=False)
     authors = Column("Authors", JSON, nullable=True)
     cover_url = Column("CoverUrl", String(512), nullable=True)
     info_link = Column("InfoLink", String(512), nullable=True)
     description = Column("Description", String(2000), nullable=True)
+    created_at = Column("CreatedAt", DateTime, default=datetime.utcnow, nullable=False)
+
+    exemplaires = relationship("BibliothequePersonnelle", back_populates="oeuvre")
+
+
+def _oeuvre_field(name):
+    # Les métadonnées vivent sur l'oeuvre partagée ; avant le flush, elles sont gardées sur
+    # l'exemplaire pour que oeuvres.py retrouve ou crée l'oeuvre correspondante.
+    def getter(self):
+        if self.oeuvre is not None:
+            return getattr(self.oeuvre, name)
+        return self.__dict__.get("_oeuvre_fields", {}).get(name)
+
+    def setter(self, value):
+        if self.oeuvre is not None:
+            setattr(self.oeuvre, name, value)
+        else:
+            self.__dict__.setdefault("_oeuvre_fields", {})[name] = value
+
+    return property(getter, setter)
+
+
+class BibliothequePersonnelle(Base):
+    __tablename__ = "BibliothequePersonnelle"
+    # Pagination par clé de /me et /user/{id} : (UserID, CreatedAt, ID) couvre filtre et tri
+    __table_args__ = (Index("idx_biblio_user_created", "UserID", "CreatedAt", "ID"),)
+
+    id = Column("ID", Integer, primary_key=True, index=True)
+    user_id = Column("UserID", Integer, ForeignKey("User.ID"), nullable=False, index=True)
+    oeuvre_id = Column("OeuvreID", Integer, ForeignKey("Oeuvre.ID"), nullable=False, index=True)
+    title = Column("Title", String(255), nullable=False)
     source = Column("Source", String(50), nullable=False, default="google_books")
     source_id = Column("SourceID", String(255), nullable=True)
     created_at = Column("CreatedAt", DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship("User", back_populates="personal_books")
+    oeuvre = relationship("Oeuvre", back_populates="exemplaires", lazy="joined")
+
+    authors = _oeuvre_field("authors")
+    cover_url = _oeuvre_field("cover_url")
+    info_link = _oeuvre_field("info_link")
+    description = _oeuvre_field("description")
+    isbn = _oeuvre_field("isbn")
 
 class Message(Base):
     __tablename__ = "message"
@@ -78,3 +124,17 @@ class Message(Base):
 
     emprunt = relationship("Emprunt", back_populates="messages")
     sender = relationship("User", foreign_keys=[id_sender], backref="sent_messages")
+
+
+class MessageArchive(Base):
+    __tablename__ = "MessageArchive"
+
+    id = Column("ID", Integer, primary_key=True, index=True)
+    id_emprunt = Column("IDEmprunt", Integer, ForeignKey("Emprunt.ID"), nullable=False, index=True)
+    first_message_at = Column("FirstMessageAt", DateTime, nullable=False)
+    last_message_at = Column("LastMessageAt", DateTime, nullable=False)
+    message_count = Column("MessageCount", Integer, nullable=False)
+    payload = Column("Payload", LargeBinary(length=2**24), nullable=False)
+    archived_at = Column("ArchivedAt", DateTime, default=datetime.utcnow, nullable=False)
+
+    emprunt = relationship("Emprunt", back_populates="message_archives")
@@ -0,0 +1,13 @@
+import re
+import unicodedata
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def strip_accents(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_text(value) -> str:
+    return NON_ALNUM.sub(" ", strip_accents(value or "").lower()).strip()
@@ -0,0 +1,170 @@
+import json
+from typing import Dict, Optional
+
+from sqlalchemy import JSON, Column, Integer, MetaData, String, Table, bindparam, event, inspect, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import BibliothequePersonnelle, Oeuvre
+from normalization import normalize_text
+
+LEGACY_COLUMNS = ("Authors", "CoverUrl", "InfoLink", "Description")
+MIGRATION_BATCH_SIZE = 1000
+KEY_LENGTH = 191
+
+
+def normalize_isbn(value) -> Optional[str]:
+    digits = "".join(c for c in str(value or "") if c.isdigit() or c in "xX").upper()
+    if len(digits) == 10:
+        # Un ISBN-10 et son ISBN-13 désignent la même édition
+        core = "978" + digits[:9]
+        check = (10 - sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(core)) % 10) % 10
+        return core + str(check)
+    if len(digits) == 13 and digits.isdigit():
+        return digits
+    return None
+
+
+def work_key(isbn: Optional[str], source: Optional[str], source_id: Optional[str], title: str, authors) -> str:
+    if isbn:
+        return f"isbn:{isbn}"
+    if source_id:
+        return f"{source or 'google_books'}:{source_id}"[:KEY_LENGTH]
+    first_author = authors[0] if authors and isinstance(authors[0], str) else ""
+    return f"titre:{normalize_text(title)}|{normalize_text(first_author)}"[:KEY_LENGTH]
+
+
+def find_oeuvre(db: Session, key: str, isbn: Optional[str], source: Optional[str], source_id: Optional[str]):
+    criteria = [Oeuvre.cle == key]
+    if isbn:
+        criteria.append(Oeuvre.isbn == isbn)
+    if source_id:
+        criteria.append((Oeuvre.source == source) & (Oeuvre.source_id == source_id))
+    return db.query(Oeuvre).filter(or_(*criteria)).order_by(Oeuvre.id).first()
+
+
+@event.listens_for(Session, "before_flush")
+def _attach_oeuvres(session, flush_context, instances):
+    created: Dict[str, Oeuvre] = {}
+    for obj in list(session.new):
+        if not isinstance(obj, BibliothequePersonnelle) or obj.oeuvre is not None or obj.oeuvre_id is not None:
+            continue
+        fields = obj.__dict__.pop("_oeuvre_fields", {})
+        isbn = normalize_isbn(fields.get("isbn"))
+        source = obj.source or "google_books"
+        key = work_key(isbn, source, obj.source_id, obj.title, fields.get("authors"))
+        oeuvre = created.get(key)
+        if oeuvre is None:
+            with session.no_autoflush:
+                oeuvre = find_oeuvre(session, key, isbn, source, obj.source_id)
+        if oeuvre is None:
+            oeuvre = Oeuvre(cle=key, isbn=isbn, source=source, source_id=obj.source_id, title=obj.title)
+            session.add(oeuvre)
+        created[key] = oeuvre
+        # Un nouvel exemplaire peut compléter une oeuvre connue (couverture, ISBN...)
+        for name, value in dict(fields, isbn=isbn).items():
+            if value and not getattr(oeuvre, name):
+                setattr(oeuvre, name, value)
+        obj.oeuvre = oeuvre
+
+
+def add_personal_book(db: Session, book: BibliothequePersonnelle) -> BibliothequePersonnelle:
+    fields = dict(book.__dict__.get("_oeuvre_fields", {}))
+    db.add(book)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Deux ajouts simultanés de la même oeuvre : l'autre transaction l'a créée, on s'y rattache
+        db.rollback()
+        book = BibliothequePersonnelle(user_id=book.user_id, title=book.title, source=book.source,
+                                       source_id=book.source_id, **fields)
+        db.add(book)
+        db.commit()
+    db.refresh(book)
+    return book
+
+
+OEUVRE_INDEX = "ix_BibliothequePersonnelle_OeuvreID"
+
+
+def _constrain_oeuvre_id(engine) -> None:
+    # Le DDL MySQL n'est pas transactionnel : chaque étape vérifie l'existant pour qu'une migration interrompue reprenne
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        if OEUVRE_INDEX not in {index["name"] for index in inspector.get_indexes("BibliothequePersonnelle")}:
+            conn.execute(text(f"CREATE INDEX {OEUVRE_INDEX} ON BibliothequePersonnelle (OeuvreID)"))
+        if engine.dialect.name == "sqlite":
+            # SQLite ne sait pas ajouter de contrainte à une table existante
+            return
+        columns = {column["name"]: column for column in inspector.get_columns("BibliothequePersonnelle")}
+        if columns["OeuvreID"]["nullable"]:
+            conn.execute(text("ALTER TABLE BibliothequePersonnelle MODIFY OeuvreID INT NOT NULL"))
+        if not any(fk["referred_table"] == "Oeuvre" for fk in inspector.get_foreign_keys("BibliothequePersonnelle")):
+            conn.execute(text(
+                "ALTER TABLE BibliothequePersonnelle ADD CONSTRAINT fk_bibliotheque_oeuvre "
+                "FOREIGN KEY (OeuvreID) REFERENCES Oeuvre (ID)"
+            ))
+
+
+def migrate_personal_books(engine) -> int:
+    """Rattache les exemplaires de l'ancien schéma à des oeuvres dédupliquées."""
+    columns = {column["name"] for column in inspect(engine).get_columns("BibliothequePersonnelle")}
+    legacy = [name for name in LEGACY_COLUMNS if name in columns]
+    if not legacy:
+        if "OeuvreID" in columns:
+            _constrain_oeuvre_id(engine)
+        return 0
+
+    legacy_types = {"Authors": JSON, "CoverUrl": String(512), "InfoLink": String(512), "Description": String(2000)}
+    # Seules les colonnes encore présentes : une reprise peut suivre une suppression partielle
+    table = Table(
+        "BibliothequePersonnelle", MetaData(),
+        Column("ID", Integer, primary_key=True), Column("Title", String(255)),
+        Column("Source", String(50)), Column("SourceID", String(255)), Column("OeuvreID", Integer),
+        *(Column(name, legacy_types[name]) for name in legacy),
+    )
+    oeuvres = Oeuvre.__table__
+    migrated = 0
+    with engine.begin() as conn:
+        if "OeuvreID" not in columns:
+            conn.execute(text('ALTER TABLE BibliothequePersonnelle ADD COLUMN OeuvreID INTEGER NULL'))
+        keys = dict(conn.execute(select(oeuvres.c.Cle, oeuvres.c.ID)).all())
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(table).where(table.c.ID > last_id, table.c.OeuvreID.is_(None))
+                .order_by(table.c.ID).limit(MIGRATION_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].ID
+            row_keys = {}
+            new_works = {}
+            for row in rows:
+                values = row._mapping
+                authors = values.get("Authors")
+                authors = json.loads(authors) if isinstance(authors, str) else authors
+                key = work_key(None, row.Source, row.SourceID, row.Title, authors)
+                row_keys[row.ID] = key
+                if key not in keys and key not in new_works:
+                    new_works[key] = {
+                        "Cle": key, "Source": row.Source or "google_books", "SourceID": row.SourceID,
+                        "Title": row.Title, "Authors": authors, "CoverUrl": values.get("CoverUrl"),
+                        "InfoLink": values.get("InfoLink"), "Description": values.get("Description"),
+                    }
+            if new_works:
+                conn.execute(oeuvres.insert(), list(new_works.values()))
+                keys.update(conn.execute(
+                    select(oeuvres.c.Cle, oeuvres.c.ID).where(oeuvres.c.Cle.in_(new_works))
+                ).all())
+            conn.execute(
+                table.update().where(table.c.ID == bindparam("row_id")).values(OeuvreID=bindparam("oeuvre_id")),
+                [{"row_id": row_id, "oeuvre_id": keys[key]} for row_id, key in row_keys.items()],
+            )
+            migrated += len(rows)
+
+        for name in legacy:
+            conn.execute(text(f"ALTER TABLE BibliothequePersonnelle DROP COLUMN {name}"))
+    _constrain_oeuvre_id(engine)
+    print(f"✅ {migrated} exemplaires rattachés à {len(keys)} oeuvres")
+    return migrated
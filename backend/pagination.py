@@ -0,0 +1,60 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.orm import Query
+
+CURSOR_DESCRIPTION = "Curseur opaque renvoyé dans next_cursor (vide pour la première page) : active la pagination par clé"
+INCLUDE_TOTAL_DESCRIPTION = "Calculer total et total_pages (inutile pour une simple page suivante)"
+
+
+def total_pages_for(total: Optional[int], page_size: int) -> Optional[int]:
+    if total is None:
+        return None
+    return math.ceil(total / page_size) if total > 0 else 1
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else int(value)
+            for column, value in zip(columns, payload)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+
+def _after(columns: Sequence, values: Sequence, descending: bool):
+    # (a, b) > (va, vb) développé en a > va OR (a = va AND b > vb) : utilisable par l'index composite
+    column, value = columns[0], values[0]
+    strictly = column < value if descending else column > value
+    if len(columns) == 1:
+        return strictly
+    return or_(strictly, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def keyset_page(query: Query, columns: Sequence, cursor: Optional[str], page_size: int,
+                descending: bool = False) -> Tuple[List, Optional[str]]:
+    """Une page après le curseur, et le curseur de la page suivante (None à la fin)."""
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
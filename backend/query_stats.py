@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+# Un même plan n'est redemandé qu'après cet intervalle : une requête lente répétée ne double pas la charge
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+# WARNING : requêtes lentes seulement ; INFO : une ligne JSON par requête HTTP en plus
+SQL_LOG_LEVEL = os.getenv("SQL_LOG_LEVEL", "WARNING")
+
+logger = logging.getLogger("livre2main.sql")
+logger.setLevel(SQL_LOG_LEVEL)
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Requête sans ses valeurs : les exécutions d'une même requête se regroupent sous un seul texte."""
+    statement = statement.replace("%s", "?")
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("(?, ...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+class QueryStats:
+    __slots__ = ("lock", "count", "total_ms", "slowest_ms", "slowest_sql")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        with self.lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_sql = statement
+
+    def server_timing(self) -> str:
+        with self.lock:
+            timing = f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+            if self.count:
+                timing += f", db-slowest;dur={self.slowest_ms:.1f}"
+            return timing
+
+
+# Statistiques de la requête HTTP en cours ; le threadpool copie le contexte, l'objet est partagé
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+class SlowQueryLog:
+    def __init__(self, size: int = SLOW_QUERY_LOG_SIZE):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+        self.explained: Dict[str, float] = {}
+
+    def should_explain(self, normalized: str) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            if now - self.explained.get(normalized, float("-inf")) < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+                return False
+            self.explained[normalized] = now
+            return True
+
+    def add(self, entry: dict) -> None:
+        with self.lock:
+            self.entries.append(entry)
+
+    def recent(self) -> List[dict]:
+        with self.lock:
+            return list(reversed(self.entries))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.explained.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    prefix = {"sqlite": "EXPLAIN QUERY PLAN ", "mysql": "EXPLAIN ", "postgresql": "EXPLAIN "}.get(conn.dialect.name)
+    if prefix is None:
+        return None
+    # Curseur DBAPI brut : pas d'événement SQLAlchemy, donc ni comptage ni récursion
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" | ".join(str(value) for value in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN impossible: {e}"]
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is None:
+        return
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        normalized = normalize_sql(statement)
+        entry = {
+            "event": "slow_query",
+            "duration_ms": round(elapsed_ms, 2),
+            "sql": normalized,
+            "plan": _explain(conn, statement, parameters) if not executemany and slow_query_log.should_explain(normalized) else None,
+        }
+        slow_query_log.add(entry)
+        logger.warning(json.dumps(entry, ensure_ascii=False))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None:
+        context.connection.info.pop("query_started_at", None)
+
+
+class QueryStatsMiddleware:
+    """Nombre de requêtes SQL et temps base par requête HTTP : en-tête Server-Timing et ligne de log JSON.
+    Une réponse en flux envoie ses en-têtes avant la fin de ses lectures : seule la ligne de log les compte toutes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+                headers.append("Server-Timing", f"{stats.server_timing()}, app;dur={elapsed_ms:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps({
+                    "event": "request",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+                    "db_queries": stats.count,
+                    "db_ms": round(stats.total_ms, 2),
+                    "db_slowest_ms": round(stats.slowest_ms, 2),
+                    "db_slowest_sql": normalize_sql(stats.slowest_sql) if stats.slowest_sql else None,
+                }, ensure_ascii=False))
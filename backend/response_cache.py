@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Set, Tuple, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from cache import get_version, invalidate
+from compression import compress, min_size_for, negotiate
+from singleflight import singleflight
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Une réponse plus grosse (bibliothèque de 10 000 livres) ne mérite pas d'évincer tout le reste
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+
+# Toute écriture sur le catalogue ou sur une oeuvre touche des réponses dont on ne connaît pas la liste
+LIVRES_TAG = "livres"
+OEUVRES_TAG = "oeuvres"
+USERS_TAG = "users"
+MESSAGES_TAG = "messages"
+
+
+def livre_tag(livre_id: int) -> str:
+    return f"livre:{livre_id}"
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def library_tag(user_id: int) -> str:
+    return f"library:{user_id}"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    tags: Tuple[Tuple[str, int], ...]  # (tag, version au moment de la mise en cache)
+    encoded: Dict[str, bytes]  # variantes précompressées, par Content-Encoding
+
+
+class ResponseCache:
+    # LRU borné en nombre d'entrées et en octets. Chaque entrée retient la version de ses tags :
+    # une écriture faite ailleurs (autre processus) la rend caduque même sans purge locale.
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+            self.keys_by_tag: Dict[str, Set[str]] = defaultdict(set)
+            self.size = 0
+            self.hits = self.misses = self.evictions = self.purged = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body) + sum(len(data) for data in entry.encoded.values())
+        for tag, _ in entry.tags:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_tag[tag]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+        # Lecture des versions hors verrou : avec SQLite ou Redis, c'est une entrée/sortie
+        fresh = entry is not None and all(get_version(tag) == version for tag, version in entry.tags)
+        with self.lock:
+            # L'entrée a pu être remplacée ou évincée pendant la vérification : on ne touche qu'à celle lue
+            current = entry is not None and self.entries.get(key) is entry
+            if fresh:
+                if current:
+                    self.entries.move_to_end(key)
+                self.hits += 1
+                return entry.body
+            if current:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def set(self, key: str, body: bytes, tags: Iterable[str], versions: Dict[str, int]) -> None:
+        if len(body) > self.max_entry_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = CachedResponse(body, tuple((tag, versions[tag]) for tag in tags), {})
+            self.size += len(body)
+            for tag in tags:
+                self.keys_by_tag[tag].add(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def encoded(self, key: str, body: bytes, encoding: str) -> bytes:
+        """Variante compressée de body, calculée une fois puis gardée avec l'entrée."""
+        entry = self.entries.get(key)
+        if entry is not None and entry.body is body and encoding in entry.encoded:
+            return entry.encoded[encoding]
+        data = compress(body, encoding)
+        with self.lock:
+            entry = self.entries.get(key)
+            # L'entrée a pu être remplacée ou évincée pendant la compression
+            if entry is not None and entry.body is body and encoding not in entry.encoded:
+                entry.encoded[encoding] = data
+                self.size += len(data)
+                self._evict()
+        return data
+
+    def purge(self, *tags: str) -> None:
+        invalidate(*tags)
+        with self.lock:
+            for tag in tags:
+                for key in list(self.keys_by_tag.get(tag, ())):
+                    self._drop(key)
+                    self.purged += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "purged": self.purged,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def request_key(request: Request) -> str:
+    return request.url.path + "?" + "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+
+
+def cached_json(request: Request, tags: Iterable[str], schema: Type[BaseModel], build: Callable,
+                viewer: Optional[int] = None) -> Response:
+    """Réponse JSON servie depuis le cache, ou construite par build() puis mise en cache.
+
+    La réponse ne doit dépendre de l'appelant que par l'authentification, déjà vérifiée par les dépendances,
+    sauf si viewer est fourni : une entrée par utilisateur connecté.
+    """
+    key = request_key(request)
+    if viewer is not None:
+        key += f"#viewer={viewer}"
+    body = response_cache.get(key)
+    if body is not None:
+        return _json_response(request, key, body, "HIT")
+
+    tags = list(tags)
+    # Versions relevées avant la lecture : une écriture concurrente rendra l'entrée caduque
+    versions = {tag: get_version(tag) for tag in tags}
+
+    def render() -> bytes:
+        result = build()
+        if isinstance(result, Response):
+            body = result.body
+        else:
+            body = schema.model_validate(result).model_dump_json().encode()
+        response_cache.set(key, body, tags, versions)
+        return body
+
+    # Entrée expirée sous forte charge : un seul calcul pour toutes les requêtes identiques en cours
+    body = singleflight.do((key, tuple(sorted(versions.items()))), render)
+    return _json_response(request, key, body, "MISS")
+
+
+def _json_response(request: Request, key: str, body: bytes, status: str) -> Response:
+    headers = {"X-Cache": status}
+    encoding = negotiate(request.headers.get("accept-encoding")) if len(body) >= min_size_for(request.url.path) else None
+    if encoding is None:
+        return Response(content=body, media_type="application/json", headers=headers)
+    # Variante précompressée : le middleware de compression la laisse passer telle quelle
+    headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(content=response_cache.encoded(key, body, encoding), media_type="application/json", headers=headers)
@@ -4,12 +4,15 @@ from typing import Optional, List
 import base64
 import requests
 import os
+import time
 from io import BytesIO
 from PIL import Image
 from database import get_db
 from models import Livre, User, BibliothequePersonnelle
 from schemas import Livre as LivreSchema
 from routes.user_routes import get_current_user
+from oeuvres import add_personal_book
+from metrics import ollama_duration, ollama_errors
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
@@ -67,11 +70,21 @@ RÉPONDS UNIQUEMENT avec le JSON.""",
         }
 
         print(f"Envoi de la requête à {OLLAMA_API_URL}/api/generate...")
-        response = requests.post(
-            f"{OLLAMA_API_URL}/api/generate",
-            json=payload,
-            timeout=120
-        )
+        started_at = time.perf_counter()
+        try:
+            response = requests.post(
+                f"{OLLAMA_API_URL}/api/generate",
+                json=payload,
+                timeout=120
+            )
+        except requests.Timeout:
+            ollama_errors.inc(reason="timeout")
+            raise
+        except requests.RequestException:
+            ollama_errors.inc(reason="connection")
+            raise
+        finally:
+            ollama_duration.observe(time.perf_counter() - started_at)
 
         print(f"Statut de la réponse: {response.status_code}")
 
@@ -95,7 +108,11 @@ RÉPONDS UNIQUEMENT avec le JSON.""",
 
             print(f"JSON extrait: {content}")
 
-            book_info = json.loads(content)
+            try:
+                book_info = json.loads(content)
+            except json.JSONDecodeError:
+                ollama_errors.inc(reason="invalid_response")
+                raise
 
             livres_detectes = book_info.get("livres", [])
 
@@ -120,6 +137,7 @@ RÉPONDS UNIQUEMENT avec le JSON.""",
             print(f"Détails: {result_data}")
             return result_data
         else:
+            ollama_errors.inc(reason=f"http_{response.status_code}")
             error_msg = f"Erreur Ollama: {response.status_code} - {response.text}"
             print(f"❌ {error_msg}")
             raise Exception(error_msg)
@@ -169,17 +187,13 @@ async def add_detected_book(
     if existing_book:
         raise HTTPException(status_code=400, detail="Ce livre est déjà dans votre bibliothèque")
 
-    new_book = BibliothequePersonnelle(
+    new_book = add_personal_book(db, BibliothequePersonnelle(
         user_id=current_user.id,
         title=nom,
         authors=[auteur],
         source="ai_detection",
         source_id=None
-    )
-
-    db.add(new_book)
-    db.commit()
-    db.refresh(new_book)
+    ))
 
     return {
         "success": True,
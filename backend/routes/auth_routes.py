@@ -5,6 +5,7 @@ from models import User
 from schemas import UserCreate, User as UserSchema, UserLogin, Token
 from auth import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from datetime import timedelta
+from gazetteer import apply_city
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -22,11 +23,11 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         name=user.name,
         surname=user.surname,
         email=user.email,
-        villes=user.villes,
         age=user.age,
         role=user.role,
         mdp=hashed_password
     )
+    apply_city(db_user, user.villes)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
@@ -53,7 +54,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email, "role": user.role}, expires_delta=access_token_expires
+            data={"sub": user.email, "uid": user.id, "role": user.role}, expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
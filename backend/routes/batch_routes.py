@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import User
+from routes.user_routes import BATCH_USER_STATE, get_current_user
+
+router = APIRouter(tags=["Batch"])
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+# Sous-requêtes simultanées : sous la taille du pool SQLAlchemy (5 par défaut) pour ne pas le vider
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    path: str
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+
+def _sub_scope(request: Request, path: str, current_user: User) -> dict:
+    url = urlsplit(path)
+    headers = [(b"authorization", request.headers["authorization"].encode("latin-1"))]
+    return {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": "",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+        "state": {BATCH_USER_STATE: current_user},
+    }
+
+
+async def _dispatch(app, scope: dict) -> dict:
+    status_code, headers, chunks = 500, {}, []
+    done = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # Pas de corps pour un GET ; ensuite on attend la fin de la réponse comme un client resté connecté
+            await done.wait()
+            return {"type": "http.disconnect"}
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code, headers
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware a déjà produit le 500 ; l'erreur ne doit pas faire échouer tout le lot
+        print(f"❌ Batch : erreur sur {scope['path']}")
+        return {"status": 500, "body": {"detail": "Erreur interne"}}
+    finally:
+        done.set()
+
+    body = b"".join(chunks)
+    if not body:
+        content = None
+    elif headers.get("content-type", "").startswith("application/json"):
+        content = json.loads(body)
+    else:
+        content = body.decode("utf-8", errors="replace")
+    return {"status": status_code, "body": content}
+
+
+@router.post("/batch")
+async def batch(
+    payload: BatchRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if len(payload.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"Trop de requêtes dans le lot (max {BATCH_MAX_REQUESTS})")
+
+    # Utilisateur détaché avec ses attributs chargés ; la connexion retourne au pool pour les sous-requêtes
+    db.close()
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(item: BatchItem) -> dict:
+        if not item.path.startswith("/") or urlsplit(item.path).path.rstrip("/") == "/batch":
+            result = {"status": 400, "body": {"detail": "Chemin invalide"}}
+        else:
+            async with semaphore:
+                result = await _dispatch(request.app, _sub_scope(request, item.path, current_user))
+        return {"id": item.id, "path": item.path, **result}
+
+    return {"responses": await asyncio.gather(*(run(item) for item in payload.requests))}
@@ -1,97 +1,165 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fast_json import FastJSONResponse
 from sqlalchemy.orm import Session
-from typing import List
-import math
+from typing import List, Optional
 
 from database import get_db
-from models import BibliothequePersonnelle, User
-from schemas import PersonalBook, PersonalBookBase, PersonalBookCreate, PersonalBooksPaginated
+from models import BibliothequePersonnelle, Oeuvre, User
+from schemas import PersonalBook, PersonalBookCreate, PersonalBookIn, PersonalBooksPaginated
 from routes.user_routes import get_current_user
+from oeuvres import add_personal_book
+from counts import count_cache, library_count_tag
+from fields import FIELDS_DESCRIPTION, load_fields, parse_fields, project
+from conditional import conditional_get
+from hooks import on_commit
+from pagination import CURSOR_DESCRIPTION, INCLUDE_TOTAL_DESCRIPTION, keyset_page, total_pages_for
+from response_cache import OEUVRES_TAG, cached_json, library_tag, response_cache, user_tag
+from streaming import stream_json_page
+from trigram_index import SIMILARITY_THRESHOLD, trigram_index
 
 router = APIRouter(prefix="/bibliotheque-personnelle", tags=["Bibliotheque personnelle"])
 
 
+@on_commit(BibliothequePersonnelle)
+def _purge_cached_library(change):
+    user_ids = {change.values.get("user_id"), change.previous.get("user_id")} - {None}
+    response_cache.purge(*(library_tag(user_id) for user_id in user_ids))
+
+
+@on_commit(Oeuvre)
+def _purge_cached_works(change):
+    # Une oeuvre complétée change l'affichage de tous ses exemplaires, quels que soient leurs propriétaires
+    if change.action != "insert":
+        response_cache.purge(OEUVRES_TAG)
+
+
+conditional_get("/bibliotheque-personnelle/me", lambda current_user_id: [library_tag(current_user_id), OEUVRES_TAG])
+conditional_get(
+    "/bibliotheque-personnelle/user/{user_id:int}",
+    lambda user_id, current_user_id: [library_tag(user_id), user_tag(user_id), OEUVRES_TAG],
+)
+
+
+def _library_page(db: Session, user_id: int, page: int, page_size: int, cursor: Optional[str],
+                  include_total: bool, stream: bool = False, fields: Optional[str] = None):
+    selected = parse_fields(fields, PersonalBook)
+    query = db.query(BibliothequePersonnelle).filter(BibliothequePersonnelle.user_id == user_id)
+    total = count_cache.get(library_count_tag(user_id), query.count) if include_total else None
+    envelope = {
+        "total": total,
+        "page": None if cursor is not None else page,
+        "page_size": page_size,
+        "total_pages": total_pages_for(total, page_size),
+    }
+    sort_columns = [BibliothequePersonnelle.created_at, BibliothequePersonnelle.id]
+    query = load_fields(query, BibliothequePersonnelle, selected, always=sort_columns)
+
+    if cursor is not None:
+        # Tri (CreatedAt, ID) décroissant : l'index idx_biblio_user_created sert filtre, tri et reprise
+        books, next_cursor = keyset_page(query, sort_columns, cursor, page_size, descending=True)
+    else:
+        skip = (page - 1) * page_size
+        books = (
+            query
+            .order_by(BibliothequePersonnelle.created_at.desc())
+            .offset(skip)
+            .limit(page_size)
+        )
+        next_cursor = None
+        if stream:
+            return stream_json_page(books, PersonalBook, dict(envelope, next_cursor=None), fields=selected)
+        books = books.all()
+
+    if selected is not None:
+        items = [project(book, PersonalBook, selected) for book in books]
+        return FastJSONResponse(dict(envelope, next_cursor=next_cursor, items=items))
+    return PersonalBooksPaginated(items=books, next_cursor=next_cursor, **envelope)
+
+
 @router.post("/", response_model=PersonalBook, status_code=status.HTTP_201_CREATED)
 def add_book_to_personal_library(
-    book: PersonalBookBase,
+    book: PersonalBookIn,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     payload = PersonalBookCreate(**book.dict(), user_id=current_user.id)
-    db_book = BibliothequePersonnelle(**payload.dict())
-    db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
-    return db_book
+    return add_personal_book(db, BibliothequePersonnelle(**payload.dict()))
 
 
 @router.get("/me", response_model=PersonalBooksPaginated)
 def list_my_personal_library(
     page: int = Query(1, ge=1, description="Numéro de page (commence à 1)"),
     page_size: int = Query(10, ge=1, le=10000, description="Nombre d'éléments par page"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(True, description=INCLUDE_TOTAL_DESCRIPTION),
+    stream: bool = Query(False, description="Encoder la page au fil de la lecture (grandes pages)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    total = (
-        db.query(BibliothequePersonnelle)
-        .filter(BibliothequePersonnelle.user_id == current_user.id)
-        .count()
-    )
-    skip = (page - 1) * page_size
-    books = (
-        db.query(BibliothequePersonnelle)
-        .filter(BibliothequePersonnelle.user_id == current_user.id)
-        .order_by(BibliothequePersonnelle.created_at.desc())
-        .offset(skip)
-        .limit(page_size)
-        .all()
-    )
-    total_pages = math.ceil(total / page_size) if total > 0 else 1
-
-    return PersonalBooksPaginated(
-        items=books,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages
-    )
+    return _library_page(db, current_user.id, page, page_size, cursor, include_total, stream, fields)
+
+
+@router.get("/similar")
+def find_similar_titles(
+    title: str = Query(..., min_length=1, max_length=255),
+    threshold: float = Query(SIMILARITY_THRESHOLD, gt=0, le=1, description="Similarité minimale (trigrammes)"),
+    limit: int = Query(10, ge=1, le=50),
+    owners_per_title: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    trigram_index.ensure_loaded(db)
+    # Un exemplaire de plus pour compenser l'exclusion de l'utilisateur courant
+    matches = trigram_index.similar(title, threshold=threshold, limit=limit, owners_limit=owners_per_title + 1)
+
+    owner_ids = {user_id for match in matches for user_id in match.owners if user_id != current_user.id}
+    users = {
+        row.id: row
+        for row in db.query(User.id, User.name, User.surname, User.villes).filter(User.id.in_(owner_ids))
+    }
+
+    results = []
+    for match in matches:
+        owners = [users[user_id] for user_id in match.owners if user_id in users][:owners_per_title]
+        results.append({
+            "title": match.title,
+            "similarity": match.similarity,
+            "owner_count": match.owner_count,
+            "owners": [
+                {"ID": owner.id, "Name": owner.name, "Surname": owner.surname, "Villes": owner.villes}
+                for owner in owners
+            ],
+        })
+    return results
 
 
 @router.get("/user/{user_id}", response_model=PersonalBooksPaginated)
 def get_user_personal_library(
     user_id: int,
+    request: Request,
     page: int = Query(1, ge=1, description="Numéro de page (commence à 1)"),
     page_size: int = Query(100, ge=1, le=10000, description="Nombre d'éléments par page"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(True, description=INCLUDE_TOTAL_DESCRIPTION),
+    stream: bool = Query(False, description="Encoder la page au fil de la lecture (grandes pages)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    if stream:
+        if not db.query(User.id).filter(User.id == user_id).first():
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        return _library_page(db, user_id, page, page_size, cursor, include_total, stream, fields)
 
-    total = (
-        db.query(BibliothequePersonnelle)
-        .filter(BibliothequePersonnelle.user_id == user_id)
-        .count()
-    )
-    skip = (page - 1) * page_size
-    books = (
-        db.query(BibliothequePersonnelle)
-        .filter(BibliothequePersonnelle.user_id == user_id)
-        .order_by(BibliothequePersonnelle.created_at.desc())
-        .offset(skip)
-        .limit(page_size)
-        .all()
-    )
-    total_pages = math.ceil(total / page_size) if total > 0 else 1
-
-    return PersonalBooksPaginated(
-        items=books,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages
-    )
+    def build():
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        return _library_page(db, user_id, page, page_size, cursor, include_total, fields=fields)
+
+    tags = [library_tag(user_id), user_tag(user_id), OEUVRES_TAG]
+    return cached_json(request, tags, PersonalBooksPaginated, build)
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_personal_book(
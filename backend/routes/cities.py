@@ -1,15 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, Query
+from fast_json import FastJSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from auth import SECRET_KEY, ALGORITHM
 from sqlalchemy.orm import Session
+from typing import Optional
 from database import get_db
-from models import User
+from models import User, BibliothequePersonnelle, Livre
+from cache import get_version, invalidate, make_etag, etag_matches
+from gazetteer import resolve_city
+from geo_index import geo_index, book_keys, user_point
+from compression import compression_threshold
+from conditional import conditional_get
+from hooks import on_commit
+from singleflight import singleflight
+from routes.user_routes import get_current_user
 
 router = APIRouter(prefix="/api", tags=["API"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+ASSISTANT_EMAIL = "assistant@livre2main.com"
+USERS_CITIES_TAG = "users-cities"
+USER_MAP_FIELDS = {"name", "surname", "villes", "email", "latitude", "longitude"}
+
+_snapshot = {"version": None, "cities": {}, "coordinates": {}, "owners": {}, "users": {}}
+
+
+@on_commit(User, BibliothequePersonnelle)
+def _invalidate_users_cities(change):
+    if change.model is User and change.action == "update" and not USER_MAP_FIELDS & set(change.previous):
+        return
+    invalidate(USERS_CITIES_TAG)
+
+
+conditional_get("/api/users-cities", lambda current_user_id: [USERS_CITIES_TAG], auth=False)
+# Interrogée en boucle par la carte : même une petite réponse vaut d'être compressée
+compression_threshold("/api/users-cities", 512)
+
+
+def build_users_cities_snapshot(db: Session) -> dict:
+    rows = (
+        db.query(
+            User.id, User.name, User.surname, User.villes,
+            User.latitude, User.longitude, BibliothequePersonnelle.source_id
+        )
+        .outerjoin(BibliothequePersonnelle, BibliothequePersonnelle.user_id == User.id)
+        .filter(User.email != ASSISTANT_EMAIL, User.villes.isnot(None), User.villes != "")
+        .order_by(User.id)
+        .all()
+    )
+
+    cities = {}
+    coordinates = {}
+    owners = {}
+    users = {}
+    for user_id, name, surname, villes, latitude, longitude, source_id in rows:
+        if user_id not in users:
+            entry = {"ID": user_id, "Name": name, "Surname": surname, "books": []}
+            users[user_id] = (villes, entry)
+            cities.setdefault(villes, []).append(entry)
+            if villes not in coordinates:
+                if latitude is None:
+                    # Comptes créés avant le géocodage à l'inscription
+                    city = resolve_city(villes)
+                    if city:
+                        latitude, longitude = city.latitude, city.longitude
+                if latitude is not None:
+                    coordinates[villes] = [latitude, longitude]
+        entry = users[user_id][1]
+        if source_id and user_id not in owners.get(source_id, ()):
+            entry["books"].append(source_id)
+            owners.setdefault(source_id, set()).add(user_id)
+
+    return {"cities": cities, "coordinates": coordinates, "owners": owners, "users": users}
+
+
+def get_users_cities_snapshot(db: Session) -> dict:
+    version = get_version(USERS_CITIES_TAG)
+    if _snapshot["version"] == version:
+        return _snapshot
+
+    def rebuild():
+        global _snapshot
+        _snapshot = dict(build_users_cities_snapshot(db), version=version)
+        return _snapshot
+
+    return singleflight.do((USERS_CITIES_TAG, version), rebuild)
+
+
 @router.get("/me/city")
 def get_my_city(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     try:
@@ -25,30 +104,100 @@ def get_my_city(token: str = Depends(oauth2_scheme), db: Session = Depends(get_d
     if not user or not user.villes:
         raise HTTPException(status_code=404, detail="City not found")
 
-    return {"city": user.villes}
+    return {"city": user.villes, "latitude": user.latitude, "longitude": user.longitude}
+
 
 @router.get("/users-cities")
-def get_users_cities(db: Session = Depends(get_db)):
-    users = db.query(User).filter(User.email != "assistant@livre2main.com").all()
-
-    result = []
-    for user in users:
-        personal_books = []
-        for book in user.personal_books:
-            personal_books.append({
-                "id": book.id,
-                "title": book.title,
-                "source_id": book.source_id,
-                "authors": book.authors,
-                "cover_url": book.cover_url,
-            })
-
-        result.append({
-            "ID": user.id,
-            "Name": user.name,
-            "Surname": user.surname,
-            "Villes": user.villes,
-            "bibliotheque_personnelle": personal_books
-        })
-
-    return result
+def get_users_cities(
+    book: Optional[str] = None,
+    city: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    snapshot = get_users_cities_snapshot(db)
+    cities = snapshot["cities"]
+    if book:
+        cities = {}
+        for user_id in sorted(snapshot["owners"].get(book, ())):
+            villes, entry = snapshot["users"][user_id]
+            cities.setdefault(villes, []).append(entry)
+    if city:
+        cities = {city: cities[city]} if city in cities else {}
+
+    coordinates = {city: snapshot["coordinates"][city] for city in cities if city in snapshot["coordinates"]}
+    # Dictionnaire déjà sérialisable : orjson directement, sans le parcours de jsonable_encoder
+    return FastJSONResponse({"version": snapshot["version"], "cities": cities, "coordinates": coordinates})
+
+
+@router.get("/nearest-owners")
+def get_nearest_owners(
+    source_id: Optional[str] = None,
+    title: Optional[str] = None,
+    livre_id: Optional[int] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100),
+    max_distance_km: Optional[float] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if livre_id is not None:
+        livre = db.query(Livre).filter(Livre.id == livre_id).first()
+        if not livre:
+            raise HTTPException(status_code=404, detail="Livre non trouvé")
+        title = title or livre.nom
+
+    keys = book_keys(title, source_id)
+    if not keys:
+        raise HTTPException(status_code=400, detail="Précisez un livre (title, source_id ou livre_id)")
+
+    if lat is None or lon is None:
+        point = user_point(current_user.latitude, current_user.longitude, current_user.villes)
+        if not point:
+            raise HTTPException(status_code=400, detail="Position inconnue : précisez lat et lon")
+        lat, lon = point
+
+    geo_index.ensure_loaded(db)
+    nearest = geo_index.nearest(keys, lat, lon, k=k, exclude=current_user.id, max_distance_km=max_distance_km)
+
+    user_ids = [user_id for _, user_id in nearest]
+    users = {
+        row.id: row
+        for row in db.query(User.id, User.name, User.surname, User.villes).filter(User.id.in_(user_ids))
+    }
+
+    return [
+        {
+            "ID": user_id,
+            "Name": users[user_id].name,
+            "Surname": users[user_id].surname,
+            "Villes": users[user_id].villes,
+            "distance_km": round(distance, 2),
+        }
+        for distance, user_id in nearest
+        if user_id in users
+    ]
+
+
+@router.get("/map/clusters")
+def get_map_clusters(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=20),
+    book: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail="Emprise invalide")
+
+    geo_index.ensure_loaded(db)
+    etag = make_etag("clusters", geo_index.version, south, west, north, east, zoom, book or "")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    keys = book_keys(source_id=book) if book else None
+    clusters = geo_index.clusters(south, west, north, east, zoom, keys=keys)
+    return FastJSONResponse({"zoom": zoom, "clusters": clusters}, headers=headers)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+import requests
+
+from cache import etag_matches
+from covers import COVER_VARIANTS, CoverError, cover_store
+from database import get_db
+from models import Oeuvre
+
+router = APIRouter(prefix="/covers", tags=["Couvertures"])
+
+# L'URL d'une oeuvre peut changer de couverture : pas d'immutable, mais l'ETag est l'empreinte du contenu
+COVER_CACHE_CONTROL = "public, max-age=604800"
+
+
+@router.get("/{oeuvre_id}/{variant}")
+def get_cover(
+    oeuvre_id: int,
+    variant: str = Path(..., pattern="^(" + "|".join(COVER_VARIANTS) + ")$"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    cover_url = db.query(Oeuvre.cover_url).filter(Oeuvre.id == oeuvre_id).scalar()
+    if not cover_url:
+        raise HTTPException(status_code=404, detail="Couverture introuvable")
+
+    try:
+        path, digest = cover_store.get(cover_url, variant)
+    except (CoverError, requests.RequestException) as e:
+        print(f"❌ Couverture indisponible (oeuvre {oeuvre_id}): {e}")
+        raise HTTPException(status_code=502, detail="Couverture indisponible pour le moment")
+
+    headers = {"ETag": f'"{digest}"', "Cache-Control": COVER_CACHE_CONTROL}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # FileResponse gère les requêtes Range et If-Range
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from models import Emprunt, User, Message, Livre
 from schemas import Emprunt as EmpruntSchema, EmpruntCreate
 from datetime import datetime
 from routes.user_routes import get_current_user
+from pagination import CURSOR_DESCRIPTION, keyset_page
 from pydantic import BaseModel
 from sqlalchemy import or_, and_, Integer, func
 
@@ -76,7 +77,20 @@ def create_emprunt(emprunt: EmpruntCreate, db: Session = Depends(get_db), curren
     return db_emprunt
 
 @router.get("/", response_model=List[EmpruntSchema])
-def get_all_emprunts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_all_emprunts(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if cursor is not None:
+        # La réponse reste une liste : le curseur suivant passe par un en-tête
+        emprunts, next_cursor = keyset_page(db.query(Emprunt), [Emprunt.id], cursor, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return emprunts
     emprunts = db.query(Emprunt).offset(skip).limit(limit).all()
     return emprunts
 
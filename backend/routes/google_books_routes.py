@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Optional
+import requests
+
+from books_proxy import UpstreamError, cache_key, books_cache
+from models import User
+from routes.user_routes import get_current_user
+
+router = APIRouter(prefix="/google-books", tags=["Google Books"])
+
+
+@router.get("/volumes")
+def search_google_books(
+    q: str = Query(..., min_length=1, max_length=300),
+    start_index: int = Query(0, ge=0, alias="startIndex"),
+    max_results: int = Query(10, ge=1, le=40, alias="maxResults"),
+    print_type: Optional[str] = Query(None, alias="printType"),
+    order_by: Optional[str] = Query(None, alias="orderBy"),
+    lang_restrict: Optional[str] = Query(None, alias="langRestrict"),
+    current_user: User = Depends(get_current_user),
+):
+    params = {
+        "q": q,
+        "startIndex": str(start_index),
+        "maxResults": str(max_results),
+        "printType": print_type,
+        "orderBy": order_by,
+        "langRestrict": lang_restrict,
+    }
+    try:
+        body, cache_status = books_cache.get(params)
+    except UpstreamError as e:
+        # Le message d'erreur de Google est relayé tel quel au frontend
+        return Response(content=e.body, status_code=e.status_code, media_type="application/json")
+    except requests.RequestException as e:
+        print(f"❌ Google Books injoignable ({cache_key(params)}): {e}")
+        raise HTTPException(status_code=502, detail="Google Books est indisponible pour le moment")
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"X-Cache": cache_status, "Cache-Control": "private, max-age=300"},
+    )
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fast_json import FastJSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
 from models import Livre, User
 from schemas import Livre as LivreSchema, LivreCreate, LivreUpdate, LivresPaginated
 from routes.user_routes import get_current_user
+from counts import LIVRES_COUNT_TAG, count_cache
+from fields import FIELDS_DESCRIPTION, load_fields, parse_fields, project
+from conditional import conditional_get
+from hooks import on_commit
+from pagination import CURSOR_DESCRIPTION, INCLUDE_TOTAL_DESCRIPTION, keyset_page, total_pages_for
+from response_cache import LIVRES_TAG, cached_json, livre_tag, response_cache, user_tag
+from search import search_livres as run_search
+from suggest import MAX_SUGGESTIONS, suggest_index
 import math
 
 router = APIRouter(prefix="/livres", tags=["Livres"])
 
+
+@on_commit(Livre)
+def _purge_cached_livre(change):
+    response_cache.purge(LIVRES_TAG, livre_tag(change.values["id"]))
+
+
+conditional_get("/livres/", lambda current_user_id: [LIVRES_TAG], cache_control="public, no-cache", auth=False)
+conditional_get("/livres/{livre_id:int}", lambda livre_id, current_user_id: [livre_tag(livre_id)],
+                cache_control="public, no-cache", auth=False)
+
+
 @router.post("/", response_model=LivreSchema, status_code=status.HTTP_201_CREATED)
 def create_livre(livre: LivreCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     db_livre = Livre(**livre.dict())
@@ -19,13 +39,46 @@ def create_livre(livre: LivreCreate, db: Session = Depends(get_db), current_user
 
 @router.get("/", response_model=LivresPaginated)
 def get_all_livres(
+    request: Request,
+    page: int = Query(1, ge=1, description="Numéro de page (commence à 1)"),
+    page_size: int = Query(10, ge=1, le=100, description="Nombre d'éléments par page"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(True, description=INCLUDE_TOTAL_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+):
+    selected = parse_fields(fields, LivreSchema)
+
+    def build():
+        total = count_cache.get(LIVRES_COUNT_TAG, db.query(Livre).count) if include_total else None
+        envelope = {
+            "total": total,
+            "page": None if cursor is not None else page,
+            "page_size": page_size,
+            "total_pages": total_pages_for(total, page_size),
+        }
+        query = load_fields(db.query(Livre), Livre, selected)
+        if cursor is not None:
+            livres, next_cursor = keyset_page(query, [Livre.id], cursor, page_size)
+        else:
+            skip = (page - 1) * page_size
+            livres, next_cursor = query.offset(skip).limit(page_size).all(), None
+
+        if selected is not None:
+            items = [project(livre, LivreSchema, selected) for livre in livres]
+            return FastJSONResponse(dict(envelope, next_cursor=next_cursor, items=items))
+        return LivresPaginated(items=livres, next_cursor=next_cursor, **envelope)
+
+    return cached_json(request, [LIVRES_TAG], LivresPaginated, build)
+
+@router.get("/search", response_model=LivresPaginated)
+def search_livres_paginated(
+    q: str = Query(..., min_length=1, max_length=200, description="Mots recherchés dans le titre, l'auteur ou le genre"),
     page: int = Query(1, ge=1, description="Numéro de page (commence à 1)"),
     page_size: int = Query(10, ge=1, le=100, description="Nombre d'éléments par page"),
     db: Session = Depends(get_db)
 ):
-    total = db.query(Livre).count()
-    skip = (page - 1) * page_size
-    livres = db.query(Livre).offset(skip).limit(page_size).all()
+    livres, total = run_search(db, q, offset=(page - 1) * page_size, limit=page_size)
     total_pages = math.ceil(total / page_size) if total > 0 else 1
 
     return LivresPaginated(
@@ -36,12 +89,33 @@ def get_all_livres(
         total_pages=total_pages
     )
 
+@router.get("/suggest")
+def suggest_livres(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS),
+    db: Session = Depends(get_db)
+):
+    suggest_index.ensure_loaded(db)
+    return suggest_index.suggest(q, limit=limit)
+
 @router.get("/{livre_id}", response_model=LivreSchema)
-def get_livre(livre_id: int, db: Session = Depends(get_db)):
-    livre = db.query(Livre).filter(Livre.id == livre_id).first()
-    if not livre:
-        raise HTTPException(status_code=404, detail="Livre non trouvé")
-    return livre
+def get_livre(
+    livre_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+):
+    selected = parse_fields(fields, LivreSchema)
+
+    def build():
+        livre = load_fields(db.query(Livre), Livre, selected).filter(Livre.id == livre_id).first()
+        if not livre:
+            raise HTTPException(status_code=404, detail="Livre non trouvé")
+        if selected is not None:
+            return FastJSONResponse(project(livre, LivreSchema, selected))
+        return livre
+
+    return cached_json(request, [livre_tag(livre_id)], LivreSchema, build)
 
 @router.put("/{livre_id}", response_model=LivreSchema)
 def update_livre(livre_id: int, livre_update: LivreUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -67,13 +141,10 @@ def delete_livre(livre_id: int, db: Session = Depends(get_db), current_user: Use
     db.commit()
     return None
 
-@router.get("/search/{query}", response_model=List[LivreSchema])
+# Ancienne route conservée pour les clients existants : préférer GET /livres/search?q=
+@router.get("/search/{query}", response_model=List[LivreSchema], deprecated=True)
 def search_livres(query: str, db: Session = Depends(get_db)):
-    livres = db.query(Livre).filter(
-        (Livre.nom.like(f"%{query}%")) |
-        (Livre.auteur.like(f"%{query}%")) |
-        (Livre.genre.like(f"%{query}%"))
-    ).all()
+    livres, _ = run_search(db, query, limit=100)
     return livres
 
 @router.post("/{livre_id}/assign/{user_id}", response_model=LivreSchema)
@@ -89,6 +160,8 @@ def assign_livre_to_user(livre_id: int, user_id: int, db: Session = Depends(get_
     if livre not in user.livres:
         user.livres.append(livre)
         db.commit()
+        # Table d'association : invisible pour les hooks de commit
+        response_cache.purge(user_tag(user_id))
         db.refresh(livre)
 
     return livre
@@ -106,6 +179,8 @@ def unassign_livre_from_user(livre_id: int, user_id: int, db: Session = Depends(
     if livre in user.livres:
         user.livres.remove(livre)
         db.commit()
+        # Table d'association : invisible pour les hooks de commit
+        response_cache.purge(user_tag(user_id))
         db.refresh(livre)
 
     return livre
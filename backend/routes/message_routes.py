@@ -2,21 +2,46 @@ from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
-from models import Message, Emprunt, User, Livre, BibliothequePersonnelle
+from models import Message, Emprunt, User, Livre, BibliothequePersonnelle, MessageArchive
 from schemas import (
     Message as MessageSchema,
     MessageCreate,
     MessageWithSender,
-    ConversationSummary
+    ConversationSummary,
+    ArchivedMessagesPaginated,
+    ConversationsAdapter,
+    MessagesWithSenderAdapter
 )
-from .user_routes import get_current_user
+from .user_routes import get_current_user, require_admin
+from compaction import compact_assistant_threads, decode_messages
+from cache import invalidate
+from compression import compression_threshold
+from conditional import conditional_get
+from fast_json import validated_json
+from hooks import on_commit
+from response_cache import LIVRES_TAG, MESSAGES_TAG, USERS_TAG, user_tag
 from sqlalchemy import or_, and_, desc, func
 from datetime import datetime
 from pydantic import BaseModel
+import math
 
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
 
+@on_commit(Message, Emprunt)
+def _invalidate_messages(change):
+    # Le destinataire d'un message n'est pas dans la ligne : un seul compteur pour toutes les conversations
+    invalidate(MESSAGES_TAG)
+
+
+conditional_get("/messages/unread/count", lambda current_user_id: [MESSAGES_TAG, user_tag(current_user_id)])
+conditional_get("/messages/conversations", lambda current_user_id: [MESSAGES_TAG, USERS_TAG, LIVRES_TAG])
+conditional_get("/messages/emprunt/{emprunt_id:int}", lambda emprunt_id, current_user_id: [MESSAGES_TAG, USERS_TAG])
+compression_threshold("/messages/emprunt/{emprunt_id:int}", 512)
+# Quelques octets : la compression coûterait plus qu'elle ne rapporte
+compression_threshold("/messages/unread/count", 1 << 20)
+
+
 class ProposalResponseData(BaseModel):
     selected_book_id: Optional[int] = None
     selected_book_title: Optional[str] = None
@@ -106,23 +131,103 @@ def get_user_conversations(
             )
         ).count()
 
-        conversations.append(ConversationSummary(
-            id_emprunt=emprunt.id,
-            other_user_id=other_user.id,
-            other_user_name=other_user.name,
-            other_user_surname=other_user.surname,
-            livre_nom=emprunt.livre.nom,
-            last_message=last_message.message_text if last_message else None,
-            last_message_time=last_message.datetime if last_message else None,
-            unread_count=unread_count
-        ))
-
+        conversations.append({
+            "id_emprunt": emprunt.id,
+            "other_user_id": other_user.id,
+            "other_user_name": other_user.name,
+            "other_user_surname": other_user.surname,
+            "livre_nom": emprunt.livre.nom,
+            "last_message": last_message.message_text if last_message else None,
+            "last_message_time": last_message.datetime if last_message else None,
+            "unread_count": unread_count
+        })
+
+    # Sans message, une conversation se classe à la date de son propre emprunt
+    activity = {emprunt.id: emprunt.datetime for emprunt in emprunts}
     conversations.sort(
-        key=lambda x: x.last_message_time if x.last_message_time else emprunt.datetime,
+        key=lambda x: x["last_message_time"] or activity[x["id_emprunt"]],
         reverse=True
     )
 
-    return conversations
+    return validated_json(ConversationsAdapter, conversations)
+
+
+@router.get("/archive", response_model=ArchivedMessagesPaginated)
+def get_archived_notifications(
+    page: int = Query(1, ge=1, description="Numéro de page (commence à 1)"),
+    page_size: int = Query(20, ge=1, le=100, description="Nombre d'éléments par page"),
+    emprunt_id: Optional[int] = Query(None, description="Limiter à une conversation"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if emprunt_id is not None:
+        check_user_in_emprunt(emprunt_id, current_user.id, db)
+        emprunt_ids = [emprunt_id]
+    else:
+        emprunt_ids = [
+            row.id
+            for row in db.query(Emprunt.id).filter(
+                or_(
+                    Emprunt.id_user1 == current_user.id,
+                    Emprunt.id_user2 == current_user.id
+                )
+            )
+        ]
+
+    chunks = db.query(MessageArchive.id, MessageArchive.message_count).filter(
+        MessageArchive.id_emprunt.in_(emprunt_ids)
+    ).order_by(desc(MessageArchive.last_message_at), desc(MessageArchive.id)).all()
+
+    total = sum(chunk.message_count for chunk in chunks)
+    skip = (page - 1) * page_size
+
+    # Seules les archives qui recouvrent la page demandée sont décompressées
+    needed_ids = []
+    first_offset = None
+    offset = 0
+    for chunk in chunks:
+        if offset >= skip + page_size:
+            break
+        if offset + chunk.message_count > skip:
+            needed_ids.append(chunk.id)
+            if first_offset is None:
+                first_offset = offset
+        offset += chunk.message_count
+
+    items = []
+    if needed_ids:
+        payloads = dict(
+            db.query(MessageArchive.id, MessageArchive.payload)
+            .filter(MessageArchive.id.in_(needed_ids))
+            .all()
+        )
+        for chunk_id in needed_ids:
+            items.extend(reversed(decode_messages(payloads[chunk_id])))
+        start = skip - first_offset
+        items = items[start:start + page_size]
+
+    total_pages = math.ceil(total / page_size) if total > 0 else 1
+
+    return ArchivedMessagesPaginated(
+        items=items,
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=total_pages
+    )
+
+
+@router.post("/archive/compact")
+def run_archive_compaction(
+    retention_days: Optional[int] = Query(None, ge=0, description="Fenêtre de rétention en jours"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    if retention_days is None:
+        archived = compact_assistant_threads(db)
+    else:
+        archived = compact_assistant_threads(db, retention_days=retention_days)
+    return {"archived": archived}
 
 
 @router.get("/emprunt/{emprunt_id}", response_model=List[MessageWithSender])
@@ -145,23 +250,28 @@ def get_messages_for_emprunt(
         )
     ).update({"is_read": 1})
     db.commit()
+    # UPDATE en masse : les hooks de commit ne voient pas ces lignes
+    invalidate(MESSAGES_TAG)
 
-    messages_with_sender = []
+    # Expéditeurs chargés en une requête ; dictionnaires validés et sérialisés d'un bloc par le TypeAdapter
+    sender_ids = {message.id_sender for message in messages}
+    senders = {user.id: user for user in db.query(User).filter(User.id.in_(sender_ids))} if sender_ids else {}
+    rows = []
     for message in messages:
-        sender = db.query(User).filter(User.id == message.id_sender).first()
-        messages_with_sender.append(MessageWithSender(
-            id=message.id,
-            id_emprunt=message.id_emprunt,
-            id_sender=message.id_sender,
-            message_text=message.message_text,
-            datetime=message.datetime,
-            is_read=message.is_read,
-            message_metadata=message.message_metadata,
-            sender_name=sender.name,
-            sender_surname=sender.surname
-        ))
-
-    return messages_with_sender
+        sender = senders[message.id_sender]
+        rows.append({
+            "id_emprunt": message.id_emprunt,
+            "message_text": message.message_text,
+            "id": message.id,
+            "id_sender": message.id_sender,
+            "datetime": message.datetime,
+            "is_read": message.is_read,
+            "message_metadata": message.message_metadata,
+            "sender_name": sender.name,
+            "sender_surname": sender.surname,
+        })
+
+    return validated_json(MessagesWithSenderAdapter, rows)
 
 
 @router.post("/", response_model=MessageSchema, status_code=status.HTTP_201_CREATED)
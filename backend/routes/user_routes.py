@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header, Query
+from fast_json import FastJSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from database import get_db
-from models import User
-from schemas import User as UserSchema, UserUpdate
+from models import Emprunt, Message, User
+from schemas import ExchangeStatus, User as UserSchema, UserProfileFull, UserUpdate
 from auth import decode_token, create_access_token
+from gazetteer import apply_city
+from fields import FIELDS_DESCRIPTION, load_fields, parse_fields, project
+from pagination import CURSOR_DESCRIPTION
+from conditional import conditional_get
+from hooks import on_commit
+from response_cache import LIVRES_TAG, MESSAGES_TAG, OEUVRES_TAG, USERS_TAG, cached_json, library_tag, response_cache, user_tag
+from singleflight import singleflight
+from query_stats import slow_query_log
+from streaming import stream_json_list
 from pydantic import BaseModel
+from sqlalchemy import and_, or_
 from datetime import timedelta
+from state import state
 import secrets
+import time
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-payment_tokens = {}
+PAYMENT_TOKEN_LIFETIME_SECONDS = 300
+
+
+def _payment_token_key(token: str) -> str:
+    return f"payment-token:{token}"
+
+# Clé de scope["state"] : utilisateur déjà authentifié par /batch pour ses sous-requêtes
+BATCH_USER_STATE = "batch_user"
+
+def get_current_user(request: Request, authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    shared = request.scope.get("state", {}).get(BATCH_USER_STATE)
+    if shared is not None:
+        # Copie dans la session de la sous-requête sans relire la base
+        return db.merge(shared, load=False)
 
-def get_current_user(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Non authentifié")
 
@@ -36,8 +61,26 @@ def require_admin(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Accès refusé: Admin requis")
     return current_user
 
+@on_commit(User)
+def _purge_cached_profile(change):
+    response_cache.purge(USERS_TAG, user_tag(change.values["id"]))
+
+
+conditional_get("/users/me", lambda current_user_id: [user_tag(current_user_id), LIVRES_TAG])
+conditional_get("/users/profile/{user_id:int}", lambda user_id, current_user_id: [user_tag(user_id), LIVRES_TAG])
+conditional_get(
+    "/users/profile/{user_id:int}/full",
+    lambda user_id, current_user_id: [user_tag(user_id), LIVRES_TAG, library_tag(user_id), OEUVRES_TAG, MESSAGES_TAG],
+)
+
 @router.get("/me", response_model=UserSchema)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+):
+    selected = parse_fields(fields, UserSchema)
+    if selected is not None:
+        return FastJSONResponse(project(current_user, UserSchema, selected))
     return current_user
 
 @router.get("/me/livres", response_model=List)
@@ -57,6 +100,9 @@ def update_current_user(user_update: UserUpdate, db: Session = Depends(get_db),
     if "role" in update_data and current_user.role != "Admin":
         del update_data["role"]
 
+    if "villes" in update_data:
+        apply_city(current_user, update_data.pop("villes"))
+
     for key, value in update_data.items():
         setattr(current_user, key, value)
 
@@ -65,22 +111,118 @@ def update_current_user(user_update: UserUpdate, db: Session = Depends(get_db),
     return current_user
 
 @router.get("/", response_model=List[UserSchema])
-def get_all_users(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
-    users = db.query(User).all()
-    return users
+def get_all_users(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+):
+    selected = parse_fields(fields, UserSchema)
+    # Liste non bornée : encodée au fil de la lecture plutôt que construite en mémoire
+    query = load_fields(db.query(User), User, selected).order_by(User.id)
+    return stream_json_list(query, UserSchema, fields=selected)
 
 @router.get("/profile/{user_id}", response_model=UserSchema)
-def get_user_profile(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    return user
+def get_user_profile(
+    user_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    selected = parse_fields(fields, UserSchema)
+
+    def build():
+        user = load_fields(db.query(User), User, selected).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        if selected is not None:
+            return FastJSONResponse(project(user, UserSchema, selected))
+        return user
+
+    # Le profil embarque les livres du catalogue : il suit aussi leurs modifications
+    tags = [user_tag(user_id)]
+    if selected is None or "livres" in selected:
+        tags.append(LIVRES_TAG)
+    return cached_json(request, tags, UserSchema, build)
+
+def _exchange_status(db: Session, user_id: int, viewer_id: int) -> ExchangeStatus:
+    exchange = ExchangeStatus()
+    direct = (
+        db.query(Emprunt.id, Emprunt.datetime)
+        .filter(or_(
+            and_(Emprunt.id_user1 == viewer_id, Emprunt.id_user2 == user_id),
+            and_(Emprunt.id_user1 == user_id, Emprunt.id_user2 == viewer_id),
+        ))
+        .order_by(Emprunt.datetime.desc())
+        .first()
+    )
+    if direct:
+        exchange.emprunt_id, exchange.last_exchange_at = direct.id, direct.datetime
+
+    # Les propositions passent par le fil de l'assistant avec le destinataire : une requête jointe, filtre JSON en Python
+    proposals = (
+        db.query(Message.id, Message.message_metadata)
+        .join(Emprunt, Message.id_emprunt == Emprunt.id)
+        .join(User, Message.id_sender == User.id)
+        .filter(
+            User.email == "assistant@livre2main.com",
+            or_(Emprunt.id_user1 == user_id, Emprunt.id_user2 == user_id),
+        )
+        .order_by(Message.id.desc())
+    )
+    for message_id, metadata in proposals:
+        if (
+            metadata
+            and metadata.get("type") in ("proposal", "book_proposal")
+            and metadata.get("proposer_id") == viewer_id
+            and metadata.get("status") == "pending"
+        ):
+            exchange.pending_proposal_id, exchange.pending_book_id = message_id, metadata.get("book_id")
+            break
+    return exchange
+
+@router.get("/profile/{user_id}/full", response_model=UserProfileFull)
+def get_user_profile_full(
+    user_id: int,
+    request: Request,
+    page: int = Query(1, ge=1, description="Numéro de page (commence à 1)"),
+    page_size: int = Query(100, ge=1, le=10000, description="Nombre d'éléments par page"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Import local : bibliotheque_routes importe déjà ce module
+    from routes.bibliotheque_routes import _library_page
+
+    viewer_id = current_user.id
+
+    def build():
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        return {
+            "user": user,
+            "library": _library_page(db, user_id, page, page_size, cursor, include_total=True),
+            "exchange": _exchange_status(db, user_id, viewer_id) if user_id != viewer_id else None,
+        }
+
+    # Profil, bibliothèque et échanges mis en cache ensemble ; l'état des échanges dépend de l'appelant
+    tags = [user_tag(user_id), LIVRES_TAG, library_tag(user_id), OEUVRES_TAG, MESSAGES_TAG]
+    return cached_json(request, tags, UserProfileFull, build, viewer=viewer_id)
 
 @router.get("/{user_id}", response_model=UserSchema)
-def get_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
-    user = db.query(User).filter(User.id == user_id).first()
+def get_user(
+    user_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+):
+    selected = parse_fields(fields, UserSchema)
+    user = load_fields(db.query(User), User, selected).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    if selected is not None:
+        return FastJSONResponse(project(user, UserSchema, selected))
     return user
 
 @router.put("/{user_id}", response_model=UserSchema)
@@ -95,6 +237,9 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
         from auth import get_password_hash
         update_data["mdp"] = get_password_hash(update_data["mdp"])
 
+    if "villes" in update_data:
+        apply_city(user, update_data.pop("villes"))
+
     for key, value in update_data.items():
         setattr(user, key, value)
 
@@ -117,10 +262,23 @@ def get_users_by_ville(ville: str, db: Session = Depends(get_db), current_user:
     users = db.query(User).filter(User.villes.like(f"%{ville}%")).all()
     return users
 
+@router.get("/admin/response-cache")
+def get_response_cache_stats(current_user: User = Depends(require_admin)):
+    return dict(response_cache.stats(), singleflight=singleflight.stats())
+
+@router.get("/admin/slow-queries")
+def get_slow_queries(current_user: User = Depends(require_admin)):
+    return slow_query_log.recent()
+
 @router.get("/admin/users-report", response_model=List[UserSchema])
-def get_users_by_report(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
-    users = db.query(User).order_by(User.signalement.desc()).all()
-    return users
+def get_users_by_report(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+):
+    selected = parse_fields(fields, UserSchema)
+    query = load_fields(db.query(User), User, selected).order_by(User.signalement.desc(), User.id)
+    return stream_json_list(query, UserSchema, fields=selected)
 
 
 class PaymentTokenRequest(BaseModel):
@@ -141,15 +299,16 @@ def request_payment_token(current_user: User = Depends(get_current_user)):
 
     payment_token = secrets.token_urlsafe(32)
 
-    from datetime import datetime, timedelta
-    payment_tokens[payment_token] = {
-        "user_id": current_user.id,
-        "expires_at": datetime.utcnow() + timedelta(minutes=5)
-    }
+    # Conservé au-delà de son expiration pour distinguer un token expiré d'un token inconnu
+    state.set(
+        _payment_token_key(payment_token),
+        {"user_id": current_user.id, "expires_at": time.time() + PAYMENT_TOKEN_LIFETIME_SECONDS},
+        ttl=2 * PAYMENT_TOKEN_LIFETIME_SECONDS,
+    )
 
     return {
         "payment_token": payment_token,
-        "expires_in": 300
+        "expires_in": PAYMENT_TOKEN_LIFETIME_SECONDS
     }
 
 
@@ -159,27 +318,28 @@ def upgrade_to_premium(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if request.payment_token not in payment_tokens:
+    key = _payment_token_key(request.payment_token)
+    token_data = state.get(key)
+    if token_data is None:
         raise HTTPException(status_code=400, detail="Token de paiement invalide")
 
-    token_data = payment_tokens[request.payment_token]
-
-    from datetime import datetime
-    if datetime.utcnow() > token_data["expires_at"]:
-        del payment_tokens[request.payment_token]
+    if time.time() > token_data["expires_at"]:
+        state.delete(key)
         raise HTTPException(status_code=400, detail="Token de paiement expiré")
 
     if token_data["user_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Token de paiement invalide pour cet utilisateur")
 
     if current_user.role.lower() in ["riche", "premium"]:
-        del payment_tokens[request.payment_token]
+        state.delete(key)
         raise HTTPException(status_code=400, detail="Vous avez déjà l'abonnement Premium")
 
+    # Consommé avant l'écriture : deux requêtes simultanées (deux workers) ne peuvent pas l'utiliser toutes les deux
+    if state.pop(key) is None:
+        raise HTTPException(status_code=400, detail="Token de paiement invalide")
+
     current_user.role = "Riche"
     db.commit()
     db.refresh(current_user)
 
-    del payment_tokens[request.payment_token]
-
     return current_user
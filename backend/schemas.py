@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr, conint, constr, validator
-from typing import Optional, List, Any
+from pydantic import BaseModel, EmailStr, TypeAdapter, conint, constr, validator
+from typing import Optional, List, Any, Union
 from datetime import datetime
 import re
+from covers import CoverError, check_cover_url
 
 PASSWORD_REGEX = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[^\w\s]).{8,}$")
 
@@ -26,10 +27,11 @@ class Livre(LivreBase):
 
 class LivresPaginated(BaseModel):
     items: List[Livre]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 class UserBase(BaseModel):
     name: str
@@ -79,6 +81,8 @@ class UserUpdate(BaseModel):
 class User(UserBase):
     id: int
     signalement: int = 0
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     liste_livres: Optional[List[Any]] = None
     livres: List[Livre] = []
 
@@ -114,17 +118,31 @@ class PersonalBookBase(BaseModel):
     cover_url: Optional[str] = None
     info_link: Optional[str] = None
     description: Optional[str] = None
+    isbn: Optional[str] = None
     source: Optional[str] = "google_books"
     source_id: Optional[str] = None
 
 
-class PersonalBookCreate(PersonalBookBase):
+class PersonalBookIn(PersonalBookBase):
+    # Vérifié à l'enregistrement seulement : les réponses peuvent contenir des URL plus anciennes
+    @validator("cover_url")
+    def validate_cover_url(cls, v: Optional[str]) -> Optional[str]:
+        if v:
+            try:
+                check_cover_url(v)
+            except CoverError:
+                raise ValueError("Couverture: seuls les hébergeurs de couvertures connus sont acceptés")
+        return v
+
+
+class PersonalBookCreate(PersonalBookIn):
     user_id: int
 
 
 class PersonalBook(PersonalBookBase):
     id: int
     user_id: int
+    oeuvre_id: int
     created_at: datetime
 
     class Config:
@@ -133,10 +151,22 @@ class PersonalBook(PersonalBookBase):
 
 class PersonalBooksPaginated(BaseModel):
     items: List[PersonalBook]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class ExchangeStatus(BaseModel):
+    emprunt_id: Optional[int] = None
+    last_exchange_at: Optional[datetime] = None
+    pending_proposal_id: Optional[int] = None
+    pending_book_id: Optional[Union[int, str]] = None
+
+class UserProfileFull(BaseModel):
+    user: User
+    library: PersonalBooksPaginated
+    exchange: Optional[ExchangeStatus] = None
 
 class MessageBase(BaseModel):
     id_emprunt: int
@@ -155,6 +185,13 @@ class Message(MessageBase):
     class Config:
         from_attributes = True
 
+class ArchivedMessagesPaginated(BaseModel):
+    items: List[Message]
+    total: int
+    page: int
+    page_size: int
+    total_pages: int
+
 class MessageWithSender(Message):
     sender_name: str
     sender_surname: str
@@ -171,3 +208,7 @@ class ConversationSummary(BaseModel):
 
     class Config:
         from_attributes = True
+
+# Validation + sérialisation des longues listes en une passe (fast_json.validated_json)
+MessagesWithSenderAdapter = TypeAdapter(List[MessageWithSender])
+ConversationsAdapter = TypeAdapter(List[ConversationSummary])
@@ -0,0 +1,301 @@
+import heapq
+import math
+import os
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from cache import VersionedIndex
+from hooks import on_commit
+from models import Livre
+from normalization import normalize_text
+
+# auto : FTS5 sous SQLite, FULLTEXT sous MySQL, index en mémoire sinon
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_INDEX_TAG = "livres-search"
+
+# Pondération des colonnes pour le classement : un mot du titre compte plus qu'un genre
+FIELD_WEIGHTS = (("nom", 10.0), ("auteur", 5.0), ("genre", 1.0))
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Un préfixe très court ("l") peut couvrir des milliers de mots : on garde les plus fréquents
+MAX_PREFIX_EXPANSIONS = 64
+
+FTS_TABLE = "livre_fts"
+
+_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "Nom, Auteur, Genre, content='Livre', content_rowid='ID', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS livre_fts_ai AFTER INSERT ON Livre BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, Nom, Auteur, Genre) VALUES (new.ID, new.Nom, new.Auteur, new.Genre); END",
+    f"CREATE TRIGGER IF NOT EXISTS livre_fts_ad AFTER DELETE ON Livre BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, Nom, Auteur, Genre) "
+    "VALUES ('delete', old.ID, old.Nom, old.Auteur, old.Genre); END",
+    f"CREATE TRIGGER IF NOT EXISTS livre_fts_au AFTER UPDATE ON Livre BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, Nom, Auteur, Genre) "
+    "VALUES ('delete', old.ID, old.Nom, old.Auteur, old.Genre); "
+    f"INSERT INTO {FTS_TABLE}(rowid, Nom, Auteur, Genre) VALUES (new.ID, new.Nom, new.Auteur, new.Genre); END",
+]
+
+_fts_available: Dict[str, bool] = {}
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return normalize_text(value or "").split()
+
+
+# --- SQLite FTS5 ---
+
+def _create_fts(connection) -> bool:
+    try:
+        for statement in _FTS_DDL:
+            connection.exec_driver_sql(statement)
+        return True
+    except Exception as e:
+        print(f"⚠️ FTS5 indisponible, recherche en mémoire: {e}")
+        return False
+
+
+@event.listens_for(Livre.__table__, "after_create")
+def _after_create(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        _fts_available[str(connection.engine.url)] = _create_fts(connection)
+
+
+@event.listens_for(Livre.__table__, "before_drop")
+def _before_drop(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def _fts_search(db: Session, tokens: List[str], offset: int, limit: int) -> Tuple[List[int], int]:
+    # Les jetons sont alphanumériques après normalisation : les guillemets suffisent à l'échappement
+    match = " ".join(f'"{token}"*' for token in tokens)
+    weights = ", ".join(str(weight) for _, weight in FIELD_WEIGHTS)
+    total = db.execute(
+        text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"), {"match": match}
+    ).scalar()
+    rows = db.execute(
+        text(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT :limit OFFSET :offset"
+        ),
+        {"match": match, "limit": limit, "offset": offset},
+    )
+    return [row[0] for row in rows], total
+
+
+# --- MySQL FULLTEXT ---
+
+FULLTEXT_INDEX = "ft_livre"
+
+_fulltext_available: Dict[str, bool] = {}
+
+
+def _create_fulltext(connection) -> bool:
+    try:
+        connection.exec_driver_sql(
+            f"ALTER TABLE {Livre.__tablename__} ADD FULLTEXT INDEX {FULLTEXT_INDEX} (Nom, Auteur, Genre)"
+        )
+        return True
+    except Exception as e:
+        print(f"⚠️ Index FULLTEXT indisponible, recherche en mémoire: {e}")
+        return False
+
+
+@event.listens_for(Livre.__table__, "after_create")
+def _after_create_mysql(target, connection, **kw):
+    if connection.dialect.name == "mysql":
+        _fulltext_available[str(connection.engine.url)] = _create_fulltext(connection)
+
+
+def _fulltext_exists(connection) -> bool:
+    return connection.execute(
+        text(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :index LIMIT 1"
+        ),
+        {"table": Livre.__tablename__, "index": FULLTEXT_INDEX},
+    ).first() is not None
+
+
+def _ensure_fulltext_index(engine) -> None:
+    # Bases MySQL créées avant l'index : sans lui, MATCH ... AGAINST échoue (erreur 1191)
+    with engine.begin() as connection:
+        available = _fulltext_exists(connection) or _create_fulltext(connection)
+    if not available:
+        # Un autre worker a pu créer l'index entre la vérification et l'ALTER
+        with engine.connect() as connection:
+            available = _fulltext_exists(connection)
+    _fulltext_available[str(engine.url)] = available
+
+
+def _fulltext_search(db: Session, tokens: List[str], offset: int, limit: int) -> Tuple[List[int], int]:
+    # Mode booléen : chaque mot est obligatoire et accepté comme préfixe. La collation
+    # utf8mb4_unicode_ci se charge de l'insensibilité aux accents.
+    against = " ".join(f"+{token}*" for token in tokens)
+    match = "MATCH(Nom, Auteur, Genre) AGAINST (:against IN BOOLEAN MODE)"
+    table = Livre.__tablename__
+    total = db.execute(text(f"SELECT count(*) FROM {table} WHERE {match}"), {"against": against}).scalar()
+    rows = db.execute(
+        text(f"SELECT ID FROM {table} WHERE {match} ORDER BY {match} DESC, ID LIMIT :limit OFFSET :offset"),
+        {"against": against, "limit": limit, "offset": offset},
+    )
+    return [row[0] for row in rows], total
+
+
+def ensure_search_index(engine) -> None:
+    if engine.dialect.name == "mysql":
+        _ensure_fulltext_index(engine)
+        return
+    # Bases créées avant l'index : la table FTS est construite puis remplie à partir de Livre
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first()
+        available = _create_fts(connection)
+        if available and not exists:
+            connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_available[str(engine.url)] = available
+
+
+# --- Index inversé en mémoire ---
+
+class SearchIndex(VersionedIndex):
+    tag = SEARCH_INDEX_TAG
+
+    def reset(self) -> None:
+        with self.lock:
+            # terme -> {id livre: fréquence pondérée par colonne}
+            self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+            self.docs: Dict[int, Tuple[Tuple[str, ...], float]] = {}
+            self.vocabulary: List[str] = []
+            self.total_length = 0.0
+            self.version: Optional[int] = None
+
+    def add(self, livre_id: int, nom: Optional[str], auteur: Optional[str], genre: Optional[str]) -> None:
+        self.remove(livre_id)
+        frequencies: Dict[str, float] = defaultdict(float)
+        length = 0.0
+        for (_, weight), value in zip(FIELD_WEIGHTS, (nom, auteur, genre)):
+            for token in tokenize(value):
+                frequencies[token] += weight
+                length += weight
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                insort(self.vocabulary, term)
+            self.postings[term][livre_id] = frequency
+        self.docs[livre_id] = (tuple(frequencies), length)
+        self.total_length += length
+
+    def remove(self, livre_id: int) -> None:
+        entry = self.docs.pop(livre_id, None)
+        if entry is None:
+            return
+        terms, length = entry
+        self.total_length -= length
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(livre_id, None)
+            if not posting:
+                del self.postings[term]
+                position = bisect_left(self.vocabulary, term)
+                if position < len(self.vocabulary) and self.vocabulary[position] == term:
+                    del self.vocabulary[position]
+
+    def load(self, db: Session) -> None:
+        rows = db.query(Livre.id, Livre.nom, Livre.auteur, Livre.genre)
+        for livre_id, nom, auteur, genre in rows.yield_per(5000):
+            self.add(livre_id, nom, auteur, genre)
+
+    def apply_change(self, change) -> None:
+        values = change.values
+        if change.action == "delete":
+            self.remove(values["id"])
+        else:
+            self.add(values["id"], values.get("nom"), values.get("auteur"), values.get("genre"))
+
+    def expand(self, prefix: str) -> List[str]:
+        terms = []
+        position = bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+            terms.append(self.vocabulary[position])
+            position += 1
+        if len(terms) > MAX_PREFIX_EXPANSIONS:
+            terms = heapq.nlargest(MAX_PREFIX_EXPANSIONS, terms, key=lambda term: len(self.postings[term]))
+        return terms
+
+    def search(self, tokens: List[str], offset: int, limit: int) -> Tuple[List[int], int]:
+        with self.lock:
+            count = len(self.docs)
+            if not count or not tokens:
+                return [], 0
+            average_length = self.total_length / count
+            scores: Optional[Dict[int, float]] = None
+            for token in tokens:
+                token_scores: Dict[int, float] = defaultdict(float)
+                for term in self.expand(token):
+                    posting = self.postings[term]
+                    idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for livre_id, frequency in posting.items():
+                        if scores is not None and livre_id not in scores:
+                            continue
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[livre_id][1] / average_length)
+                        token_scores[livre_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    # Tous les mots de la requête doivent être présents
+                    scores = {livre_id: scores[livre_id] + score for livre_id, score in token_scores.items()}
+                if not scores:
+                    return [], 0
+            best = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [livre_id for livre_id, _ in best[offset:]], len(scores)
+
+
+search_index = SearchIndex()
+
+
+@on_commit(Livre)
+def _update_search_index(change):
+    search_index.apply(change)
+
+
+# --- Point d'entrée ---
+
+def get_backend(db: Session) -> str:
+    if SEARCH_BACKEND != "auto":
+        return SEARCH_BACKEND
+    bind = db.get_bind()
+    if bind.dialect.name == "sqlite" and _fts_available.get(str(bind.engine.url)):
+        return "fts5"
+    # Index FULLTEXT absent ou non vérifié : l'index en mémoire plutôt qu'une erreur 1191
+    if bind.dialect.name == "mysql" and _fulltext_available.get(str(bind.engine.url)):
+        return "fulltext"
+    return "memory"
+
+
+def search_livres(db: Session, query: str, offset: int = 0, limit: int = 10) -> Tuple[List[Livre], int]:
+    tokens = tokenize(query)
+    if not tokens:
+        return [], 0
+    backend = get_backend(db)
+    if backend == "fts5":
+        ids, total = _fts_search(db, tokens, offset, limit)
+    elif backend == "fulltext":
+        ids, total = _fulltext_search(db, tokens, offset, limit)
+    else:
+        search_index.ensure_loaded(db)
+        ids, total = search_index.search(tokens, offset, limit)
+    if not ids:
+        return [], total
+    livres = {livre.id: livre for livre in db.query(Livre).filter(Livre.id.in_(ids))}
+    return [livres[livre_id] for livre_id in ids if livre_id in livres], total
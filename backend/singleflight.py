@@ -0,0 +1,64 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Les requêtes identiques arrivées pendant un calcul attendent son résultat au lieu de le relancer.
+    # La clé doit contenir tout ce dont dépend le résultat (route, paramètres, portée d'authentification,
+    # versions des données lues) : un appel qui arrive après une écriture ne rejoint pas un calcul antérieur.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls: Dict[Hashable, _Call] = {}
+            self.executions = 0
+            self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "executions": self.executions,
+                "saved_executions": self.shared,
+                "in_flight": len(self.calls),
+            }
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,373 @@
+import json
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+# memory:// (un seul processus), sqlite:///chemin/state.db (plusieurs workers sur une machine)
+# ou redis://[:motdepasse@]hôte:port/base (plusieurs machines)
+STATE_BACKEND_URL = os.getenv("STATE_BACKEND_URL", "memory://")
+STATE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STATE_SWEEP_INTERVAL_SECONDS", "60"))
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "livre2main:")
+
+_stop_event = threading.Event()
+_sweeper: Optional[threading.Thread] = None
+
+
+class StateError(Exception):
+    pass
+
+
+class StateBackend(ABC):
+    # Valeurs sérialisées en JSON ; ttl en secondes, None pour une clé sans expiration.
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Écrit la clé seulement si elle est absente ; True si elle a été créée."""
+        ...
+
+    @abstractmethod
+    def pop(self, key: str) -> Any:
+        """Lit et supprime la clé en une seule opération : un seul appelant obtient la valeur."""
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Incrémente un compteur ; le ttl ne s'applique qu'à sa création."""
+        ...
+
+    def sweep(self) -> int:
+        """Supprime les clés expirées et renvoie leur nombre."""
+        return 0
+
+    @abstractmethod
+    def clear(self, prefix: str = "") -> None:
+        ...
+
+
+def _expires_at(ttl: Optional[float]) -> Optional[float]:
+    return None if ttl is None else time.time() + ttl
+
+
+class MemoryBackend(StateBackend):
+    def __init__(self):
+        self.entries: Dict[str, Tuple[str, Optional[float]]] = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self.entries[key]
+            return None
+        return entry[0]
+
+    def get(self, key):
+        with self.lock:
+            value = self._live(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (json.dumps(value), _expires_at(ttl))
+
+    def add(self, key, value, ttl=None):
+        with self.lock:
+            if self._live(key) is not None:
+                return False
+            self.entries[key] = (json.dumps(value), _expires_at(ttl))
+            return True
+
+    def pop(self, key):
+        with self.lock:
+            value = self._live(key)
+            self.entries.pop(key, None)
+        return None if value is None else json.loads(value)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self.lock:
+            value = self._live(key)
+            expires_at = self.entries[key][1] if value is not None else _expires_at(ttl)
+            total = (int(value) if value is not None else 0) + amount
+            self.entries[key] = (json.dumps(total), expires_at)
+            return total
+
+    def sweep(self):
+        now = time.time()
+        with self.lock:
+            expired = [key for key, (_, expires_at) in self.entries.items() if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self.entries[key]
+        return len(expired)
+
+    def clear(self, prefix=""):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+
+class SQLiteBackend(StateBackend):
+    # Fichier partagé par les workers d'une même machine ; BEGIN IMMEDIATE sérialise les écritures
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_state_expires ON state (expires_at)")
+
+    def _transaction(self, fn):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.conn)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _drop_expired(conn, key: str) -> None:
+        conn.execute("DELETE FROM state WHERE key = ? AND expires_at <= ?", (key, time.time()))
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), _expires_at(ttl)),
+            )
+
+    def add(self, key, value, ttl=None):
+        def run(conn):
+            self._drop_expired(conn, key)
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), _expires_at(ttl)),
+            )
+            return cursor.rowcount == 1
+        return self._transaction(run)
+
+    def pop(self, key):
+        def run(conn):
+            self._drop_expired(conn, key)
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+            return row
+        row = self._transaction(run)
+        return None if row is None else json.loads(row[0])
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        def run(conn):
+            self._drop_expired(conn, key)
+            conn.execute(
+                "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+                (key, amount, _expires_at(ttl)),
+            )
+            return conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()[0]
+        return int(self._transaction(run))
+
+    def sweep(self):
+        with self.lock:
+            return self.conn.execute("DELETE FROM state WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def clear(self, prefix=""):
+        with self.lock:
+            self.conn.execute("DELETE FROM state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+class RedisBackend(StateBackend):
+    # Client minimal du protocole Redis (RESP2) : GETDEL demande Redis 6.2 ou un serveur compatible.
+    # L'expiration est gérée par le serveur, sweep() n'a rien à faire.
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 prefix: str = REDIS_KEY_PREFIX, timeout: float = 5.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sock: Optional[socket.socket] = None
+        self.reader = None
+
+    def _connect(self) -> None:
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.reader = self.sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def _close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = self.reader = None
+
+    def _write(self, *args) -> None:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+
+    def _send(self, *args):
+        self._write(*args)
+        return self._read()
+
+    def _stale(self) -> bool:
+        # Entre deux commandes, rien ne doit être lisible : une fin de flux signale une connexion fermée par le serveur
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        return bool(readable)
+
+    def _read(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Connexion Redis fermée")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise StateError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise StateError(f"Réponse Redis inattendue : {line!r}")
+
+    def command(self, *args):
+        with self.lock:
+            if self.sock is not None and self._stale():
+                # Connexion coupée (redémarrage du serveur) : on reconnecte avant d'envoyer
+                self._close()
+            for attempt in (1, 2):
+                sent = False
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    self._write(*args)
+                    sent = True
+                    return self._read()
+                except (ConnectionError, OSError):
+                    self._close()
+                    # Une fois la commande envoyée, le serveur a pu l'exécuter : la renvoyer
+                    # consommerait deux fois un GETDEL ou incrémenterait deux fois un INCRBY
+                    if sent or attempt == 2:
+                        raise
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> tuple:
+        return () if ttl is None else ("PX", max(1, int(ttl * 1000)))
+
+    def get(self, key):
+        value = self.command("GET", self._key(key))
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.command("SET", self._key(key), json.dumps(value), *self._expiry(ttl))
+
+    def add(self, key, value, ttl=None):
+        return self.command("SET", self._key(key), json.dumps(value), "NX", *self._expiry(ttl)) == "OK"
+
+    def pop(self, key):
+        value = self.command("GETDEL", self._key(key))
+        return None if value is None else json.loads(value)
+
+    def delete(self, key):
+        self.command("DEL", self._key(key))
+
+    def incr(self, key, amount=1, ttl=None):
+        if ttl is not None:
+            self.command("SET", self._key(key), 0, "NX", *self._expiry(ttl))
+        return self.command("INCRBY", self._key(key), amount)
+
+    def clear(self, prefix=""):
+        cursor = b"0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", self._key(prefix) + "*", "COUNT", 500)
+            if keys:
+                self.command("DEL", *keys)
+            if cursor == b"0":
+                return
+
+
+def open_backend(url: str) -> StateBackend:
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        password = unquote(parsed.password) if parsed.password else None
+        return RedisBackend(parsed.hostname or "localhost", parsed.port or 6379, db, password)
+    raise ValueError(f"STATE_BACKEND_URL non reconnue : {url}")
+
+
+state = open_backend(STATE_BACKEND_URL)
+
+
+def _run_sweeper(interval: int) -> None:
+    while not _stop_event.wait(interval):
+        try:
+            state.sweep()
+        except Exception as e:
+            print(f"❌ Erreur lors du nettoyage de l'état partagé: {e}")
+
+
+def start_state_sweeper(interval: int = STATE_SWEEP_INTERVAL_SECONDS) -> None:
+    global _sweeper
+    if interval <= 0 or (_sweeper and _sweeper.is_alive()):
+        return
+    _stop_event.clear()
+    _sweeper = threading.Thread(target=_run_sweeper, args=(interval,), name="state-sweeper", daemon=True)
+    _sweeper.start()
+
+
+def stop_state_sweeper() -> None:
+    _stop_event.set()
@@ -0,0 +1,55 @@
+import json
+import os
+from typing import Iterator, Optional, Set, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query
+
+from fast_json import dumps
+from fields import project
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+
+def _encode_row(row, schema: Type[BaseModel], fields: Optional[Set[str]]) -> bytes:
+    if fields is not None:
+        return dumps(project(row, schema, fields))
+    return schema.model_validate(row).model_dump_json().encode()
+
+
+def _encode_rows(query: Query, schema: Type[BaseModel], batch_size: int,
+                 fields: Optional[Set[str]] = None) -> Iterator[bytes]:
+    # yield_per active stream_results : curseur côté serveur (SSCursor sous MySQL), lignes lues par lots
+    rows = query.yield_per(batch_size)
+    chunk = []
+    for index, row in enumerate(rows):
+        chunk.append((b"," if index else b"") + _encode_row(row, schema, fields))
+        if len(chunk) == batch_size:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+def stream_json_list(query: Query, schema: Type[BaseModel], batch_size: int = STREAM_BATCH_SIZE,
+                     fields: Optional[Set[str]] = None) -> StreamingResponse:
+    """Même JSON que response_model=List[schema], écrit au fil de la lecture des lignes."""
+    def body():
+        yield b"["
+        yield from _encode_rows(query, schema, batch_size, fields)
+        yield b"]"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+def stream_json_page(query: Query, schema: Type[BaseModel], envelope: dict,
+                     batch_size: int = STREAM_BATCH_SIZE, fields: Optional[Set[str]] = None) -> StreamingResponse:
+    """Réponse paginée : l'enveloppe (total, page...) puis les éléments de la page en flux."""
+    def body():
+        head = json.dumps(envelope, separators=(",", ":"))[:-1]
+        yield (head + ("," if envelope else "") + '"items":[').encode()
+        yield from _encode_rows(query, schema, batch_size, fields)
+        yield b"]}"
+
+    return StreamingResponse(body(), media_type="application/json")
@@ -0,0 +1,207 @@
+import heapq
+import os
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import VersionedIndex
+from hooks import on_commit
+from models import BibliothequePersonnelle, Livre, Oeuvre
+from normalization import normalize_text
+
+SUGGEST_INDEX_TAG = "suggest-index"
+# Au-delà de ce nombre de clés pour un préfixe, le classement est mis en cache
+SCAN_LIMIT = int(os.getenv("SUGGEST_SCAN_LIMIT", "1000"))
+CACHE_DEPTH = 64
+MAX_SUGGESTIONS = 20
+LEADING_ARTICLES = {"le", "la", "les", "l", "un", "une", "des", "du", "de", "d", "the", "a", "an"}
+END = "\uffff"
+
+Entry = Tuple[str, str]  # (type, texte normalisé)
+
+
+def rank_key(item: Tuple[int, Entry]):
+    return (-item[0], item[1])
+
+
+def row_entries(title: Optional[str], authors) -> Tuple[Tuple[Entry, str], ...]:
+    entries = []
+    if normalize_text(title):
+        entries.append((("title", normalize_text(title)), title.strip()))
+    for author in authors or ():
+        if isinstance(author, str) and normalize_text(author):
+            entries.append((("author", normalize_text(author)), author.strip()))
+    return tuple(entries)
+
+
+def search_keys(kind: str, normalized: str) -> Tuple[str, ...]:
+    # "Le Petit Prince" se complète aussi depuis "petit", "Victor Hugo" depuis "hugo"
+    words = normalized.split()
+    keys = {normalized}
+    if kind == "title":
+        while len(words) > 1 and words[0] in LEADING_ARTICLES:
+            words = words[1:]
+            keys.add(" ".join(words))
+    else:
+        keys.update(" ".join(words[i:]) for i in range(1, len(words)))
+    return tuple(keys)
+
+
+class SuggestIndex(VersionedIndex):
+    tag = SUGGEST_INDEX_TAG
+
+    def reset(self) -> None:
+        with self.lock:
+            self.weights: Dict[Entry, int] = {}
+            self.labels: Dict[Entry, str] = {}
+            # Liste triée de (clé, type, texte normalisé) : un trie aplati, parcouru par bisection
+            self.keys: List[Tuple[str, str, str]] = []
+            self.contributions: Dict[Tuple[str, int], Tuple[Tuple[Entry, str], ...]] = {}
+            self.top: Dict[str, List[Tuple[int, Entry]]] = {}
+            # Les auteurs d'un exemplaire sont ceux de son oeuvre
+            self.work_authors: Dict[int, list] = {}
+            self.work_rows: Dict[int, Dict[int, str]] = defaultdict(dict)
+            self.version: Optional[int] = None
+
+    def _add(self, entry: Entry, label: str, delta: int) -> None:
+        weight = self.weights.get(entry, 0) + delta
+        kind, normalized = entry
+        if weight <= 0:
+            self.weights.pop(entry, None)
+            self.labels.pop(entry, None)
+            for key in search_keys(kind, normalized):
+                position = bisect_left(self.keys, (key, kind, normalized))
+                if position < len(self.keys) and self.keys[position] == (key, kind, normalized):
+                    del self.keys[position]
+        elif entry not in self.weights:
+            self.weights[entry] = weight
+            self.labels[entry] = label
+            for key in search_keys(kind, normalized):
+                insort(self.keys, (key, kind, normalized))
+        else:
+            self.weights[entry] = weight
+        self._update_top(entry, max(weight, 0))
+
+    def _update_top(self, entry: Entry, weight: int) -> None:
+        if not self.top:
+            return
+        item = (weight, entry)
+        prefixes = {key[:i] for key in search_keys(*entry) for i in range(1, len(key) + 1)}
+        for prefix in prefixes & self.top.keys():
+            # Le cache est le début exact du classement : une entrée n'y reste (ou n'y entre) que si
+            # elle précède la dernière, sinon une entrée absente du cache pourrait la devancer.
+            ranking = [ranked for ranked in self.top[prefix] if ranked[1] != entry]
+            if weight > 0 and ranking and rank_key(item) < rank_key(ranking[-1]):
+                ranking.append(item)
+                ranking.sort(key=rank_key)
+                del ranking[CACHE_DEPTH:]
+            if len(ranking) < MAX_SUGGESTIONS:
+                del self.top[prefix]
+            else:
+                self.top[prefix] = ranking
+
+    def add_row(self, source: str, row_id: int, title: Optional[str], authors) -> None:
+        self.remove_row(source, row_id)
+        entries = row_entries(title, authors)
+        for entry, label in entries:
+            self._add(entry, label, 1)
+        self.contributions[(source, row_id)] = entries
+
+    def remove_row(self, source: str, row_id: int) -> None:
+        for entry, label in self.contributions.pop((source, row_id), ()):
+            self._add(entry, label, -1)
+
+    def load(self, db: Session) -> None:
+        # Construction en bloc : un seul tri au lieu d'une insertion par clé
+        contributions = {}
+        weights: Dict[Entry, int] = defaultdict(int)
+        labels: Dict[Entry, str] = {}
+        self.work_authors = dict(db.query(Oeuvre.id, Oeuvre.authors).yield_per(5000))
+        self.work_rows = defaultdict(dict)
+        rows = [("livre", row_id, title, [author])
+                for row_id, title, author in db.query(Livre.id, Livre.nom, Livre.auteur).yield_per(5000)]
+        for row_id, title, oeuvre_id in db.query(
+            BibliothequePersonnelle.id, BibliothequePersonnelle.title, BibliothequePersonnelle.oeuvre_id
+        ).yield_per(5000):
+            self.work_rows[oeuvre_id][row_id] = title
+            rows.append(("perso", row_id, title, self.work_authors.get(oeuvre_id)))
+        for source, row_id, title, authors in rows:
+            entries = row_entries(title, authors)
+            for entry, label in entries:
+                weights[entry] += 1
+                labels.setdefault(entry, label)
+            contributions[(source, row_id)] = entries
+        self.weights = dict(weights)
+        self.labels = labels
+        self.contributions = contributions
+        self.keys = sorted((key, kind, normalized) for kind, normalized in weights
+                           for key in search_keys(kind, normalized))
+
+    def apply_change(self, change) -> None:
+        values = change.values
+        if change.model is Oeuvre:
+            self._apply_work_change(change)
+            return
+        if change.model is Livre:
+            source, title, authors = "livre", values.get("nom"), [values.get("auteur")]
+        else:
+            source, title, authors = "perso", values.get("title"), self.work_authors.get(values.get("oeuvre_id"))
+        if change.action == "delete":
+            self.remove_row(source, values["id"])
+        else:
+            self.add_row(source, values["id"], title, authors)
+        if source == "perso":
+            self.work_rows[change.previous.get("oeuvre_id", values.get("oeuvre_id"))].pop(values["id"], None)
+            if change.action != "delete":
+                self.work_rows[values.get("oeuvre_id")][values["id"]] = title
+
+    def _apply_work_change(self, change) -> None:
+        oeuvre_id = change.values["id"]
+        if change.action == "delete":
+            self.work_authors.pop(oeuvre_id, None)
+            self.work_rows.pop(oeuvre_id, None)
+            return
+        self.work_authors[oeuvre_id] = change.values.get("authors")
+        if "authors" in change.previous:
+            for row_id, title in self.work_rows.get(oeuvre_id, {}).items():
+                self.add_row("perso", row_id, title, change.values.get("authors"))
+
+    def _ranking(self, prefix: str, depth: int) -> List[Tuple[int, Entry]]:
+        cached = self.top.get(prefix)
+        if cached is not None:
+            return cached
+        start = bisect_left(self.keys, (prefix,))
+        stop = bisect_left(self.keys, (prefix + END,), start)
+        seen = {(kind, normalized) for _, kind, normalized in self.keys[start:stop]}
+        ranking = heapq.nsmallest(
+            CACHE_DEPTH if stop - start > SCAN_LIMIT else depth,
+            ((self.weights[entry], entry) for entry in seen),
+            key=rank_key,
+        )
+        if stop - start > SCAN_LIMIT:
+            self.top[prefix] = ranking
+        return ranking
+
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        # Un espace final signifie que le dernier mot est complet
+        if query[-1:].isspace():
+            prefix += " "
+        with self.lock:
+            ranking = self._ranking(prefix, limit)[:limit]
+            return [
+                {"text": self.labels[entry], "type": entry[0], "count": weight}
+                for weight, entry in ranking
+            ]
+
+
+suggest_index = SuggestIndex()
+
+
+@on_commit(Livre, BibliothequePersonnelle, Oeuvre)
+def _update_suggest_index(change):
+    suggest_index.apply(change)
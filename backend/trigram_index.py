@@ -0,0 +1,149 @@
+import heapq
+import math
+import os
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import VersionedIndex
+from hooks import on_commit
+from models import BibliothequePersonnelle
+from normalization import normalize_text
+
+TRIGRAM_INDEX_TAG = "trigram-index"
+# Même seuil par défaut que pg_trgm
+SIMILARITY_THRESHOLD = float(os.getenv("TRIGRAM_SIMILARITY_THRESHOLD", "0.3"))
+# Bornes du travail par requête : entrées de listes de trigrammes lues, puis titres vérifiés
+MAX_SCANNED_POSTINGS = int(os.getenv("TRIGRAM_MAX_SCANNED_POSTINGS", "20000"))
+MAX_CANDIDATES = int(os.getenv("TRIGRAM_MAX_CANDIDATES", "1000"))
+
+
+class SimilarTitle(NamedTuple):
+    title: str
+    similarity: float
+    owner_count: int
+    owners: Tuple[int, ...]
+
+
+def trigrams(value: Optional[str]) -> FrozenSet[str]:
+    # Découpage à la pg_trgm : chaque mot est entouré de deux espaces devant et un derrière
+    grams = set()
+    for word in normalize_text(value).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex(VersionedIndex):
+    tag = TRIGRAM_INDEX_TAG
+
+    def reset(self) -> None:
+        with self.lock:
+            # Un titre normalisé n'est indexé qu'une fois, quel que soit le nombre d'exemplaires
+            self.keys: Dict[str, int] = {}
+            self.titles: Dict[int, str] = {}
+            self.grams: Dict[int, FrozenSet[str]] = {}
+            self.postings: Dict[str, set] = defaultdict(set)
+            self.owners: Dict[int, Dict[int, int]] = {}
+            self.rows: Dict[int, Tuple[int, int]] = {}
+            self.next_id = 0
+            self.version: Optional[int] = None
+
+    def add_row(self, row_id: int, user_id: int, title: Optional[str]) -> None:
+        self.remove_row(row_id)
+        key = normalize_text(title)
+        if not key:
+            return
+        title_id = self.keys.get(key)
+        if title_id is None:
+            title_id = self.next_id
+            self.next_id += 1
+            self.keys[key] = title_id
+            self.titles[title_id] = title
+            self.grams[title_id] = trigrams(key)
+            self.owners[title_id] = {}
+            for gram in self.grams[title_id]:
+                self.postings[gram].add(title_id)
+        owners = self.owners[title_id]
+        owners[user_id] = owners.get(user_id, 0) + 1
+        self.rows[row_id] = (user_id, title_id)
+
+    def remove_row(self, row_id: int) -> None:
+        entry = self.rows.pop(row_id, None)
+        if entry is None:
+            return
+        user_id, title_id = entry
+        owners = self.owners[title_id]
+        owners[user_id] -= 1
+        if owners[user_id] <= 0:
+            del owners[user_id]
+        if owners:
+            return
+        for gram in self.grams.pop(title_id):
+            posting = self.postings[gram]
+            posting.discard(title_id)
+            if not posting:
+                del self.postings[gram]
+        del self.owners[title_id]
+        del self.keys[normalize_text(self.titles.pop(title_id))]
+
+    def load(self, db: Session) -> None:
+        rows = db.query(BibliothequePersonnelle.id, BibliothequePersonnelle.user_id, BibliothequePersonnelle.title)
+        for row_id, user_id, title in rows.yield_per(5000):
+            self.add_row(row_id, user_id, title)
+
+    def apply_change(self, change) -> None:
+        values = change.values
+        if change.action == "delete":
+            self.remove_row(values["id"])
+        else:
+            self.add_row(values["id"], values["user_id"], values.get("title"))
+
+    def similar(self, title: str, threshold: float = SIMILARITY_THRESHOLD, limit: int = 10,
+                owners_limit: int = 20) -> List[SimilarTitle]:
+        query = trigrams(title)
+        if not query:
+            return []
+        with self.lock:
+            # Les trigrammes les plus rares sont comptés en premier : ce sont eux qui distinguent
+            # les titres. Un titre de similarité >= seuil partage forcément un des
+            # len(query) - ceil(seuil * len(query)) + 1 plus rares (filtrage par préfixe).
+            postings = sorted((self.postings.get(gram, ()) for gram in query), key=len)
+            prefix = len(query) - math.ceil(threshold * len(query)) + 1
+            counts: Counter = Counter()
+            scanned = 0
+            for posting in postings[:prefix]:
+                # Budget borné, comme gin_fuzzy_search_limit : au-delà, les trigrammes restants
+                # sont trop fréquents pour départager les candidats déjà trouvés.
+                if scanned and scanned + len(posting) > MAX_SCANNED_POSTINGS:
+                    break
+                counts.update(posting)
+                scanned += len(posting)
+
+            scored = []
+            for title_id, _ in counts.most_common(MAX_CANDIDATES):
+                grams = self.grams[title_id]
+                overlap = len(query & grams)
+                similarity = overlap / (len(query) + len(grams) - overlap)
+                if similarity >= threshold:
+                    scored.append((similarity, len(self.owners[title_id]), title_id))
+            best = heapq.nlargest(limit, scored)
+            return [
+                SimilarTitle(
+                    self.titles[title_id],
+                    round(similarity, 3),
+                    len(self.owners[title_id]),
+                    tuple(islice(self.owners[title_id], owners_limit)),
+                )
+                for similarity, _, title_id in best
+            ]
+
+
+trigram_index = TrigramIndex()
+
+
+@on_commit(BibliothequePersonnelle)
+def _update_trigram_index(change):
+    trigram_index.apply(change)
@@ -5,7 +5,7 @@ import { useRouter } from 'next/navigation';
 import Link from 'next/link';
 import Header from '@/components/Header';
 import Footer from '@/components/Footer';
-import { biblioAPI } from '@/lib/api';
+import { biblioAPI, coverUrl } from '@/lib/api';
 import pageStyles from '@/styles/bibliotheque.module.css';
 import cardStyles from '@/styles/cards.module.css';
 import stateStyles from '@/styles/states.module.css';
@@ -15,6 +15,7 @@ import bibliothequeStyles from '@/styles/bibliotheque.module.css';
 interface PersonalBook {
   id: number;
   user_id: number;
+  oeuvre_id: number;
   title: string;
   authors?: string[];
   cover_url?: string;
@@ -51,7 +52,7 @@ export default function BibliothequePersonnellePage() {
   const loadLivres = async () => {
     try {
       setIsLoading(true);
-      const response = await biblioAPI.listMe(1, 10000);
+      const response = await biblioAPI.listMe(1, 10000, true);
       console.log('Livres response:', response.data);
       const data = response.data as PersonalBooksResponse;
       const loadedBooks = data.items || [];
@@ -128,7 +129,7 @@ export default function BibliothequePersonnellePage() {
           ) : (
             <div className={bibliothequeStyles.livreGrid}>
               {filteredBooks.map(book => {
-                const cover = book.cover_url || 'https://via.placeholder.com/300x450?text=Livre';
+                const cover = book.cover_url ? coverUrl(book.oeuvre_id) : 'https://via.placeholder.com/300x450?text=Livre';
                 const truncatedDescription = book.description
                   ? (book.description.length > 220
                     ? `${book.description.slice(0, 217)}...`
@@ -66,9 +66,11 @@ export default function BibliothequePage() {
     setLoading(true);
     setError('');
     try {
-      const response = await api.get(`/livres/search/${searchQuery}`);
-      setLivres(response.data);
-      setTotal(response.data.length);
+      const response = await api.get('/livres/search', {
+        params: { q: searchQuery, page: 1, page_size: booksPerPage },
+      });
+      setLivres(response.data.items);
+      setTotal(response.data.total);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Erreur lors de la recherche');
     } finally {
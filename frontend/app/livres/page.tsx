@@ -4,7 +4,8 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Header from '@/components/Header';
 import Footer from '@/components/Footer';
-import { biblioAPI } from '@/lib/api';
+import { biblioAPI, googleBooksAPI, isbnFromVolume } from '@/lib/api';
+import { useSuggestions } from '@/lib/useSuggestions';
 import pageStyles from '@/styles/livres.module.css';
 import cardStyles from '@/styles/cards.module.css';
 import formStyles from '@/styles/forms.module.css';
@@ -13,8 +14,6 @@ import buttonStyles from '@/styles/buttons.module.css';
 import gridStyles from '@/styles/grids.module.css';
 import typographyStyles from '@/styles/typography.module.css';
 
-const GOOGLE_BOOKS_API_KEY = process.env.NEXT_PUBLIC_GOOGLE_BOOKS_API_KEY || "";
-
 interface Book {
   id: string;
   title: string;
@@ -22,6 +21,7 @@ interface Book {
   thumbnail?: string;
   description?: string;
   infoLink?: string;
+  isbn?: string;
 }
 
 export default function Livres() {
@@ -33,7 +33,9 @@ export default function Livres() {
   const [addedIds, setAddedIds] = useState<Set<string>>(new Set());
   const [bookIdMap, setBookIdMap] = useState<Map<string, number>>(new Map());
   const [searchQuery, setSearchQuery] = useState('');
+  const [submittedQuery, setSubmittedQuery] = useState('');
   const [searchLoading, setSearchLoading] = useState(false);
+  const suggestions = useSuggestions(searchQuery);
 
   useEffect(() => {
     const token = localStorage.getItem('token');
@@ -47,16 +49,20 @@ export default function Livres() {
   }, []);
 
   useEffect(() => {
-    const timer = setTimeout(() => {
-      if (searchQuery.trim() === '') {
-        fetchLivres();
-      } else {
-        searchBooks(searchQuery);
-      }
-    }, 500);
+    if (submittedQuery.trim() === '') {
+      fetchLivres();
+    } else {
+      searchBooks(submittedQuery);
+    }
+  }, [submittedQuery]);
 
-    return () => clearTimeout(timer);
-  }, [searchQuery]);
+  const handleSearchChange = (value: string) => {
+    setSearchQuery(value);
+    // Choisir une suggestion lance directement la recherche
+    if (value === '' || suggestions.some((s) => s.text === value)) {
+      setSubmittedQuery(value);
+    }
+  };
 
   const loadMyBooks = async () => {
     try {
@@ -77,28 +83,20 @@ export default function Livres() {
   };
 
   const fetchLivres = async () => {
-    if (!GOOGLE_BOOKS_API_KEY) {
-      setError("Clé API Google Books manquante. Ajoutez NEXT_PUBLIC_GOOGLE_BOOKS_API_KEY dans .env.local");
-      setLoading(false);
-      return;
-    }
-
     try {
       setLoading(true);
       setError('');
-      
-      const params = new URLSearchParams();
-      params.set("q", "subject:fiction");
-      params.set("key", GOOGLE_BOOKS_API_KEY);
-      params.set("maxResults", "40");
-      params.set("printType", "books");
-      params.set("orderBy", "newest");
-      params.set("langRestrict", "fr");
 
-      const response = await fetch(`https://www.googleapis.com/books/v1/volumes?${params.toString()}`);
-      const data = await response.json();
-      
-      if (response.ok && data.items && data.items.length > 0) {
+      const response = await googleBooksAPI.volumes({
+        q: "subject:fiction",
+        maxResults: 40,
+        printType: "books",
+        orderBy: "newest",
+        langRestrict: "fr",
+      });
+      const data = response.data;
+
+      if (data.items && data.items.length > 0) {
         const parsed: Book[] = data.items.map((item: any) => {
           const info = item.volumeInfo || {};
           return {
@@ -108,19 +106,19 @@ export default function Livres() {
             thumbnail: info.imageLinks?.thumbnail?.replace('http:', 'https:'),
             description: info.description,
             infoLink: info.infoLink || info.previewLink,
+            isbn: isbnFromVolume(info),
           };
         });
         
         setLivres(parsed);
-      } else if (response.ok) {
-        setLivres([]);
-        setError('Aucun livre trouvé.');
       } else {
-        setError(`Erreur API: ${data.error?.message || 'Erreur inconnue'}`);
         setLivres([]);
+        setError('Aucun livre trouvé.');
       }
-    } catch (err) {
-      setError('Erreur lors du chargement des livres');
+    } catch (err: any) {
+      const apiMessage = err?.response?.data?.error?.message || err?.response?.data?.detail;
+      setError(apiMessage ? `Erreur API: ${apiMessage}` : 'Erreur lors du chargement des livres');
+      setLivres([]);
       console.error(err);
     } finally {
       setLoading(false);
@@ -128,25 +126,19 @@ export default function Livres() {
   };
 
   const searchBooks = async (query: string) => {
-    if (!GOOGLE_BOOKS_API_KEY) {
-      return;
-    }
-
     try {
       setSearchLoading(true);
       setError('');
-      
-      const params = new URLSearchParams();
-      params.set("q", query);
-      params.set("key", GOOGLE_BOOKS_API_KEY);
-      params.set("maxResults", "40");
-      params.set("printType", "books");
-      params.set("langRestrict", "fr");
 
-      const response = await fetch(`https://www.googleapis.com/books/v1/volumes?${params.toString()}`);
-      const data = await response.json();
-      
-      if (response.ok && data.items && data.items.length > 0) {
+      const response = await googleBooksAPI.volumes({
+        q: query,
+        maxResults: 40,
+        printType: "books",
+        langRestrict: "fr",
+      });
+      const data = response.data;
+
+      if (data.items && data.items.length > 0) {
         const parsed: Book[] = data.items.map((item: any) => {
           const info = item.volumeInfo || {};
           return {
@@ -156,17 +148,17 @@ export default function Livres() {
             thumbnail: info.imageLinks?.thumbnail?.replace('http:', 'https:'),
             description: info.description,
             infoLink: info.infoLink || info.previewLink,
+            isbn: isbnFromVolume(info),
           };
         });
         
         setLivres(parsed);
-      } else if (response.ok) {
-        setLivres([]);
       } else {
-        setError(`Erreur lors de la recherche: ${data.error?.message || 'Erreur inconnue'}`);
+        setLivres([]);
       }
-    } catch (err) {
-      setError('Erreur lors de la recherche');
+    } catch (err: any) {
+      const apiMessage = err?.response?.data?.error?.message || err?.response?.data?.detail;
+      setError(apiMessage ? `Erreur lors de la recherche: ${apiMessage}` : 'Erreur lors de la recherche');
       console.error(err);
     } finally {
       setSearchLoading(false);
@@ -203,6 +195,8 @@ export default function Livres() {
           cover_url: book.thumbnail,
           info_link: book.infoLink,
           description: book.description,
+          isbn: book.isbn,
+        isbn: book.isbn,
           source_id: book.id,
           source: 'google_books',
         });
@@ -237,12 +231,21 @@ export default function Livres() {
               type="text"
               placeholder="Rechercher par titre, auteur, ISBN..."
               value={searchQuery}
-              onChange={(e) => setSearchQuery(e.target.value)}
+              onChange={(e) => handleSearchChange(e.target.value)}
+              onKeyDown={(e) => e.key === 'Enter' && setSubmittedQuery(searchQuery)}
+              list="livres-suggestions"
               className={formStyles.searchInput}
             />
+            <datalist id="livres-suggestions">
+              {suggestions.map((s) => (
+                <option key={`${s.type}-${s.text}`} value={s.text}>
+                  {s.type === 'author' ? 'Auteur' : 'Titre'}
+                </option>
+              ))}
+            </datalist>
             {searchQuery && (
               <button
-                onClick={() => setSearchQuery('')}
+                onClick={() => handleSearchChange('')}
                 className={formStyles.clearButton}
               >
                 ×
@@ -250,9 +253,9 @@ export default function Livres() {
             )}
           </div>
 
-          {searchQuery && !searchLoading && (
+          {submittedQuery && !searchLoading && (
             <p className={typographyStyles.searchInfo}>
-              {livres.length} résultat{livres.length > 1 ? 's' : ''} pour "{searchQuery}"
+              {livres.length} résultat{livres.length > 1 ? 's' : ''} pour "{submittedQuery}"
             </p>
           )}
 
@@ -267,7 +270,7 @@ export default function Livres() {
           ) : livres.length === 0 ? (
             <div className={stateStyles.emptyContainer}>
               <p className={stateStyles.emptyText}>
-                {searchQuery ? 'Aucun livre ne correspond à votre recherche.' : 'Aucun livre disponible.'}
+                {submittedQuery ? 'Aucun livre ne correspond à votre recherche.' : 'Aucun livre disponible.'}
               </p>
             </div>
           ) : (
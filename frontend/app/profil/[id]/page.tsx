@@ -4,6 +4,7 @@ import { useEffect, useState } from 'react';
 import { useRouter, useParams, useSearchParams } from 'next/navigation';
 import Header from '@/components/Header';
 import Footer from '@/components/Footer';
+import { coverUrl } from '@/lib/api';
 
 interface User {
   id: number;
@@ -18,11 +19,25 @@ interface User {
 interface PersonalBook {
   id: number;
   user_id: number;
+  oeuvre_id: number;
   title: string;
   authors?: string[];
   cover_url?: string;
 }
 
+interface ExchangeStatus {
+  emprunt_id: number | null;
+  last_exchange_at: string | null;
+  pending_proposal_id: number | null;
+  pending_book_id: number | string | null;
+}
+
+interface UserProfileFull {
+  user: User;
+  library: { items: PersonalBook[]; total: number | null };
+  exchange: ExchangeStatus | null;
+}
+
 export default function UserProfilPage() {
   const router = useRouter();
   const params = useParams();
@@ -61,29 +76,22 @@ export default function UserProfilPage() {
       const API_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/\/$/, '');
 
 
-      const userResponse = await fetch(`${API_URL}/users/profile/${userId}`, {
+      // Profil, bibliothèque et état des échanges en un seul aller-retour
+      const response = await fetch(`${API_URL}/users/profile/${userId}/full`, {
         headers: {
           'Authorization': `Bearer ${token}`,
         },
       });
 
-      if (!userResponse.ok) {
+      if (!response.ok) {
         throw new Error('Utilisateur non trouvé');
       }
 
-      const userData = await userResponse.json();
-      setUser(userData);
-
-
-      const livresResponse = await fetch(`${API_URL}/bibliotheque-personnelle/user/${userId}`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
-
-      if (livresResponse.ok) {
-        const livresData = await livresResponse.json();
-        setLivres(livresData.items || []);
+      const data: UserProfileFull = await response.json();
+      setUser(data.user);
+      setLivres(data.library.items || []);
+      if (!fromExchange && data.exchange?.pending_book_id != null) {
+        setSelectedBookId(Number(data.exchange.pending_book_id));
       }
 
       setIsLoading(false);
@@ -267,7 +275,7 @@ export default function UserProfilPage() {
                   <div key={livre.id} style={styles.bookCard}>
                     {livre.cover_url ? (
                       <img
-                        src={livre.cover_url}
+                        src={coverUrl(livre.oeuvre_id, 'thumb')}
                         alt={livre.title}
                         style={styles.bookCover}
                       />
@@ -5,6 +5,7 @@ import { useRouter } from 'next/navigation';
 import { Settings, MapPin, BookOpen, User as UserIcon } from 'lucide-react';
 import Header from '@/components/Header';
 import Footer from '@/components/Footer';
+import { coverUrl } from '@/lib/api';
 import styles from '@/styles/profil.module.css';
 import cardStyles from '@/styles/cards.module.css';
 import buttonStyles from '@/styles/buttons.module.css';
@@ -27,6 +28,7 @@ interface User {
 interface PersonalBook {
   id: number;
   user_id: number;
+  oeuvre_id: number;
   title: string;
   authors?: string[];
   cover_url?: string;
@@ -94,7 +96,7 @@ export default function ProfilPage() {
           confirmPassword: '',
         });
 
-        const livresResponse = await fetch(`${API_URL}/bibliotheque-personnelle/me?page=1&page_size=10000`, {
+        const livresResponse = await fetch(`${API_URL}/bibliotheque-personnelle/me?page=1&page_size=10000&stream=true`, {
           headers: {
             Authorization: `Bearer ${token}`,
           },
@@ -336,7 +338,7 @@ export default function ProfilPage() {
                       <div className={cardStyles.coverWrapper}>
                         {livre.cover_url ? (
                           <img
-                            src={livre.cover_url}
+                            src={coverUrl(livre.oeuvre_id, 'thumb')}
                             alt={livre.title}
                             className={cardStyles.coverImage}
                           />
@@ -5,13 +5,12 @@ import Footer from "@/components/Footer";
 import { useEffect, useMemo, useState, type CSSProperties } from "react";
 import { useRouter } from "next/navigation";
 import { Playfair_Display, Space_Grotesk } from "next/font/google";
-import { biblioAPI } from "@/lib/api";
+import { biblioAPI, googleBooksAPI, isbnFromVolume } from "@/lib/api";
+import { useSuggestions } from "@/lib/useSuggestions";
 
 const display = Playfair_Display({ subsets: ["latin"], weight: ["600"] });
 const sans = Space_Grotesk({ subsets: ["latin"], weight: ["400", "500", "600", "700"] });
 
-const GOOGLE_BOOKS_API_KEY = process.env.NEXT_PUBLIC_GOOGLE_BOOKS_API_KEY || "";
-
 type Book = {
   id: string;
   title: string;
@@ -19,11 +18,14 @@ type Book = {
   thumbnail?: string;
   description?: string;
   infoLink?: string;
+  isbn?: string;
 };
 
 export default function RechercheLivre() {
   const router = useRouter();
   const [query, setQuery] = useState("");
+  const [submittedQuery, setSubmittedQuery] = useState("");
+  const suggestions = useSuggestions(query);
   const [results, setResults] = useState<Book[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -43,8 +45,6 @@ export default function RechercheLivre() {
   }, []);
 
   const loadPopularBooks = async (page: number) => {
-    if (!GOOGLE_BOOKS_API_KEY) return;
-    
     try {
       if (page === 0) {
         setLoadingPopular(true);
@@ -53,19 +53,17 @@ export default function RechercheLivre() {
       }
       
       const startIndex = page * 40; // Google Books limite à 40 par requête
-      const params = new URLSearchParams();
-      params.set("q", "subject:fiction");
-      params.set("key", GOOGLE_BOOKS_API_KEY);
-      params.set("maxResults", "40");
-      params.set("startIndex", startIndex.toString());
-      params.set("printType", "books");
-      params.set("orderBy", "newest");
-      params.set("langRestrict", "fr");
+      const response = await googleBooksAPI.volumes({
+        q: "subject:fiction",
+        maxResults: 40,
+        startIndex,
+        printType: "books",
+        orderBy: "newest",
+        langRestrict: "fr",
+      });
+      const data = response.data;
 
-      const response = await fetch(`https://www.googleapis.com/books/v1/volumes?${params.toString()}`);
-      const data = await response.json();
-      
-      if (response.ok && data.items) {
+      if (data.items) {
         const parsed: Book[] = data.items.map((item: any) => {
           const info = item.volumeInfo || {};
           return {
@@ -75,6 +73,7 @@ export default function RechercheLivre() {
             thumbnail: info.imageLinks?.thumbnail,
             description: info.description,
             infoLink: info.infoLink || info.previewLink,
+            isbn: isbnFromVolume(info),
           };
         });
         
@@ -124,7 +123,13 @@ export default function RechercheLivre() {
   }, [router]);
 
   useEffect(() => {
-    const trimmed = query.trim();
+    if (!query.trim()) {
+      setSubmittedQuery("");
+    }
+  }, [query]);
+
+  useEffect(() => {
+    const trimmed = submittedQuery.trim();
 
     if (!trimmed) {
       setResults([]);
@@ -139,34 +144,17 @@ export default function RechercheLivre() {
       setError("Tapez au moins 2 caractères pour lancer la recherche.");
       return;
     }
-    
-    if (!GOOGLE_BOOKS_API_KEY) {
-      setError("Clé API Google Books manquante. Ajoutez NEXT_PUBLIC_GOOGLE_BOOKS_API_KEY dans .env.local puis relancez.");
-      return;
-    }
 
     const controller = new AbortController();
     const timeout = setTimeout(async () => {
       setLoading(true);
       setHasTyped(true);
       try {
-        const params = new URLSearchParams();
-        params.set("q", trimmed);
-        params.set("key", GOOGLE_BOOKS_API_KEY);
-        params.set("maxResults", "12");
-        params.set("printType", "books");
-        params.set("orderBy", "relevance");
-        params.set("langRestrict", "fr");
-
-        const response = await fetch(`https://www.googleapis.com/books/v1/volumes?${params.toString()}`,
-          { signal: controller.signal },
+        const response = await googleBooksAPI.volumes(
+          { q: trimmed, maxResults: 12, printType: "books", orderBy: "relevance", langRestrict: "fr" },
+          controller.signal,
         );
-
-        const data = await response.json();
-        if (!response.ok) {
-          const apiMessage = data?.error?.message;
-          throw new Error(apiMessage || "Recherche Google Books indisponible");
-        }
+        const data = response.data;
 
         const parsed: Book[] = (data.items || []).map((item: any) => {
           const info = item.volumeInfo || {};
@@ -177,13 +165,15 @@ export default function RechercheLivre() {
             thumbnail: info.imageLinks?.thumbnail,
             description: info.description,
             infoLink: info.infoLink || info.previewLink,
+            isbn: isbnFromVolume(info),
           };
         });
         setResults(parsed);
         setError(null);
       } catch (err: any) {
-        if (err.name === "AbortError") return;
-        setError(err?.message || "Impossible de récupérer les livres pour le moment.");
+        if (err.name === "AbortError" || err.name === "CanceledError") return;
+        const apiMessage = err?.response?.data?.error?.message || err?.response?.data?.detail;
+        setError(apiMessage || "Impossible de récupérer les livres pour le moment.");
       } finally {
         setLoading(false);
       }
@@ -193,7 +183,15 @@ export default function RechercheLivre() {
       clearTimeout(timeout);
       controller.abort();
     };
-  }, [query]);
+  }, [submittedQuery]);
+
+  const handleQueryChange = (value: string) => {
+    setQuery(value);
+    // Choisir une suggestion lance directement la recherche
+    if (suggestions.some((s) => s.text === value)) {
+      setSubmittedQuery(value);
+    }
+  };
 
   const heroText = useMemo(
     () => "Trouvez le livre que vous voulez",
@@ -210,6 +208,7 @@ export default function RechercheLivre() {
         cover_url: book.thumbnail,
         info_link: book.infoLink,
         description: book.description,
+        isbn: book.isbn,
         source: "google_books",
         source_id: book.id,
       });
@@ -235,7 +234,7 @@ export default function RechercheLivre() {
           <p style={styles.kicker}>Recherche instantanée</p>
           <h1 style={styles.title} className={display.className}>{heroText}</h1>
           <p style={styles.subtitle}>
-            Tapez un titre, un auteur ou un mot-clé : nous interrogeons Google Books en temps réel et affichons les correspondances.
+            Tapez un titre, un auteur ou un mot-clé : les suggestions viennent des bibliothèques de la communauté, Entrée lance la recherche Google Books.
           </p>
           <div style={styles.searchZone}>
             <div style={styles.searchBar}>
@@ -245,10 +244,19 @@ export default function RechercheLivre() {
               </svg>
               <input
                 value={query}
-                onChange={(e) => setQuery(e.target.value)}
+                onChange={(e) => handleQueryChange(e.target.value)}
+                onKeyDown={(e) => e.key === "Enter" && setSubmittedQuery(query)}
+                list="recherche-suggestions"
                 placeholder="Titre, auteur, ISBN..."
                 style={styles.input}
               />
+              <datalist id="recherche-suggestions">
+                {suggestions.map((s) => (
+                  <option key={`${s.type}-${s.text}`} value={s.text}>
+                    {s.type === "author" ? "Auteur" : "Titre"}
+                  </option>
+                ))}
+              </datalist>
               {loading && <span style={styles.pill}>Recherche...</span>}
             </div>
             <p style={styles.helper}>Suggestions en direct à chaque frappe.</p>
@@ -34,32 +34,6 @@ export default function MapComponent() {
   const [bookTitle, setBookTitle] = useState(null);
   const [mapReady, setMapReady] = useState(false);
 
-  const coordsCache = {};
-
-  const getCityCoords = async (city) => {
-    if (coordsCache[city]) return coordsCache[city];
-
-    try {
-      const url = `https://nominatim.openstreetmap.org/search?format=json&q=${encodeURIComponent(
-        city
-      )}&limit=1`;
-
-      const response = await fetch(url, {
-        headers: { 'User-Agent': 'MapProject/1.0 (votre-email@exemple.com)' },
-      });
-
-      const data = await response.json();
-      if (!data.length) return null;
-
-      const coords = [parseFloat(data[0].lat), parseFloat(data[0].lon)];
-      coordsCache[city] = coords; 
-      return coords;
-    } catch (err) {
-      console.error('Erreur Nominatim:', err);
-      return null;
-    }
-  };
-
   useEffect(() => {
     // Récupérer les paramètres de la URL
     const book = searchParams.get('book');
@@ -82,12 +56,11 @@ export default function MapComponent() {
           headers: { Authorization: `Bearer ${token}` },
         });
         const me = await res.json();
-        const userCity = me.villes;
 
+        // Les coordonnées sont résolues côté serveur à l'inscription
         let centerCoords = DEFAULT_COORDS;
-        if (userCity) {
-          const coords = await getCityCoords(userCity);
-          if (coords) centerCoords = coords;
+        if (me.latitude != null && me.longitude != null) {
+          centerCoords = [me.latitude, me.longitude];
         }
 
         if (mapContainer.current && !mapContainer.current._leaflet_id) {
@@ -124,22 +97,52 @@ export default function MapComponent() {
     };
   }, []);
 
-  // Charger les utilisateurs quand la carte est prête ou quand le filtre change
+  // Charger les utilisateurs d'une ville sélectionnée (filtrés par livre côté serveur)
+  const selectCity = async (city) => {
+    try {
+      const token = localStorage.getItem('token');
+      const params = new URLSearchParams({ city });
+      if (bookFilter) params.set('book', bookFilter);
+
+      const res = await fetch(`${API_URL}/api/users-cities?${params.toString()}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+
+      if (!res.ok) {
+        throw new Error(`HTTP error! status: ${res.status}`);
+      }
+
+      const snapshot = await res.json();
+      setUsersByCity(snapshot.cities || {});
+      setSelectedCity(city);
+    } catch (err) {
+      console.error('Erreur lors du chargement:', err);
+    }
+  };
+
+  // Charger les clusters de la zone visible quand la carte bouge ou quand le filtre change
   useEffect(() => {
     if (!mapReady || !map.current) return;
 
-    const loadUsers = async () => {
+    const loadClusters = async () => {
       try {
         const token = localStorage.getItem('token');
-
-        // Nettoyer les markers existants
-        map.current.eachLayer((layer) => {
-          if (layer instanceof L.Marker) {
-            map.current.removeLayer(layer);
-          }
+        const bounds = map.current.getBounds();
+        const zoom = map.current.getZoom();
+
+        const params = new URLSearchParams({
+          south: Math.max(-90, bounds.getSouth()).toString(),
+          west: Math.max(-180, bounds.getWest()).toString(),
+          north: Math.min(90, bounds.getNorth()).toString(),
+          east: Math.min(180, bounds.getEast()).toString(),
+          zoom: zoom.toString(),
         });
+        // Le filtre par livre est appliqué côté serveur
+        if (bookFilter) params.set('book', bookFilter);
 
-        const res = await fetch(`${API_URL}/api/users-cities`, {
+        const res = await fetch(`${API_URL}/api/map/clusters?${params.toString()}`, {
           headers: {
             Authorization: `Bearer ${token}`,
           },
@@ -149,46 +152,42 @@ export default function MapComponent() {
           throw new Error(`HTTP error! status: ${res.status}`);
         }
 
-        const users = await res.json();
-        let filteredUsers = users;
-
-        // Filtrer les utilisateurs qui ont le livre si un filtre est actif
-        if (bookFilter) {
-          filteredUsers = users.filter((user) => {
-            if (!user.bibliotheque_personnelle) return false;
-            return user.bibliotheque_personnelle.some(
-              (livre) => livre.source_id === bookFilter
-            );
-          });
-        }
+        const data = await res.json();
 
-        const byCity = {};
+        if (!map.current || !map.current._leaflet_id) return;
 
-        filteredUsers.forEach((user) => {
-          if (!user.Villes) return;
-          if (!byCity[user.Villes]) byCity[user.Villes] = [];
-          byCity[user.Villes].push(user);
+        // Nettoyer les markers existants
+        map.current.eachLayer((layer) => {
+          if (layer instanceof L.Marker) {
+            map.current.removeLayer(layer);
+          }
         });
 
-        setUsersByCity(byCity);
-
-        // Ajouter les nouveaux markers avec géocodage dynamique
-        if (map.current && map.current._leaflet_id) {
-          for (const city of Object.keys(byCity)) {
-            const coords = await getCityCoords(city);
-            if (!coords || !map.current) continue;
-
-            try {
-              const marker = L.marker(coords);
-              if (map.current && map.current._leaflet_id) {
-                marker.addTo(map.current);
-                marker.on('click', () => {
-                  setSelectedCity(city);
-                });
-              }
-            } catch (err) {
-              console.warn('Erreur lors de l\'ajout du marker:', err);
+        for (const cluster of data.clusters) {
+          try {
+            const icon = L.divIcon({
+              className: '',
+              html: `<div style="background:#ffc0cb;border:2px solid #fff;border-radius:50%;width:36px;height:36px;display:flex;align-items:center;justify-content:center;font-weight:600;box-shadow:0 2px 6px rgba(0,0,0,0.25)">${cluster.count}</div>`,
+              iconSize: [36, 36],
+            });
+            const marker = L.marker([cluster.latitude, cluster.longitude], { icon });
+            if (cluster.top_books.length > 0) {
+              // Titres saisis par les utilisateurs : texte brut, jamais interprété comme du HTML
+              const tooltip = document.createElement('span');
+              tooltip.textContent = cluster.top_books.map((book) => book.title).join(' · ');
+              marker.bindTooltip(tooltip);
             }
+            marker.addTo(map.current);
+            marker.on('click', () => {
+              // Zoomer tant que le cluster regroupe plusieurs villes
+              if (cluster.cities.length === 1 || map.current.getZoom() >= map.current.getMaxZoom()) {
+                if (cluster.cities.length > 0) selectCity(cluster.cities[0]);
+              } else {
+                map.current.setView([cluster.latitude, cluster.longitude], map.current.getZoom() + 2);
+              }
+            });
+          } catch (err) {
+            console.warn('Erreur lors de l\'ajout du marker:', err);
           }
         }
       } catch (err) {
@@ -196,7 +195,12 @@ export default function MapComponent() {
       }
     };
 
-    loadUsers();
+    loadClusters();
+    map.current.on('moveend', loadClusters);
+
+    return () => {
+      if (map.current) map.current.off('moveend', loadClusters);
+    };
   }, [mapReady, bookFilter]);
 
   const handleProposeExchange = async (user) => {
@@ -36,11 +36,28 @@ export const livreAPI = {
   getById: (id: number) => api.get(`/livres/${id}`),
   update: (id: number, data: any) => api.put(`/livres/${id}`, data),
   delete: (id: number) => api.delete(`/livres/${id}`),
-  search: (query: string) => api.get(`/livres/search/${query}`),
+  search: (query: string, page: number = 1, pageSize: number = 10) =>
+    api.get('/livres/search', { params: { q: query, page, page_size: pageSize } }),
+  suggest: (query: string, limit: number = 8) => api.get('/livres/suggest', { params: { q: query, limit } }),
   assignToUser: (livreId: number, userId: number) => api.post(`/livres/${livreId}/assign/${userId}`),
   unassignFromUser: (livreId: number, userId: number) => api.delete(`/livres/${livreId}/unassign/${userId}`),
 };
 
+export const googleBooksAPI = {
+  volumes: (params: Record<string, string | number>, signal?: AbortSignal) =>
+    api.get('/google-books/volumes', { params, signal }),
+};
+
+// ISBN d'un volume Google Books : il sert à regrouper les exemplaires d'une même oeuvre
+export const isbnFromVolume = (info: any): string | undefined => {
+  const identifiers: { type: string; identifier: string }[] = info?.industryIdentifiers || [];
+  return (identifiers.find((id) => id.type === 'ISBN_13') || identifiers.find((id) => id.type === 'ISBN_10'))?.identifier;
+};
+
+// Couverture redimensionnée et mise en cache par le backend
+export const coverUrl = (oeuvreId: number, variant: 'thumb' | 'medium' = 'medium') =>
+  `${API_URL}/covers/${oeuvreId}/${variant}`;
+
 export const empruntAPI = {
   create: (data: any) => api.post('/emprunts/', data),
   getAll: () => api.get('/emprunts/'),
@@ -53,7 +70,8 @@ export const empruntAPI = {
 
 export const biblioAPI = {
   add: (data: any) => api.post('/bibliotheque-personnelle/', data),
-  listMe: (page: number = 1, pageSize: number = 10) => api.get(`/bibliotheque-personnelle/me?page=${page}&page_size=${pageSize}`),
+  listMe: (page: number = 1, pageSize: number = 10, stream: boolean = false) =>
+    api.get(`/bibliotheque-personnelle/me?page=${page}&page_size=${pageSize}${stream ? '&stream=true' : ''}`),
   delete: (id: number) => api.delete(`/bibliotheque-personnelle/${id}`),
 };
 
@@ -0,0 +1,39 @@
+import { useEffect, useState } from 'react';
+import { livreAPI } from '@/lib/api';
+
+export type Suggestion = {
+  text: string;
+  type: 'title' | 'author';
+  count: number;
+};
+
+// Suggestions servies par le backend à chaque frappe : Google Books n'est interrogé
+// qu'à la validation de la recherche.
+export function useSuggestions(query: string, delay: number = 120) {
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+
+  useEffect(() => {
+    const trimmed = query.trim();
+    if (!trimmed) {
+      setSuggestions([]);
+      return;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await livreAPI.suggest(query);
+        if (!cancelled) setSuggestions(res.data || []);
+      } catch (e) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, delay);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query, delay]);
+
+  return suggestions;
+}
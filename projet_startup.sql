@@ -33,16 +33,15 @@ DROP TABLE IF EXISTS `bibliothequepersonnelle`;
 CREATE TABLE IF NOT EXISTS `bibliothequepersonnelle` (
   `ID` int NOT NULL AUTO_INCREMENT,
   `UserID` int NOT NULL,
+  `OeuvreID` int NOT NULL,
   `Title` varchar(255) NOT NULL,
-  `Authors` json DEFAULT NULL,
-  `CoverUrl` varchar(512) DEFAULT NULL,
-  `InfoLink` varchar(512) DEFAULT NULL,
-  `Description` varchar(2000) DEFAULT NULL,
   `Source` varchar(50) NOT NULL DEFAULT 'google_books',
   `SourceID` varchar(255) DEFAULT NULL,
   `CreatedAt` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`ID`),
-  KEY `idx_biblio_user` (`UserID`)
+  KEY `idx_biblio_user` (`UserID`),
+  KEY `idx_biblio_user_created` (`UserID`, `CreatedAt`, `ID`),
+  KEY `ix_BibliothequePersonnelle_OeuvreID` (`OeuvreID`)
 ) ENGINE=InnoDB AUTO_INCREMENT=11 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- --------------------------------------------------------
@@ -76,11 +75,37 @@ CREATE TABLE IF NOT EXISTS `livre` (
   `Nom` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
   `Auteur` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
   `Genre` varchar(100) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
-  PRIMARY KEY (`ID`)
+  PRIMARY KEY (`ID`),
+  FULLTEXT KEY `ft_livre` (`Nom`, `Auteur`, `Genre`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- --------------------------------------------------------
 
+--
+-- Structure de la table `oeuvre`
+--
+
+DROP TABLE IF EXISTS `oeuvre`;
+CREATE TABLE IF NOT EXISTS `oeuvre` (
+  `ID` int NOT NULL AUTO_INCREMENT,
+  `Cle` varchar(191) NOT NULL,
+  `ISBN` varchar(13) DEFAULT NULL,
+  `Source` varchar(50) NOT NULL DEFAULT 'google_books',
+  `SourceID` varchar(255) DEFAULT NULL,
+  `Title` varchar(255) NOT NULL,
+  `Authors` json DEFAULT NULL,
+  `CoverUrl` varchar(512) DEFAULT NULL,
+  `InfoLink` varchar(512) DEFAULT NULL,
+  `Description` varchar(2000) DEFAULT NULL,
+  `CreatedAt` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`ID`),
+  UNIQUE KEY `Cle` (`Cle`),
+  KEY `ix_Oeuvre_ISBN` (`ISBN`),
+  KEY `idx_oeuvre_source` (`Source`, `SourceID`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Structure de la table `user`
 --
@@ -91,6 +116,8 @@ CREATE TABLE IF NOT EXISTS `user` (
   `Surname` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL,
   `Role` varchar(20) COLLATE utf8mb4_unicode_ci NOT NULL,
   `Villes` varchar(100) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `Latitude` double DEFAULT NULL,
+  `Longitude` double DEFAULT NULL,
   `MDP` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
   `Email` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
   `Age` int DEFAULT NULL,
@@ -144,6 +171,23 @@ CREATE TABLE IF NOT EXISTS `message` (
   KEY `idx_datetime` (`DateTime`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+--
+-- Structure de la table `messagearchive`
+--
+
+DROP TABLE IF EXISTS `messagearchive`;
+CREATE TABLE IF NOT EXISTS `messagearchive` (
+  `ID` int NOT NULL AUTO_INCREMENT,
+  `IDEmprunt` int NOT NULL,
+  `FirstMessageAt` datetime NOT NULL,
+  `LastMessageAt` datetime NOT NULL,
+  `MessageCount` int NOT NULL,
+  `Payload` mediumblob NOT NULL COMMENT 'Notifications résolues compressées (zlib + JSON)',
+  `ArchivedAt` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`ID`),
+  KEY `fk_messagearchive_emprunt` (`IDEmprunt`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 --
 -- Contraintes pour les tables déchargées
 --
@@ -152,7 +196,8 @@ CREATE TABLE IF NOT EXISTS `message` (
 -- Contraintes pour la table `bibliothequepersonnelle`
 --
 ALTER TABLE `bibliothequepersonnelle`
-  ADD CONSTRAINT `fk_biblio_user` FOREIGN KEY (`UserID`) REFERENCES `user` (`ID`) ON DELETE CASCADE;
+  ADD CONSTRAINT `fk_biblio_user` FOREIGN KEY (`UserID`) REFERENCES `user` (`ID`) ON DELETE CASCADE,
+  ADD CONSTRAINT `fk_bibliotheque_oeuvre` FOREIGN KEY (`OeuvreID`) REFERENCES `oeuvre` (`ID`);
 
 --
 -- Contraintes pour la table `emprunt`
@@ -172,5 +217,9 @@ ALTER TABLE `message`
   ADD CONSTRAINT `fk_message_emprunt` FOREIGN KEY (`IDEmprunt`) REFERENCES `emprunt` (`ID`) ON DELETE CASCADE,
   ADD CONSTRAINT `fk_message_sender` FOREIGN KEY (`IDSender`) REFERENCES `user` (`ID`) ON DELETE CASCADE;
 
+-- Contraintes pour la table `messagearchive`
+ALTER TABLE `messagearchive`
+  ADD CONSTRAINT `fk_messagearchive_emprunt` FOREIGN KEY (`IDEmprunt`) REFERENCES `emprunt` (`ID`) ON DELETE CASCADE;
+
 -- Réactiver les contraintes de clés étrangères
 SET FOREIGN_KEY_CHECKS = 1;
\ No newline at end of file
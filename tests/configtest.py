@@ -6,6 +6,8 @@ from sqlalchemy.pool import StaticPool
 from database import Base, get_db
 from main import app
 from models import User, Livre, Emprunt, BibliothequePersonnelle, Message
+from counts import count_cache
+from response_cache import response_cache
 from auth import get_password_hash, create_access_token
 from datetime import timedelta
 
@@ -24,6 +26,9 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db_session():
     """Crée une session de base de données pour les tests"""
     Base.metadata.create_all(bind=engine)
+    # La base est recréée sans passer par les hooks : les totaux en cache seraient faux
+    count_cache.reset()
+    response_cache.clear()
     session = TestingSessionLocal()
     try:
         yield session
@@ -147,7 +152,7 @@ def created_admin_user(db_session, test_admin_user_data):
 def auth_token(created_user):
     """Génère un token d'authentification pour un utilisateur"""
     access_token = create_access_token(
-        data={"sub": created_user.email, "role": created_user.role},
+        data={"sub": created_user.email, "uid": created_user.id, "role": created_user.role},
         expires_delta=timedelta(minutes=30)
     )
     return access_token
@@ -157,7 +162,7 @@ def auth_token(created_user):
 def admin_auth_token(created_admin_user):
     """Génère un token d'authentification pour un administrateur"""
     access_token = create_access_token(
-        data={"sub": created_admin_user.email, "role": created_admin_user.role},
+        data={"sub": created_admin_user.email, "uid": created_admin_user.id, "role": created_admin_user.role},
         expires_delta=timedelta(minutes=30)
     )
     return access_token
@@ -167,7 +172,7 @@ def admin_auth_token(created_admin_user):
 def premium_auth_token(created_premium_user):
     """Génère un token d'authentification pour un utilisateur premium"""
     access_token = create_access_token(
-        data={"sub": created_premium_user.email, "role": created_premium_user.role},
+        data={"sub": created_premium_user.email, "uid": created_premium_user.id, "role": created_premium_user.role},
         expires_delta=timedelta(minutes=30)
     )
     return access_token
@@ -264,7 +269,7 @@ def test_personal_book_data():
     return {
         "title": "1984",
         "authors": ["George Orwell"],
-        "cover_url": "https://example.com/cover.jpg",
+        "cover_url": "https://books.google.com/books/content?id=test123&printsec=frontcover&img=1",
         "info_link": "https://example.com/book",
         "description": "Un roman dystopique",
         "source": "google_books",
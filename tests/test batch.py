@@ -0,0 +1,46 @@
+import pytest
+from fastapi import status
+from sqlalchemy import event
+
+
+@pytest.fixture
+def user_lookups(db_session):
+    """Compte les recherches d'utilisateur par email (authentification)"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and '"User"."Email" = ?' in statement:
+            captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+@pytest.mark.integration
+class TestBatch:
+    """Tests de l'endpoint /batch"""
+
+    def test_statuses_per_item_and_single_authentication(self, client, created_user, auth_headers, user_lookups):
+        """Chaque sous-requête garde son statut ; l'utilisateur n'est chargé qu'une fois"""
+        response = client.post("/batch", headers=auth_headers, json={"requests": [
+            {"id": "me", "path": "/users/me"},
+            {"id": "unread", "path": "/messages/unread/count"},
+            {"id": "missing", "path": "/livres/999999"},
+            {"id": "library", "path": "/bibliotheque-personnelle/me?page_size=5"},
+            {"id": "loop", "path": "/batch"},
+        ]})
+
+        assert response.status_code == status.HTTP_200_OK
+        results = {item["id"]: item for item in response.json()["responses"]}
+        assert results["me"]["status"] == 200 and results["me"]["body"]["email"] == created_user.email
+        assert results["unread"]["body"] == {"unread_count": 0}
+        assert results["missing"]["status"] == 404
+        assert results["library"]["body"]["page_size"] == 5
+        assert results["loop"]["status"] == 400
+        assert len(user_lookups) == 1
+
+    def test_requires_authentication(self, client):
+        """Sans token, le lot est refusé en entier"""
+        response = client.post("/batch", json={"requests": [{"path": "/livres/"}]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,111 @@
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from gazetteer import migrate_user_coordinates
+from models import User
+
+
+@pytest.mark.integration
+class TestUsersCitiesSnapshot:
+    """Tests du snapshot ville → utilisateurs → livres de la carte"""
+
+    def test_snapshot_groups_users_by_city(self, client, created_user, created_premium_user, created_personal_book):
+        """Les utilisateurs sont regroupés par ville avec leurs source_id"""
+        response = client.get("/api/users-cities")
+
+        assert response.status_code == status.HTTP_200_OK
+        cities = response.json()["cities"]
+        assert cities["Paris"] == [{"ID": created_user.id, "Name": "John", "Surname": "Doe", "books": ["test123"]}]
+        assert cities["Lyon"][0]["books"] == []
+
+    def test_book_filter_is_applied_server_side(self, client, created_user, created_premium_user, created_personal_book):
+        """Le paramètre book ne garde que les propriétaires du livre"""
+        response = client.get("/api/users-cities?book=test123")
+
+        assert list(response.json()["cities"]) == ["Paris"]
+
+    def test_etag_and_invalidation(self, client, created_user, auth_headers, test_personal_book_data):
+        """Un ETag identique renvoie 304 tant que la bibliothèque ne change pas"""
+        first = client.get("/api/users-cities")
+        etag = first.headers["ETag"]
+
+        cached = client.get("/api/users-cities", headers={"If-None-Match": etag})
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+        client.post("/bibliotheque-personnelle/", json=test_personal_book_data, headers=auth_headers)
+
+        refreshed = client.get("/api/users-cities", headers={"If-None-Match": etag})
+        assert refreshed.status_code == status.HTTP_200_OK
+        assert refreshed.json()["cities"]["Paris"][0]["books"] == ["test123"]
+
+
+@pytest.mark.unit
+class TestGazetteer:
+    """Tests du référentiel hors ligne des communes"""
+
+    def test_resolve_city_normalizes_accents_and_case(self):
+        """Accents, casse, abréviations et codes postaux sont ignorés"""
+        from gazetteer import resolve_city
+
+        assert resolve_city("st etienne").name == "Saint-Étienne"
+        assert resolve_city("75015 PARIS").name == "Paris"
+        assert resolve_city("Ville imaginaire") is None
+
+
+@pytest.mark.integration
+class TestCityCoordinates:
+    """Tests des coordonnées stockées sur l'utilisateur"""
+
+    def test_register_stores_canonical_city_and_coordinates(self, client, test_user_data):
+        """La ville est normalisée et géocodée à l'inscription"""
+        user_data = test_user_data.copy()
+        user_data["villes"] = "saint-etienne"
+
+        response = client.post("/auth/register", json=user_data)
+
+        data = response.json()
+        assert data["villes"] == "Saint-Étienne"
+        assert data["latitude"] == pytest.approx(45.43, abs=0.01)
+        assert data["longitude"] == pytest.approx(4.39, abs=0.01)
+
+    def test_update_recomputes_coordinates(self, client, created_user, auth_headers):
+        """Changer de ville met à jour les coordonnées"""
+        response = client.put("/users/me", json={"villes": "lyon"}, headers=auth_headers)
+
+        assert response.json()["villes"] == "Lyon"
+        assert response.json()["latitude"] == pytest.approx(45.75, abs=0.01)
+
+    def test_snapshot_returns_city_coordinates(self, client, created_user):
+        """La carte reçoit les coordonnées avec le snapshot"""
+        response = client.get("/api/users-cities")
+
+        assert response.json()["coordinates"]["Paris"] == pytest.approx([48.85, 2.35], abs=0.01)
+
+
+@pytest.mark.integration
+class TestUserCoordinatesMigration:
+    """Tests de la migration des coordonnées sur une base antérieure au gazetier"""
+
+    def test_old_user_table_gets_coordinate_columns(self):
+        """Une table User sans Latitude / Longitude redevient lisible par l'ORM"""
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text(
+                'CREATE TABLE "User" (ID INTEGER PRIMARY KEY, Name VARCHAR(100) NOT NULL, Surname VARCHAR(100) NOT NULL, '
+                "Role VARCHAR(20) NOT NULL, Villes VARCHAR(100), MDP VARCHAR(255) NOT NULL, Email VARCHAR(191) NOT NULL, "
+                "Age INTEGER, Signalement INTEGER, liste_livres JSON)"
+            ))
+            conn.execute(text(
+                'INSERT INTO "User" (Name, Surname, Role, Villes, MDP, Email, Age) '
+                "VALUES ('Jean', 'Dupont', 'Pauvre', 'Lyon', 'x', 'jean@example.com', 30)"
+            ))
+
+        assert migrate_user_coordinates(engine) == 2
+        assert migrate_user_coordinates(engine) == 0
+
+        with Session(engine) as session:
+            user = session.query(User).filter(User.email == "jean@example.com").one()
+        assert user.villes == "Lyon" and user.latitude is None
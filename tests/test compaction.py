@@ -0,0 +1,75 @@
+import pytest
+from fastapi import status
+from datetime import datetime, timedelta
+from models import Emprunt, Message, MessageArchive
+from compaction import compact_assistant_threads
+
+
+@pytest.fixture
+def assistant_thread(db_session, created_user, assistant_user, generic_book):
+    """Crée un fil de notifications de l'assistant pour l'utilisateur"""
+    emprunt = Emprunt(
+        id_user1=assistant_user.id,
+        id_user2=created_user.id,
+        id_livre=generic_book.id
+    )
+    db_session.add(emprunt)
+    db_session.commit()
+    db_session.refresh(emprunt)
+    return emprunt
+
+
+def add_notification(db_session, emprunt, sender, days_ago, status_value):
+    message = Message(
+        id_emprunt=emprunt.id,
+        id_sender=sender.id,
+        message_text=f"Notification {days_ago}j",
+        datetime=datetime.utcnow() - timedelta(days=days_ago),
+        is_read=1,
+        message_metadata={"type": "proposal", "status": status_value}
+    )
+    db_session.add(message)
+    db_session.commit()
+    return message
+
+
+@pytest.mark.integration
+class TestMessageCompaction:
+    """Tests de la compaction des fils de notifications"""
+
+    def test_compaction_archives_only_old_resolved(self, db_session, assistant_thread, assistant_user):
+        """Seules les notifications anciennes et résolues sont archivées"""
+        add_notification(db_session, assistant_thread, assistant_user, 60, "accepted")
+        add_notification(db_session, assistant_thread, assistant_user, 45, "rejected")
+        add_notification(db_session, assistant_thread, assistant_user, 50, "pending")
+        add_notification(db_session, assistant_thread, assistant_user, 2, "accepted")
+
+        archived = compact_assistant_threads(db_session, retention_days=30)
+
+        assert archived == 2
+        assert db_session.query(Message).count() == 2
+        archive = db_session.query(MessageArchive).one()
+        assert archive.message_count == 2
+        remaining = {m.message_metadata["status"] for m in db_session.query(Message).all()}
+        assert remaining == {"pending", "accepted"}
+
+    def test_archive_endpoint_pages_through_messages(self, client, db_session, assistant_thread, assistant_user, auth_headers):
+        """L'archive est paginée du plus récent au plus ancien"""
+        for days_ago in range(40, 45):
+            add_notification(db_session, assistant_thread, assistant_user, days_ago, "accepted")
+        compact_assistant_threads(db_session, retention_days=30)
+
+        response = client.get("/messages/archive?page=1&page_size=2", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"] == 5
+        assert data["total_pages"] == 3
+        assert [m["message_text"] for m in data["items"]] == ["Notification 40j", "Notification 41j"]
+
+        response = client.get("/messages/archive?page=3&page_size=2", headers=auth_headers)
+        assert [m["message_text"] for m in response.json()["items"]] == ["Notification 44j"]
+
+    def test_compact_endpoint_requires_admin(self, client, auth_headers):
+        """Le déclenchement manuel est réservé aux administrateurs"""
+        response = client.post("/messages/archive/compact", headers=auth_headers)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,76 @@
+import pytest
+from compression import negotiate
+from models import BibliothequePersonnelle
+from response_cache import response_cache
+
+
+@pytest.fixture
+def large_library(db_session, created_user):
+    """Bibliothèque assez grande pour dépasser le seuil de compression"""
+    for i in range(40):
+        db_session.add(BibliothequePersonnelle(user_id=created_user.id, title=f"Livre {i}", authors=["Auteur"]))
+    db_session.commit()
+    return created_user
+
+
+@pytest.mark.integration
+class TestCompression:
+    """Tests de la compression négociée des réponses"""
+
+    def test_large_page_is_gzipped(self, client, large_library, auth_headers):
+        """Au-delà du seuil, la réponse est compressée et reste identique une fois décodée"""
+        plain = client.get("/bibliotheque-personnelle/me?page_size=40", headers=dict(auth_headers, **{"Accept-Encoding": "identity"}))
+        gzipped = client.get("/bibliotheque-personnelle/me?page_size=40", headers=dict(auth_headers, **{"Accept-Encoding": "gzip"}))
+
+        assert "content-encoding" not in plain.headers
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in gzipped.headers["vary"]
+        assert int(gzipped.headers["content-length"]) < len(plain.content) / 3
+        assert gzipped.json() == plain.json()
+
+    def test_small_responses_are_left_alone(self, client, db_session):
+        """Sous le seuil, pas de compression"""
+        response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+
+    def test_streamed_page_is_compressed_on_the_fly(self, client, large_library, auth_headers):
+        """Une page encodée en flux est compressée morceau par morceau"""
+        headers = dict(auth_headers, **{"Accept-Encoding": "gzip"})
+        streamed = client.get("/bibliotheque-personnelle/me?page_size=40&stream=true", headers=headers)
+        regular = client.get("/bibliotheque-personnelle/me?page_size=40", headers=headers)
+
+        assert streamed.headers["content-encoding"] == "gzip"
+        assert streamed.json() == regular.json()
+
+    def test_cached_response_keeps_its_compressed_variant(self, client, large_library, auth_headers):
+        """La variante compressée est gardée avec l'entrée du cache de réponses"""
+        url = f"/bibliotheque-personnelle/user/{large_library.id}?page_size=40"
+        headers = dict(auth_headers, **{"Accept-Encoding": "gzip"})
+        first = client.get(url, headers=headers)
+        second = client.get(url, headers=headers)
+
+        assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+        assert second.headers["content-encoding"] == "gzip"
+        (entry,) = response_cache.entries.values()
+        assert list(entry.encoded) == ["gzip"]
+        assert second.json() == first.json()
+
+    def test_brotli_is_preferred_when_available(self, client, large_library, auth_headers):
+        """Brotli est choisi quand le client l'accepte"""
+        pytest.importorskip("brotli")
+        response = client.get("/bibliotheque-personnelle/me?page_size=40", headers=dict(auth_headers, **{"Accept-Encoding": "gzip, br"}))
+
+        assert response.headers["content-encoding"] == "br"
+        assert len(response.json()["items"]) == 40
+
+
+class TestNegotiation:
+    """Tests de la lecture d'Accept-Encoding"""
+
+    def test_quality_values(self):
+        """q=0 exclut un encodage, identity seul n'en choisit aucun"""
+        assert negotiate("br;q=0, gzip") == "gzip"
+        assert negotiate("gzip;q=0.5, deflate") == "gzip"
+        assert negotiate("identity") is None
+        assert negotiate(None) is None
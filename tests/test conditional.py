@@ -0,0 +1,78 @@
+import pytest
+from fastapi import status
+from sqlalchemy import event
+from models import Message
+
+
+@pytest.fixture
+def statements(db_session):
+    """Enregistre les requêtes SQL émises pendant le test"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+@pytest.fixture
+def premium_headers(premium_auth_token):
+    """Headers d'authentification de l'utilisateur premium"""
+    return {"Authorization": f"Bearer {premium_auth_token}"}
+
+
+@pytest.mark.integration
+class TestConditionalGet:
+    """Tests du middleware ETag / If-None-Match"""
+
+    def test_unread_count_revalidates_without_touching_the_db(self, client, db_session, created_emprunt,
+                                                              created_user, premium_headers, statements):
+        """Un ETag à jour renvoie 304 sans requête SQL, un nouveau message le rend caduc"""
+        first = client.get("/messages/unread/count", headers=premium_headers)
+        etag = first.headers["ETag"]
+        before = len(statements)
+
+        cached = client.get("/messages/unread/count", headers=dict(premium_headers, **{"If-None-Match": etag}))
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert cached.headers["Cache-Control"] == "private, no-cache"
+        assert len(statements) == before
+
+        db_session.add(Message(id_emprunt=created_emprunt.id, id_sender=created_user.id, message_text="Bonjour", is_read=0))
+        db_session.commit()
+
+        refreshed = client.get("/messages/unread/count", headers=dict(premium_headers, **{"If-None-Match": etag}))
+        assert refreshed.status_code == status.HTTP_200_OK
+        assert refreshed.json() == {"unread_count": 1}
+
+        # Lire la conversation marque les messages comme lus par un UPDATE en masse
+        client.get(f"/messages/emprunt/{created_emprunt.id}", headers=premium_headers)
+        read = client.get("/messages/unread/count", headers=dict(premium_headers, **{"If-None-Match": refreshed.headers["ETag"]}))
+        assert read.status_code == status.HTTP_200_OK
+        assert read.json() == {"unread_count": 0}
+
+    def test_etag_depends_on_the_caller(self, client, created_emprunt, auth_headers, premium_headers):
+        """Deux utilisateurs n'obtiennent jamais le même ETag pour une route personnelle"""
+        mine = client.get("/messages/conversations", headers=auth_headers)
+        theirs = client.get("/messages/conversations", headers=premium_headers)
+
+        assert mine.headers["ETag"] != theirs.headers["ETag"]
+        assert "Authorization" in mine.headers["Vary"]
+        cross = client.get("/messages/conversations", headers=dict(premium_headers, **{"If-None-Match": mine.headers["ETag"]}))
+        assert cross.status_code == status.HTTP_200_OK
+
+    def test_public_policy_and_static_segments(self, client, created_livre):
+        """Le catalogue est public ; /livres/search n'est pas confondu avec une fiche"""
+        detail = client.get(f"/livres/{created_livre.id}")
+        search = client.get("/livres/search?q=prince")
+
+        assert detail.headers["Cache-Control"] == "public, no-cache"
+        assert "etag" not in search.headers
+
+    def test_authenticated_routes_need_a_token(self, client, created_user, auth_headers):
+        """Sans token valide, la requête va jusqu'au handler et garde son 401"""
+        etag = client.get("/bibliotheque-personnelle/me", headers=auth_headers).headers["ETag"]
+
+        response = client.get("/bibliotheque-personnelle/me", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
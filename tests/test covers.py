@@ -0,0 +1,221 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+import covers
+from covers import CoverError, CoverStore, check_cover_url, cover_store, http_fetcher, is_public_host
+from models import BibliothequePersonnelle, Oeuvre
+
+
+def make_png(width=600, height=900, color=(200, 30, 30)) -> bytes:
+    output = BytesIO()
+    Image.new("RGB", (width, height), color).save(output, "PNG")
+    return output.getvalue()
+
+
+class FixtureCovers(BaseHTTPRequestHandler):
+    """Faux hébergeur de couvertures : sert la même image sous plusieurs URL et compte les appels"""
+    hits = 0
+    image = make_png()
+
+    def do_GET(self):
+        type(self).hits += 1
+        if self.path.startswith("/redirect"):
+            self.send_response(302)
+            self.send_header("Location", self.path.split("?to=", 1)[1])
+            self.end_headers()
+            return
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(self.image)))
+        self.end_headers()
+        self.wfile.write(self.image)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def covers_host(monkeypatch, tmp_path):
+    """Démarre le serveur de fixtures et isole le cache disque"""
+    FixtureCovers.hits = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureCovers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(cover_store, "directory", str(tmp_path / "covers"))
+    monkeypatch.setattr(cover_store, "failures", {})
+    # Le serveur de fixtures écoute sur la boucle locale, refusée en production
+    monkeypatch.setattr(covers, "COVER_ALLOWED_HOSTS", ("127.0.0.1",))
+    monkeypatch.setattr(covers, "is_public_host", lambda host: True)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def add_book(db_session, user, cover_url, source_id="vol1"):
+    book = BibliothequePersonnelle(user_id=user.id, title="Dune", source_id=source_id, cover_url=cover_url)
+    db_session.add(book)
+    db_session.commit()
+    return book.oeuvre_id
+
+
+@pytest.mark.integration
+class TestCoverRoute:
+    """Tests du service de couvertures redimensionnées"""
+
+    def test_cover_is_fetched_once_and_resized(self, client, db_session, created_user, covers_host):
+        """La couverture est téléchargée une fois puis servie depuis le disque"""
+        oeuvre_id = add_book(db_session, created_user, f"{covers_host}/dune.png")
+
+        response = client.get(f"/covers/{oeuvre_id}/thumb")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "image/jpeg"
+        assert "max-age" in response.headers["cache-control"]
+        assert Image.open(BytesIO(response.content)).size == (128, 192)
+
+        medium = client.get(f"/covers/{oeuvre_id}/medium")
+        assert Image.open(BytesIO(medium.content)).size == (320, 480)
+        assert FixtureCovers.hits == 1
+
+    def test_conditional_and_range_requests(self, client, db_session, created_user, covers_host):
+        """If-None-Match renvoie 304, Range renvoie une partie du fichier"""
+        oeuvre_id = add_book(db_session, created_user, f"{covers_host}/dune.png")
+        full = client.get(f"/covers/{oeuvre_id}/thumb")
+        etag = full.headers["etag"]
+
+        not_modified = client.get(f"/covers/{oeuvre_id}/thumb", headers={"If-None-Match": etag})
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+        partial = client.get(f"/covers/{oeuvre_id}/thumb", headers={"Range": "bytes=0-9"})
+        assert partial.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert partial.content == full.content[:10]
+
+    def test_missing_cover_and_upstream_errors(self, client, db_session, created_user, covers_host):
+        """Pas de couverture : 404 ; hébergeur en erreur : 502"""
+        without_cover = add_book(db_session, created_user, None, source_id="vol2")
+        broken = add_book(db_session, created_user, f"{covers_host}/missing.png", source_id="vol3")
+
+        assert client.get(f"/covers/{without_cover}/thumb").status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(f"/covers/{broken}/thumb").status_code == status.HTTP_502_BAD_GATEWAY
+        assert client.get(f"/covers/{broken}/huge").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        hits = FixtureCovers.hits
+        assert client.get(f"/covers/{broken}/medium").status_code == status.HTTP_502_BAD_GATEWAY
+        assert FixtureCovers.hits == hits
+
+
+@pytest.mark.unit
+class TestCoverStore:
+    """Tests du cache adressé par contenu"""
+
+    def test_identical_images_share_one_blob(self, tmp_path):
+        """Deux URL qui servent la même image pointent vers le même fichier"""
+        store = CoverStore(directory=str(tmp_path), fetcher=lambda url: make_png(color=(0, 0, 255)))
+
+        first_path, first_digest = store.get("https://a.example/cover.jpg", "thumb")
+        second_path, second_digest = store.get("https://b.example/other.jpg", "thumb")
+
+        assert first_path == second_path and first_digest == second_digest
+        assert store.get("https://a.example/cover.jpg", "medium")[1] != first_digest
+
+    def test_concurrent_requests_fetch_once(self, tmp_path):
+        """Des demandes simultanées de la même URL ne déclenchent qu'un téléchargement"""
+        calls = []
+
+        def slow_fetcher(url):
+            calls.append(url)
+            time.sleep(0.2)
+            return make_png()
+
+        store = CoverStore(directory=str(tmp_path), fetcher=slow_fetcher)
+        threads = [
+            threading.Thread(target=store.get, args=("https://a.example/cover.jpg", variant))
+            for variant in ("thumb", "medium") * 4
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert store.url_locks == {}
+
+    def test_failures_are_remembered(self, tmp_path, monkeypatch):
+        """Une URL en échec n'est pas retéléchargée avant l'expiration de l'échec"""
+        calls = []
+
+        def failing_fetcher(url):
+            calls.append(url)
+            raise CoverError(f"URL de couverture non autorisée: {url}")
+
+        store = CoverStore(directory=str(tmp_path), fetcher=failing_fetcher)
+        for _ in range(3):
+            with pytest.raises(CoverError):
+                store.get("http://169.254.169.254/", "thumb")
+        assert len(calls) == 1
+
+        monkeypatch.setattr(covers, "COVER_FAILURE_TTL_SECONDS", 0)
+        store.failures.clear()
+        for _ in range(2):
+            with pytest.raises(CoverError):
+                store.get("http://169.254.169.254/", "thumb")
+        assert len(calls) == 3
+
+
+@pytest.mark.unit
+class TestCoverUrlPolicy:
+    """Tests de la protection contre les requêtes forgées (SSRF) vers le réseau interne"""
+
+    def test_only_known_cover_hosts_are_allowed(self):
+        """Seuls les hébergeurs de couvertures connus et leurs sous-domaines sont acceptés"""
+        assert check_cover_url("https://books.google.com/books/content?id=abc") == "books.google.com"
+        assert check_cover_url("http://ia800.us.archive.org/cover.jpg") == "ia800.us.archive.org"
+        for url in (
+            "http://169.254.169.254/latest/meta-data/",
+            "http://books.google.com.evil.example/cover.jpg",
+            "http://evil.example/?host=books.google.com",
+            "file:///etc/passwd",
+        ):
+            with pytest.raises(CoverError):
+                check_cover_url(url)
+
+    def test_internal_addresses_are_rejected(self):
+        """Boucle locale, réseaux privés, lien local et adresses réservées sont refusés"""
+        for host in ("127.0.0.1", "10.0.0.5", "192.168.1.1", "169.254.169.254", "0.0.0.0", "::1", "::ffff:127.0.0.1"):
+            assert not is_public_host(host), host
+        assert is_public_host("8.8.8.8")
+
+
+@pytest.mark.integration
+class TestCoverFetcherSafety:
+    """Tests du téléchargement : hôtes et redirections revérifiés à chaque saut"""
+
+    def test_allowed_host_resolving_to_loopback_is_refused(self, covers_host, monkeypatch):
+        """Un hôte autorisé qui pointe vers la boucle locale n'est pas contacté"""
+        monkeypatch.setattr(covers, "is_public_host", is_public_host)
+
+        with pytest.raises(CoverError):
+            http_fetcher(f"{covers_host}/dune.png")
+        assert FixtureCovers.hits == 0
+
+    def test_redirects_are_checked_at_each_hop(self, covers_host):
+        """Une redirection vers le réseau interne est refusée, une redirection autorisée est suivie"""
+        with pytest.raises(CoverError):
+            http_fetcher(f"{covers_host}/redirect?to=http://169.254.169.254/latest/meta-data/")
+
+        assert http_fetcher(f"{covers_host}/redirect?to=/dune.png") == FixtureCovers.image
+        assert FixtureCovers.hits == 3
+
+    def test_cover_url_is_validated_when_saved(self, client, auth_headers, test_personal_book_data):
+        """Une URL de couverture hors des hébergeurs connus est refusée dès l'enregistrement"""
+        payload = dict(test_personal_book_data, cover_url="http://169.254.169.254/latest/meta-data/")
+
+        response = client.post("/bibliotheque-personnelle/", json=payload, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,91 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from sqlalchemy import event
+
+from fast_json import dumps
+from models import Emprunt, Message
+
+
+@pytest.fixture
+def statements(db_session):
+    """Enregistre les requêtes SELECT émises pendant le test"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+class TestFastJson:
+    """Tests de l'encodeur orjson"""
+
+    def test_same_output_as_json(self):
+        """Datetime, accents et clés entières sont encodés comme par le JSON standard de FastAPI"""
+        content = {"date": datetime(2026, 3, 1, 12, 0, 5), "ville": "Besançon", 7: [None, 1.5]}
+
+        assert json.loads(dumps(content)) == {"date": "2026-03-01T12:00:05", "ville": "Besançon", "7": [None, 1.5]}
+
+
+@pytest.mark.integration
+class TestMessageSerialization:
+    """Tests de l'historique sérialisé par TypeAdapter"""
+
+    def test_history_loads_senders_once(self, client, db_session, created_emprunt, created_user,
+                                        created_premium_user, premium_auth_headers, statements):
+        """Une seule requête pour les expéditeurs, quel que soit le nombre de messages"""
+        for index in range(6):
+            sender = created_user if index % 2 else created_premium_user
+            db_session.add(Message(id_emprunt=created_emprunt.id, id_sender=sender.id,
+                                   message_text=f"Message {index}", is_read=0))
+        db_session.commit()
+
+        response = client.get(f"/messages/emprunt/{created_emprunt.id}", headers=premium_auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [message["message_text"] for message in data] == [f"Message {index}" for index in range(6)]
+        assert data[1]["sender_name"] == created_user.name
+        assert set(data[0]) == {"id", "id_emprunt", "id_sender", "message_text", "datetime", "is_read",
+                                "message_metadata", "sender_name", "sender_surname"}
+        sender_queries = [query for query in statements if 'FROM "User"' in query and " IN " in query]
+        assert len(sender_queries) == 1
+
+    def test_conversations_are_serialized_by_adapter(self, client, db_session, created_emprunt, created_user,
+                                                     created_premium_user, auth_headers):
+        """La liste des conversations garde le format de ConversationSummary"""
+        db_session.add(Message(id_emprunt=created_emprunt.id, id_sender=created_premium_user.id,
+                               message_text="Toujours dispo ?", is_read=0))
+        db_session.commit()
+
+        response = client.get("/messages/conversations", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        [conversation] = response.json()
+        assert conversation["id_emprunt"] == created_emprunt.id
+        assert conversation["other_user_id"] == created_premium_user.id
+        assert conversation["last_message"] == "Toujours dispo ?"
+        assert conversation["unread_count"] == 1
+        assert datetime.fromisoformat(conversation["last_message_time"])
+
+    def test_conversations_without_messages_sort_by_their_own_loan(self, client, db_session, created_user,
+                                                                   created_premium_user, created_livre, auth_headers):
+        """Sans message, chaque conversation se classe à la date de son emprunt, pas à celle du dernier"""
+        dates = [datetime(2024, 1, 1), datetime(2025, 1, 1), datetime(2023, 1, 1)]
+        emprunts = [Emprunt(id_user1=created_user.id, id_user2=created_premium_user.id, id_livre=created_livre.id,
+                            datetime=date) for date in dates]
+        db_session.add_all(emprunts)
+        db_session.commit()
+        db_session.add(Message(id_emprunt=emprunts[2].id, id_sender=created_premium_user.id,
+                               message_text="Bonjour", is_read=0))
+        db_session.commit()
+
+        response = client.get("/messages/conversations", headers=auth_headers)
+
+        assert [c["id_emprunt"] for c in response.json()] == [emprunts[2].id, emprunts[1].id, emprunts[0].id]
@@ -0,0 +1,62 @@
+import pytest
+from fastapi import status
+from sqlalchemy import event
+
+
+@pytest.fixture
+def statements(db_session):
+    """Enregistre les requêtes SQL émises pendant le test"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+@pytest.mark.integration
+class TestSparseFieldsets:
+    """Tests de la projection ?fields="""
+
+    def test_library_projection_skips_work_join(self, client, db_session, created_personal_book, auth_headers, statements):
+        """Sans champ de l'oeuvre, ni jointure ni description ne sont lues"""
+        data = client.get("/bibliotheque-personnelle/me?fields=title", headers=auth_headers).json()
+
+        assert data["items"] == [{"id": created_personal_book.id, "title": "1984"}]
+        assert data["total"] == 1
+        query = statements[-1]
+        assert "Description" not in query and "Oeuvre" not in query
+
+    def test_library_projection_joins_only_wanted_work_columns(self, client, created_personal_book, auth_headers, statements):
+        """Un champ de l'oeuvre joint la table, mais seulement ses colonnes demandées"""
+        data = client.get("/bibliotheque-personnelle/me?fields=title,authors&cursor=", headers=auth_headers).json()
+
+        assert data["items"] == [{"id": created_personal_book.id, "title": "1984", "authors": ["George Orwell"]}]
+        query = statements[-1]
+        assert "Authors" in query and "Description" not in query
+
+    def test_user_projection(self, client, created_user, auth_headers, statements):
+        """Le profil ne renvoie que les champs demandés, liste_livres n'est pas lue"""
+        response = client.get(f"/users/profile/{created_user.id}?fields=name,villes", headers=auth_headers)
+
+        assert response.json() == {"id": created_user.id, "name": "John", "villes": "Paris"}
+        assert "liste_livres" not in statements[-1]
+
+    def test_streamed_admin_list_projection(self, client, created_user, created_admin_user, admin_auth_headers):
+        """La projection s'applique aussi aux listes encodées en flux"""
+        users = client.get("/users/?fields=email", headers=admin_auth_headers).json()
+
+        assert users == [
+            {"id": created_user.id, "email": created_user.email},
+            {"id": created_admin_user.id, "email": created_admin_user.email},
+        ]
+
+    def test_unknown_field_is_rejected(self, client, created_user, auth_headers):
+        """Un champ inconnu renvoie une erreur 400"""
+        response = client.get("/livres/?fields=nom,mdp")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "mdp" in response.json()["detail"]
@@ -0,0 +1,94 @@
+import pytest
+from fastapi import status
+from models import User, BibliothequePersonnelle
+from geo_index import geo_index
+
+
+@pytest.fixture(autouse=True)
+def reset_geo_index():
+    """Repart d'un index vide : la base de test est recréée à chaque test"""
+    geo_index.reset()
+    yield
+    geo_index.reset()
+
+
+def add_owner(db_session, email, villes, title, source_id=None):
+    user = User(name=villes, surname="Owner", email=email, mdp="x", villes=villes, age=30, role="Pauvre")
+    db_session.add(user)
+    db_session.flush()
+    db_session.add(BibliothequePersonnelle(user_id=user.id, title=title, source_id=source_id))
+    db_session.commit()
+    return user
+
+
+@pytest.mark.integration
+class TestNearestOwners:
+    """Tests de la recherche des propriétaires les plus proches"""
+
+    def test_returns_owners_sorted_by_distance(self, client, db_session, created_user, auth_headers):
+        """Les propriétaires sont triés depuis la ville de l'utilisateur"""
+        add_owner(db_session, "marseille@test.com", "Marseille", "Le Petit Prince", "pp1")
+        add_owner(db_session, "versailles@test.com", "Versailles", "Le petit prince", None)
+        add_owner(db_session, "lille@test.com", "Lille", "1984", "orwell")
+
+        response = client.get("/api/nearest-owners?title=le%20petit%20prince&source_id=pp1", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [owner["Villes"] for owner in data] == ["Versailles", "Marseille"]
+        assert data[0]["distance_km"] < 30
+
+    def test_index_follows_library_writes(self, client, db_session, created_user, auth_headers):
+        """L'index est mis à jour à l'ajout et à la suppression d'un livre"""
+        owner = add_owner(db_session, "lyon@test.com", "Lyon", "1984", "orwell")
+        assert len(client.get("/api/nearest-owners?source_id=orwell", headers=auth_headers).json()) == 1
+
+        db_session.delete(db_session.query(BibliothequePersonnelle).filter_by(user_id=owner.id).one())
+        db_session.add(BibliothequePersonnelle(user_id=owner.id, title="Dune", source_id="dune"))
+        db_session.commit()
+
+        assert client.get("/api/nearest-owners?source_id=orwell", headers=auth_headers).json() == []
+        assert client.get("/api/nearest-owners?source_id=dune", headers=auth_headers).json()[0]["ID"] == owner.id
+
+    def test_requires_a_book(self, client, created_user, auth_headers):
+        """Un livre doit être précisé"""
+        response = client.get("/api/nearest-owners", headers=auth_headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.integration
+class TestMapClusters:
+    """Tests des clusters de la carte"""
+
+    def test_clusters_aggregate_users_and_books(self, client, db_session, created_user):
+        """Les clusters agrègent les utilisateurs et leurs livres"""
+        add_owner(db_session, "paris2@test.com", "Paris", "Le Petit Prince")
+        add_owner(db_session, "marseille@test.com", "Marseille", "1984")
+
+        response = client.get("/api/map/clusters?south=41&west=-5&north=51.5&east=9.6&zoom=6")
+
+        assert response.status_code == status.HTTP_200_OK
+        clusters = response.json()["clusters"]
+        assert sum(cluster["count"] for cluster in clusters) == 3
+        paris = next(cluster for cluster in clusters if cluster["cities"] == ["Paris"])
+        assert paris["count"] == 2
+        assert paris["top_books"] == [{"title": "Le Petit Prince", "owners": 1}]
+
+    def test_clusters_follow_user_moves(self, client, db_session, created_user):
+        """Un déménagement met à jour les agrégats"""
+        url = "/api/map/clusters?south=41&west=-5&north=51.5&east=9.6&zoom=9"
+        assert [c["cities"] for c in client.get(url).json()["clusters"]] == [["Paris"]]
+
+        created_user.villes = "Lyon"
+        created_user.latitude, created_user.longitude = 45.7491, 4.8479
+        db_session.commit()
+
+        assert [c["cities"] for c in client.get(url).json()["clusters"]] == [["Lyon"]]
+
+    def test_clusters_filtered_by_book(self, client, db_session, created_user):
+        """Le filtre par livre ne garde que les propriétaires"""
+        add_owner(db_session, "lille@test.com", "Lille", "Dune", "dune")
+
+        clusters = client.get("/api/map/clusters?south=41&west=-5&north=51.5&east=9.6&zoom=6&book=dune").json()["clusters"]
+
+        assert [(c["count"], c["cities"]) for c in clusters] == [(1, ["Lille"])]
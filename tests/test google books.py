@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from fastapi import status
+from books_proxy import books_cache
+
+
+class FixtureGoogleBooks(BaseHTTPRequestHandler):
+    """Faux Google Books : renvoie un volume par requête et compte les appels"""
+    hits = 0
+    delay = 0.0
+    status_code = 200
+
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(self.delay)
+        query = parse_qs(urlparse(self.path).query)
+        if self.status_code == 200:
+            body = {"totalItems": 1, "items": [{"id": query["q"][0], "volumeInfo": {"title": query["q"][0]}}]}
+        else:
+            body = {"error": {"code": self.status_code, "message": "Erreur de la fixture"}}
+        payload = json.dumps(body).encode()
+        self.send_response(self.status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    """Démarre le serveur de fixtures et branche le cache dessus"""
+    FixtureGoogleBooks.hits = 0
+    FixtureGoogleBooks.delay = 0.0
+    FixtureGoogleBooks.status_code = 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureGoogleBooks)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(books_cache, "upstream_url", f"http://127.0.0.1:{server.server_port}/volumes")
+    monkeypatch.setattr(books_cache, "path", str(tmp_path / "books_cache.db"))
+    monkeypatch.setattr(books_cache, "memory", OrderedDict())
+    monkeypatch.setattr(books_cache, "_db", None)
+    yield FixtureGoogleBooks
+    server.shutdown()
+
+
+@pytest.mark.integration
+class TestGoogleBooksProxy:
+    """Tests du proxy Google Books et de ses deux niveaux de cache"""
+
+    def test_second_request_is_served_from_cache(self, client, created_user, auth_headers, upstream):
+        """La même recherche n'atteint Google qu'une fois, même après vidage de la mémoire"""
+        first = client.get("/google-books/volumes?q=dune", headers=auth_headers)
+        assert first.status_code == status.HTTP_200_OK
+        assert first.headers["X-Cache"] == "MISS"
+        assert first.json()["items"][0]["id"] == "dune"
+
+        assert client.get("/google-books/volumes?q=dune", headers=auth_headers).headers["X-Cache"] == "HIT"
+        books_cache.memory.clear()
+        assert client.get("/google-books/volumes?q=dune", headers=auth_headers).headers["X-Cache"] == "HIT"
+        assert upstream.hits == 1
+
+    def test_identical_inflight_queries_are_coalesced(self, upstream):
+        """Des requêtes identiques simultanées ne déclenchent qu'un appel amont"""
+        upstream.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(books_cache.get({"q": "proust"}))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 8
+        assert upstream.hits == 1
+
+    def test_stale_entry_is_served_while_revalidating(self, monkeypatch, upstream):
+        """Une réponse périmée est servie immédiatement puis rafraîchie en arrière-plan"""
+        books_cache.get({"q": "zola"})
+        monkeypatch.setattr(books_cache, "ttl", 0)
+
+        body, cache_status = books_cache.get({"q": "zola"})
+
+        assert cache_status == "STALE"
+        for _ in range(50):
+            if upstream.hits == 2:
+                break
+            time.sleep(0.02)
+        assert upstream.hits == 2
+
+    def test_upstream_errors(self, client, created_user, auth_headers, monkeypatch, upstream):
+        """Les erreurs de Google sont relayées, sauf si une ancienne réponse peut les masquer"""
+        client.get("/google-books/volumes?q=hugo", headers=auth_headers)
+        monkeypatch.setattr(books_cache, "ttl", 0)
+        monkeypatch.setattr(books_cache, "stale", 0)
+        upstream.status_code = 503
+
+        fallback = client.get("/google-books/volumes?q=hugo", headers=auth_headers)
+        assert fallback.status_code == status.HTTP_200_OK
+        assert fallback.headers["X-Cache"] == "STALE"
+
+        error = client.get("/google-books/volumes?q=camus", headers=auth_headers)
+        assert error.status_code == 503
+        assert error.json()["error"]["message"] == "Erreur de la fixture"
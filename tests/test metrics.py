@@ -0,0 +1,56 @@
+import pytest
+from fastapi import status
+
+import main
+from metrics import http_requests, merge, registry, render
+
+
+@pytest.mark.integration
+class TestMetricsEndpoint:
+    """Tests de l'export Prometheus /metrics"""
+
+    def test_route_latency_and_caches_are_exported(self, client, created_livre):
+        """Les requêtes sont comptées par modèle de route, pas par URL"""
+        client.get(f"/livres/{created_livre.id}")
+        client.get(f"/livres/{created_livre.id}")
+
+        body = client.get("/metrics").text
+
+        assert 'http_requests_total{method="GET",route="/livres/{livre_id}",status="200"}' in body
+        assert f"/livres/{created_livre.id}\"" not in body
+        assert 'http_request_duration_seconds_bucket{method="GET",route="/livres/{livre_id}",le="+Inf"}' in body
+        assert "# TYPE http_requests_in_flight gauge" in body
+        assert "threadpool_max_threads " in body
+        assert 'cache_hit_ratio{cache="response"}' in body
+
+    def test_token_is_required_when_configured(self, client, monkeypatch):
+        """Avec METRICS_TOKEN, l'export exige le jeton"""
+        monkeypatch.setattr(main, "METRICS_TOKEN", "secret")
+
+        assert client.get("/metrics").status_code == status.HTTP_401_UNAUTHORIZED
+        assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == status.HTTP_200_OK
+
+
+class TestMetricsAggregation:
+    """Tests de l'agrégation des instantanés de plusieurs workers"""
+
+    def test_counters_and_histograms_are_summed(self):
+        """Compteurs et seaux s'additionnent ; l'histogramme reste cumulatif"""
+        bucket_count = len(registry["http_request_duration_seconds"].buckets) + 1
+        first = [0] * bucket_count + [0.0]
+        first[0], first[-1] = 2, 0.004
+        second = [0] * bucket_count + [0.0]
+        second[1], second[-1] = 1, 0.008
+        snapshots = [
+            {http_requests.name: [[["GET", "/health", "200"], 3]],
+             "http_request_duration_seconds": [[["GET", "/health"], first]]},
+            {http_requests.name: [[["GET", "/health", "200"], 4]],
+             "http_request_duration_seconds": [[["GET", "/health"], second]]},
+        ]
+
+        body = render(merge(snapshots))
+
+        assert 'http_requests_total{method="GET",route="/health",status="200"} 7' in body
+        assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="0.005"} 2' in body
+        assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="0.01"} 3' in body
+        assert 'http_request_duration_seconds_count{method="GET",route="/health"} 3' in body
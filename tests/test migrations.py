@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import migrations
+from migrations import run_migrations
+
+
+def counting_migration(calls, delay=0.0):
+    def migrate(engine):
+        time.sleep(delay)
+        calls.append(engine)
+    return migrate
+
+
+@pytest.mark.integration
+class TestRunMigrations:
+    """Tests de l'application unique des migrations au démarrage"""
+
+    def test_each_migration_runs_once(self, monkeypatch):
+        """Une migration enregistrée n'est pas rejouée au démarrage suivant"""
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+        first, second = [], []
+        monkeypatch.setattr(migrations, "MIGRATIONS", [("first", counting_migration(first))])
+
+        assert run_migrations(engine) == ["first"]
+        monkeypatch.setattr(migrations, "MIGRATIONS", [
+            ("first", counting_migration(first)), ("second", counting_migration(second)),
+        ])
+        assert run_migrations(engine) == ["second"]
+        assert run_migrations(engine) == []
+        assert len(first) == 1 and len(second) == 1
+
+    def test_concurrent_workers_migrate_once(self, monkeypatch, tmp_path):
+        """Deux workers qui démarrent ensemble : le second attend le verrou puis ne rejoue rien"""
+        path = tmp_path / "livres.db"
+        calls = []
+        monkeypatch.setattr(migrations, "MIGRATIONS", [("slow", counting_migration(calls, delay=0.3))])
+
+        results = []
+        workers = [
+            threading.Thread(target=lambda: results.append(run_migrations(create_engine(f"sqlite:///{path}"))))
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert len(calls) == 1
+        assert sorted(results) == [[], ["slow"]]
+        assert not (tmp_path / "livres.db.migrations.lock").exists()
+
+    def test_stale_lock_is_taken_over(self, monkeypatch, tmp_path):
+        """Un verrou laissé par un processus tué n'empêche pas le démarrage"""
+        path = tmp_path / "livres.db"
+        lock = tmp_path / "livres.db.migrations.lock"
+        lock.write_text("12345")
+        monkeypatch.setattr(migrations, "MIGRATION_LOCK_TIMEOUT_SECONDS", 0)
+        monkeypatch.setattr(migrations, "MIGRATIONS", [("first", counting_migration([]))])
+
+        assert run_migrations(create_engine(f"sqlite:///{path}")) == ["first"]
+        assert not lock.exists()
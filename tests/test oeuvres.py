@@ -0,0 +1,130 @@
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import User, BibliothequePersonnelle, Oeuvre
+from oeuvres import migrate_personal_books, normalize_isbn
+
+
+def add_user(db_session, email):
+    user = User(name=email.split("@")[0], surname="Owner", email=email, mdp="x", villes="Lyon", age=30, role="Pauvre")
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+@pytest.mark.unit
+class TestIsbn:
+    """Tests de la normalisation des ISBN"""
+
+    def test_isbn10_and_isbn13_are_equivalent(self):
+        """Un ISBN-10 est converti en ISBN-13"""
+        assert normalize_isbn("2-07-040850-X") == normalize_isbn("978-2070408504") == "9782070408504"
+        assert normalize_isbn("pas un isbn") is None
+
+
+@pytest.mark.integration
+class TestOeuvres:
+    """Tests du partage des oeuvres entre bibliothèques"""
+
+    def test_same_source_id_shares_one_oeuvre(self, client, db_session, created_user, auth_headers, test_personal_book_data):
+        """Deux utilisateurs qui ajoutent le même volume référencent la même oeuvre"""
+        other = add_user(db_session, "alice@test.com")
+        db_session.add(BibliothequePersonnelle(user_id=other.id, title="1984", source_id="test123"))
+        db_session.commit()
+
+        response = client.post("/bibliotheque-personnelle/", json=test_personal_book_data, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["description"] == "Un roman dystopique"
+        assert db_session.query(Oeuvre).count() == 1
+        oeuvre = db_session.query(Oeuvre).one()
+        # Le second ajout complète les métadonnées manquantes de l'oeuvre
+        assert oeuvre.authors == ["George Orwell"]
+        assert {book.user_id for book in oeuvre.exemplaires} == {other.id, created_user.id}
+
+    def test_isbn_groups_different_sources(self, db_session, created_user):
+        """Le même ISBN regroupe des exemplaires venus de sources différentes"""
+        db_session.add(BibliothequePersonnelle(user_id=created_user.id, title="Dune", source_id="g1", isbn="0-441-17271-7"))
+        other = add_user(db_session, "bob@test.com")
+        db_session.add(BibliothequePersonnelle(user_id=other.id, title="Dune (poche)", source_id="g2", isbn="9780441172719"))
+        db_session.commit()
+
+        assert db_session.query(Oeuvre).count() == 1
+        assert db_session.query(Oeuvre).one().isbn == "9780441172719"
+
+    def test_owners_of_a_work_is_an_indexed_join(self, db_session, created_user):
+        """Les propriétaires d'une oeuvre se retrouvent par une jointure"""
+        db_session.add(BibliothequePersonnelle(user_id=created_user.id, title="Dune", authors=["Frank Herbert"], source="ai_detection"))
+        other = add_user(db_session, "carol@test.com")
+        db_session.add(BibliothequePersonnelle(user_id=other.id, title="DUNE", authors=["frank herbert"], source="ai_detection"))
+        db_session.add(BibliothequePersonnelle(user_id=other.id, title="Dune", authors=["Brian Herbert"], source="ai_detection"))
+        db_session.commit()
+
+        oeuvre = db_session.query(Oeuvre).filter(Oeuvre.cle == "titre:dune|frank herbert").one()
+        owners = (
+            db_session.query(User.id)
+            .join(BibliothequePersonnelle, BibliothequePersonnelle.user_id == User.id)
+            .filter(BibliothequePersonnelle.oeuvre_id == oeuvre.id)
+            .all()
+        )
+        assert {owner.id for owner in owners} == {created_user.id, other.id}
+        assert db_session.query(Oeuvre).count() == 2
+
+
+@pytest.mark.integration
+class TestMigration:
+    """Tests de la migration de l'ancien schéma"""
+
+    def test_legacy_rows_are_deduplicated(self):
+        """Les exemplaires existants sont rattachés à des oeuvres dédupliquées"""
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE BibliothequePersonnelle (ID INTEGER PRIMARY KEY, UserID INTEGER NOT NULL, "
+                "Title VARCHAR(255) NOT NULL, Authors JSON, CoverUrl VARCHAR(512), InfoLink VARCHAR(512), "
+                "Description VARCHAR(2000), Source VARCHAR(50) NOT NULL, SourceID VARCHAR(255), CreatedAt DATETIME NOT NULL)"
+            ))
+            conn.execute(text(
+                "INSERT INTO BibliothequePersonnelle (UserID, Title, Authors, Description, Source, SourceID, CreatedAt) VALUES "
+                "(1, '1984', '[\"George Orwell\"]', 'Un roman dystopique', 'google_books', 'abc', '2024-01-01'), "
+                "(2, '1984', '[\"George Orwell\"]', 'Un roman dystopique', 'google_books', 'abc', '2024-01-02'), "
+                "(3, 'Dune', '[\"Frank Herbert\"]', NULL, 'ai_detection', NULL, '2024-01-03')"
+            ))
+        Base.metadata.create_all(bind=engine, tables=[Oeuvre.__table__])
+
+        assert migrate_personal_books(engine) == 3
+        assert migrate_personal_books(engine) == 0
+
+        columns = {column["name"] for column in inspect(engine).get_columns("BibliothequePersonnelle")}
+        assert "Description" not in columns and "OeuvreID" in columns
+        with engine.connect() as conn:
+            works = conn.execute(text("SELECT ID, Cle, Description FROM Oeuvre ORDER BY ID")).all()
+            links = [row[0] for row in conn.execute(text("SELECT OeuvreID FROM BibliothequePersonnelle ORDER BY ID"))]
+        assert [work.Cle for work in works] == ["google_books:abc", "titre:dune|frank herbert"]
+        assert works[0].Description == "Un roman dystopique"
+        assert links == [works[0].ID, works[0].ID, works[1].ID]
+
+    def test_interrupted_migration_resumes(self):
+        """Une migration interrompue après la suppression d'une colonne et la création de l'index reprend"""
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE BibliothequePersonnelle (ID INTEGER PRIMARY KEY, UserID INTEGER NOT NULL, "
+                "Title VARCHAR(255) NOT NULL, Authors JSON, CoverUrl VARCHAR(512), "
+                "Source VARCHAR(50) NOT NULL, SourceID VARCHAR(255), CreatedAt DATETIME NOT NULL, OeuvreID INTEGER NULL)"
+            ))
+            conn.execute(text("CREATE INDEX ix_BibliothequePersonnelle_OeuvreID ON BibliothequePersonnelle (OeuvreID)"))
+            conn.execute(text(
+                "INSERT INTO BibliothequePersonnelle (UserID, Title, Authors, Source, SourceID, CreatedAt) VALUES "
+                "(1, 'Dune', '[\"Frank Herbert\"]', 'google_books', 'xyz', '2024-01-01')"
+            ))
+        Base.metadata.create_all(bind=engine, tables=[Oeuvre.__table__])
+
+        assert migrate_personal_books(engine) == 1
+
+        columns = {column["name"] for column in inspect(engine).get_columns("BibliothequePersonnelle")}
+        assert not {"Authors", "CoverUrl"} & columns
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT OeuvreID FROM BibliothequePersonnelle")).scalar() is not None
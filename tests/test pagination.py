@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from sqlalchemy import event
+from models import Livre, BibliothequePersonnelle, Emprunt
+
+
+def walk(client, url, headers=None, cursor=""):
+    """Parcourt les pages d'un endpoint en suivant next_cursor"""
+    pages = []
+    while cursor is not None:
+        data = client.get(f"{url}&cursor={cursor}", headers=headers).json()
+        pages.append([item["id"] for item in data["items"]])
+        cursor = data["next_cursor"]
+    return pages
+
+
+@pytest.mark.integration
+class TestKeysetPagination:
+    """Tests de la pagination par curseur"""
+
+    def test_livres_cursor_is_stable_under_inserts(self, client, db_session):
+        """Un livre ajouté pendant le parcours ne décale pas les pages suivantes"""
+        db_session.add_all([Livre(nom=f"Livre {i}", auteur="Auteur") for i in range(25)])
+        db_session.commit()
+
+        first = client.get("/livres/?page_size=10&cursor=").json()
+        assert first["page"] is None and first["total"] == 25
+        db_session.add(Livre(nom="Nouveau", auteur="Auteur"))
+        db_session.commit()
+        rest = walk(client, "/livres/?page_size=10", cursor=first["next_cursor"])
+
+        assert [item["id"] for item in first["items"]] == list(range(1, 11))
+        assert rest == [list(range(11, 21)), list(range(21, 27))]
+
+    def test_personal_library_orders_ties_by_id(self, client, db_session, created_user, auth_headers):
+        """Les exemplaires ajoutés au même instant sont départagés par leur ID"""
+        same_time = datetime(2024, 5, 1, 12, 0, 0)
+        for i in range(5):
+            db_session.add(BibliothequePersonnelle(user_id=created_user.id, title=f"Livre {i}", created_at=same_time))
+        db_session.add(BibliothequePersonnelle(user_id=created_user.id, title="Récent"))
+        db_session.commit()
+
+        pages = walk(client, "/bibliotheque-personnelle/me?page_size=2", headers=auth_headers)
+
+        assert pages == [[6, 5], [4, 3], [2, 1]]
+        assert walk(client, f"/bibliotheque-personnelle/user/{created_user.id}?page_size=4", headers=auth_headers) == [[6, 5, 4, 3], [2, 1]]
+
+    def test_invalid_cursor_is_rejected(self, client, created_user, auth_headers):
+        """Un curseur falsifié renvoie une erreur 400"""
+        response = client.get("/bibliotheque-personnelle/me?cursor=pas-un-curseur", headers=auth_headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_emprunts_cursor_in_header(self, client, db_session, created_user, created_livre, auth_headers):
+        """La liste des emprunts garde son format, le curseur suivant est dans un en-tête"""
+        for _ in range(3):
+            db_session.add(Emprunt(id_user1=created_user.id, id_user2=created_user.id, id_livre=created_livre.id))
+        db_session.commit()
+
+        first = client.get("/emprunts/?limit=2&cursor=", headers=auth_headers)
+        last = client.get(f"/emprunts/?limit=2&cursor={first.headers['X-Next-Cursor']}", headers=auth_headers)
+
+        assert [e["id"] for e in first.json()] == [1, 2]
+        assert [e["id"] for e in last.json()] == [3]
+        assert "X-Next-Cursor" not in last.headers
+
+    def test_emprunts_limit_is_bounded(self, client, created_user, auth_headers):
+        """Une page d'emprunts ne peut pas couvrir toute la table"""
+        response = client.get("/emprunts/?limit=100000&cursor=", headers=auth_headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_next_cursor_header_is_exposed_to_the_frontend(self, client, created_user, auth_headers):
+        """L'en-tête du curseur est lisible par le front servi sur une autre origine"""
+        response = client.get("/emprunts/?cursor=", headers={**auth_headers, "Origin": "http://localhost:3000"})
+
+        assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+
+@pytest.mark.integration
+class TestCachedTotals:
+    """Tests des totaux mis en cache"""
+
+    def test_total_follows_inserts_and_deletes(self, client, db_session, created_user, auth_headers):
+        """Le total en cache est invalidé par les ajouts et suppressions de l'utilisateur"""
+        url = "/bibliotheque-personnelle/me?page_size=2"
+        assert client.get(url, headers=auth_headers).json()["total"] == 0
+
+        book = BibliothequePersonnelle(user_id=created_user.id, title="Dune")
+        db_session.add(book)
+        db_session.commit()
+        assert client.get(url, headers=auth_headers).json()["total"] == 1
+
+        db_session.delete(book)
+        db_session.commit()
+        assert client.get(url, headers=auth_headers).json()["total"] == 0
+
+    def test_count_is_not_repeated_while_cached(self, client, db_session):
+        """Deux pages successives ne relancent pas le COUNT(*)"""
+        db_session.add(Livre(nom="Dune", auteur="Frank Herbert"))
+        db_session.commit()
+        counts = []
+
+        def listener(conn, cursor, statement, *args):
+            if "count(" in statement.lower():
+                counts.append(statement)
+
+        event.listen(db_session.bind, "before_cursor_execute", listener)
+        try:
+            client.get("/livres/?page=1")
+            client.get("/livres/?page=2")
+        finally:
+            event.remove(db_session.bind, "before_cursor_execute", listener)
+        assert len(counts) == 1
+
+    def test_include_total_false_skips_count(self, client, db_session):
+        """include_total=false ne renvoie ni total ni nombre de pages"""
+        db_session.add(Livre(nom="Dune", auteur="Frank Herbert"))
+        db_session.commit()
+
+        data = client.get("/livres/?cursor=&include_total=false").json()
+
+        assert data["total"] is None and data["total_pages"] is None
+        assert len(data["items"]) == 1
@@ -0,0 +1,70 @@
+import pytest
+from fastapi import status
+from sqlalchemy import event
+from models import BibliothequePersonnelle
+
+
+@pytest.fixture
+def statements(db_session):
+    """Enregistre les requêtes SELECT émises pendant le test"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+@pytest.mark.integration
+class TestProfileFull:
+    """Tests du profil composite /users/profile/{id}/full"""
+
+    def test_profile_library_and_exchange_in_one_response(self, client, created_personal_book, created_user,
+                                                          premium_auth_headers):
+        """Utilisateur, page de bibliothèque et proposition en attente de l'appelant"""
+        client.post("/emprunts/propose-exchange", headers=premium_auth_headers, json={
+            "target_user_id": created_user.id, "book_id": str(created_personal_book.id), "book_title": "1984",
+        })
+
+        response = client.get(f"/users/profile/{created_user.id}/full", headers=premium_auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["user"]["id"] == created_user.id
+        assert [book["title"] for book in data["library"]["items"]] == ["1984"]
+        assert data["library"]["total"] == 1
+        assert data["exchange"]["pending_book_id"] == str(created_personal_book.id)
+        assert data["exchange"]["emprunt_id"] is None
+
+    def test_query_count_does_not_grow_with_the_library(self, client, db_session, created_user,
+                                                        premium_auth_headers, statements):
+        """Nombre fixe de requêtes, quel que soit le nombre de livres"""
+        db_session.add_all([BibliothequePersonnelle(user_id=created_user.id, title=f"Livre {index}") for index in range(20)])
+        db_session.commit()
+        url = f"/users/profile/{created_user.id}/full"
+        before = len(statements)
+
+        data = client.get(url, headers=premium_auth_headers).json()
+
+        assert len(data["library"]["items"]) == 20
+        assert len(statements) - before <= 6
+
+    def test_cached_per_viewer_and_purged_by_messages(self, client, created_user, created_premium_user,
+                                                      auth_headers, premium_auth_headers):
+        """Une entrée par appelant ; une nouvelle proposition la rend caduque"""
+        url = f"/users/profile/{created_user.id}/full"
+        assert client.get(url, headers=premium_auth_headers).headers["x-cache"] == "MISS"
+        assert client.get(url, headers=premium_auth_headers).headers["x-cache"] == "HIT"
+        own = client.get(url, headers=auth_headers)
+        assert own.headers["x-cache"] == "MISS" and own.json()["exchange"] is None
+
+        client.post("/emprunts/propose-exchange", headers=premium_auth_headers, json={
+            "target_user_id": created_user.id, "book_id": "42", "book_title": "Dune",
+        })
+
+        refreshed = client.get(url, headers=premium_auth_headers)
+        assert refreshed.headers["x-cache"] == "MISS"
+        assert refreshed.json()["exchange"]["pending_book_id"] == "42"
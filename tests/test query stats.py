@@ -0,0 +1,61 @@
+import pytest
+from fastapi import status
+from sqlalchemy import event
+
+import query_stats
+from query_stats import normalize_sql, slow_query_log
+
+
+@pytest.fixture
+def statements(db_session):
+    """Enregistre les requêtes SQL émises pendant le test"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+@pytest.fixture
+def log_every_query(monkeypatch):
+    """Seuil nul : toutes les requêtes passent dans le journal des requêtes lentes"""
+    monkeypatch.setattr(query_stats, "SLOW_QUERY_THRESHOLD_MS", 0)
+    slow_query_log.clear()
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+class TestNormalizeSql:
+    """Tests de la normalisation des requêtes"""
+
+    def test_values_and_in_lists_are_collapsed(self):
+        """Littéraux et listes IN disparaissent, les identifiants numérotés restent"""
+        statement = "SELECT count_1 FROM \"User\"\nWHERE \"ID\" IN (?, ?, ?) AND \"Name\" = 'O''Brien' LIMIT 10"
+        assert normalize_sql(statement) == "SELECT count_1 FROM \"User\" WHERE \"ID\" IN (?, ...) AND \"Name\" = ? LIMIT ?"
+
+
+@pytest.mark.integration
+class TestQueryStats:
+    """Tests de l'instrumentation SQL par requête"""
+
+    def test_server_timing_counts_the_request_queries(self, client, created_emprunt, auth_headers, statements):
+        """L'en-tête Server-Timing annonce le nombre de requêtes réellement émises"""
+        before = len(statements)
+        response = client.get("/messages/conversations", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        timing = response.headers["Server-Timing"]
+        assert f'desc="{len(statements) - before} queries"' in timing
+        assert "db-slowest;dur=" in timing and "app;dur=" in timing
+
+    def test_slow_queries_are_logged_with_their_plan(self, client, created_livre, log_every_query):
+        """Au-delà du seuil : SQL normalisé et plan d'exécution, une seule fois par requête"""
+        client.get(f"/livres/{created_livre.id}")
+        client.get(f"/livres/{created_livre.id}?fields=nom")
+
+        entries = [entry for entry in log_every_query.recent() if 'FROM "Livre"' in entry["sql"]]
+        assert entries and all("?" in entry["sql"] for entry in entries)
+        assert any(entry["plan"] and "Livre" in " ".join(entry["plan"]) for entry in entries)
@@ -0,0 +1,130 @@
+import pytest
+from fastapi import status
+from sqlalchemy import event
+from models import BibliothequePersonnelle
+import response_cache as response_cache_module
+from response_cache import ResponseCache, response_cache
+
+
+@pytest.fixture
+def statements(db_session):
+    """Enregistre les requêtes SQL émises pendant le test"""
+    captured = []
+
+    def listener(conn, cursor, statement, *args):
+        captured.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    yield captured
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+@pytest.mark.integration
+class TestResponseCache:
+    """Tests du cache de réponses invalidé par tags"""
+
+    def test_second_read_is_served_from_cache(self, client, created_livre, statements):
+        """La deuxième lecture ne touche plus la base"""
+        first = client.get(f"/livres/{created_livre.id}")
+        before = len(statements)
+        second = client.get(f"/livres/{created_livre.id}")
+
+        assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+        assert second.json() == first.json()
+        assert len(statements) == before
+
+    def test_update_purges_detail_and_list(self, client, created_livre, auth_headers):
+        """Modifier un livre purge sa fiche et les pages du catalogue"""
+        client.get(f"/livres/{created_livre.id}")
+        client.get("/livres/")
+
+        client.put(f"/livres/{created_livre.id}", json={"nom": "Nouveau titre"}, headers=auth_headers)
+
+        detail = client.get(f"/livres/{created_livre.id}")
+        listing = client.get("/livres/")
+        assert detail.headers["x-cache"] == "MISS" and detail.json()["nom"] == "Nouveau titre"
+        assert listing.json()["items"][0]["nom"] == "Nouveau titre"
+
+    def test_library_write_purges_only_its_owner(self, client, db_session, created_user, created_premium_user, auth_headers):
+        """Un ajout invalide la bibliothèque de son propriétaire, pas celle des autres"""
+        client.get(f"/bibliotheque-personnelle/user/{created_user.id}", headers=auth_headers)
+        client.get(f"/bibliotheque-personnelle/user/{created_premium_user.id}", headers=auth_headers)
+
+        db_session.add(BibliothequePersonnelle(user_id=created_user.id, title="Dune", authors=["Frank Herbert"]))
+        db_session.commit()
+
+        mine = client.get(f"/bibliotheque-personnelle/user/{created_user.id}", headers=auth_headers)
+        other = client.get(f"/bibliotheque-personnelle/user/{created_premium_user.id}", headers=auth_headers)
+        assert mine.headers["x-cache"] == "MISS" and mine.json()["total"] == 1
+        assert other.headers["x-cache"] == "HIT"
+
+    def test_profile_is_purged_on_user_update(self, client, created_user, auth_headers):
+        """Le profil suit les modifications de l'utilisateur"""
+        client.get(f"/users/profile/{created_user.id}", headers=auth_headers)
+        client.put("/users/me", json={"name": "Jean"}, headers=auth_headers)
+
+        profile = client.get(f"/users/profile/{created_user.id}", headers=auth_headers)
+        assert profile.headers["x-cache"] == "MISS" and profile.json()["name"] == "Jean"
+
+    def test_errors_are_not_cached(self, client, db_session):
+        """Une 404 n'est pas mise en cache"""
+        assert client.get("/livres/999").status_code == status.HTTP_404_NOT_FOUND
+        assert response_cache.stats()["entries"] == 0
+
+
+class TestResponseCacheBounds:
+    """Tests des bornes LRU et des métriques"""
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Au-delà du nombre d'entrées, la moins récemment lue est évincée"""
+        cache = ResponseCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, b"{}", ["t"], {"t": 0})
+        cache.get("a")
+        cache.set("c", b"{}", ["t"], {"t": 0})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"{}"
+        assert cache.stats()["evictions"] == 1
+
+    def test_byte_bound_and_hit_rate(self):
+        """La taille totale est bornée et le taux de succès est suivi"""
+        cache = ResponseCache(max_bytes=10, max_entry_bytes=8)
+        cache.set("a", b"x" * 6, ["t"], {"t": 0})
+        cache.set("b", b"x" * 6, ["t"], {"t": 0})
+        cache.set("trop-gros", b"x" * 9, ["t"], {"t": 0})
+
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+        stats = cache.stats()
+        assert stats["bytes"] == 6 and stats["entries"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_version_check_runs_outside_the_lock(self, monkeypatch):
+        """La lecture des versions (entrée/sortie sous SQLite ou Redis) ne bloque pas les autres lectures"""
+        cache = ResponseCache()
+        cache.set("a", b"{}", ["t"], {"t": 0})
+        locked_during_check = []
+
+        def get_version(tag):
+            locked_during_check.append(cache.lock.locked())
+            return 0
+
+        monkeypatch.setattr(response_cache_module, "get_version", get_version)
+
+        assert cache.get("a") == b"{}"
+        assert locked_during_check == [False]
+
+    def test_entry_replaced_during_check_is_kept(self, monkeypatch):
+        """Une entrée réécrite pendant la vérification d'une version caduque n'est pas supprimée"""
+        cache = ResponseCache()
+        cache.set("a", b"ancien", ["t"], {"t": 0})
+
+        def get_version(tag):
+            cache.set("a", b"nouveau", ["t"], {"t": 1})
+            return 1
+
+        monkeypatch.setattr(response_cache_module, "get_version", get_version)
+
+        assert cache.get("a") is None
+        assert cache.entries["a"].body == b"nouveau"
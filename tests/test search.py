@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import status
+from models import Livre
+import search
+from cache import VersionedIndex
+from search import SearchIndex, get_backend, search_index
+
+
+@pytest.fixture(autouse=True)
+def reset_search_index():
+    """Repart d'un index vide : la base de test est recréée à chaque test"""
+    search_index.reset()
+    yield
+    search_index.reset()
+
+
+@pytest.fixture
+def catalogue(db_session):
+    """Crée un petit catalogue"""
+    livres = [
+        Livre(nom="Le Petit Prince", auteur="Antoine de Saint-Exupéry", genre="Conte"),
+        Livre(nom="Vol de nuit", auteur="Antoine de Saint-Exupéry", genre="Roman"),
+        Livre(nom="Les Misérables", auteur="Victor Hugo", genre="Roman"),
+        Livre(nom="Notre-Dame de Paris", auteur="Victor Hugo", genre="Roman"),
+        Livre(nom="Le Prince", auteur="Machiavel", genre="Essai"),
+    ]
+    db_session.add_all(livres)
+    db_session.commit()
+    return livres
+
+
+@pytest.mark.integration
+class TestSearchRoute:
+    """Tests de la recherche plein texte du catalogue"""
+
+    def test_accents_and_prefix(self, client, catalogue):
+        """La recherche ignore les accents et accepte les débuts de mots"""
+        response = client.get("/livres/search?q=miserab")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [livre["nom"] for livre in response.json()["items"]] == ["Les Misérables"]
+
+    def test_title_ranks_before_author(self, client, catalogue):
+        """Un mot du titre pèse plus lourd qu'un mot de l'auteur ou du genre"""
+        response = client.get("/livres/search?q=prince")
+
+        noms = [livre["nom"] for livre in response.json()["items"]]
+        assert noms[0] == "Le Prince"
+        assert set(noms) == {"Le Prince", "Le Petit Prince"}
+
+    def test_pagination(self, client, catalogue):
+        """Les résultats sont paginés avec le total"""
+        response = client.get("/livres/search?q=roman&page=2&page_size=2")
+
+        data = response.json()
+        assert data["total"] == 3
+        assert data["total_pages"] == 2
+        assert len(data["items"]) == 1
+
+    def test_index_follows_updates(self, client, db_session, catalogue):
+        """Les modifications du catalogue sont visibles immédiatement"""
+        catalogue[4].nom = "Discours de la servitude"
+        db_session.commit()
+        db_session.delete(catalogue[2])
+        db_session.commit()
+
+        assert client.get("/livres/search?q=servitude").json()["total"] == 1
+        assert client.get("/livres/search?q=miserables").json()["total"] == 0
+
+    def test_legacy_route(self, client, catalogue):
+        """L'ancienne route /search/{query} passe par le même moteur"""
+        response = client.get("/livres/search/hugo")
+
+        assert len(response.json()) == 2
+
+
+@pytest.mark.integration
+class TestMemorySearchIndex:
+    """Tests de l'index inversé utilisé sans FTS5 ni FULLTEXT"""
+
+    def test_matches_fts_results(self, db_session, catalogue):
+        """L'index en mémoire applique les mêmes règles que la base"""
+        index = SearchIndex()
+        index.ensure_loaded(db_session)
+
+        ids, total = index.search(["saint", "exu"], 0, 10)
+        assert total == 2
+        ids, total = index.search(["prince"], 0, 10)
+        assert ids[0] == catalogue[4].id
+
+    def test_incomplete_index_fails_when_built(self):
+        """Un index qui n'implémente pas load échoue à la construction, pas au premier appel"""
+        class WithoutLoad(VersionedIndex):
+            def reset(self):
+                self.version = None
+
+            def apply_change(self, change):
+                pass
+
+        with pytest.raises(TypeError):
+            WithoutLoad()
+
+    def test_commit_hook_keeps_index_in_sync(self, db_session, catalogue):
+        """Les commits sont appliqués à l'index déjà chargé"""
+        search_index.ensure_loaded(db_session)
+        db_session.add(Livre(nom="Les Contemplations", auteur="Victor Hugo", genre="Poésie"))
+        db_session.commit()
+
+        ids, total = search_index.search(["poesie"], 0, 10)
+        assert total == 1
+
+
+class TestBackendSelection:
+    """Tests du choix du moteur de recherche"""
+
+    def test_mysql_without_fulltext_index_uses_memory(self, monkeypatch):
+        """Sans index FULLTEXT vérifié, MySQL passe par l'index en mémoire au lieu d'échouer"""
+        engine = SimpleNamespace(dialect=SimpleNamespace(name="mysql"), url="mysql+pymysql://app@db/livres")
+        engine.engine = engine
+        db = SimpleNamespace(get_bind=lambda: engine)
+        monkeypatch.setattr(search, "_fulltext_available", {})
+
+        assert get_backend(db) == "memory"
+
+        search._fulltext_available[str(engine.url)] = True
+        assert get_backend(db) == "fulltext"
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from fastapi import HTTPException
+from singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests du regroupement des calculs identiques concurrents"""
+
+    def test_concurrent_callers_share_one_execution(self):
+        """Huit appels simultanés, un seul calcul"""
+        flight = SingleFlight()
+        executions = []
+        started = threading.Event()
+
+        def compute():
+            executions.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {"total": 42}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("profil:1", compute)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do("profil:1", compute))) for _ in range(7)]
+        for thread in followers:
+            thread.start()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        assert len(executions) == 1
+        assert results == [{"total": 42}] * 8
+        assert flight.stats() == {"executions": 1, "saved_executions": 7, "in_flight": 0}
+
+    def test_errors_reach_every_waiter_and_are_not_kept(self):
+        """Une erreur est propagée aux appels en attente puis oubliée"""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.05)
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do("profil:2", fail)
+            except HTTPException as e:
+                errors.append(e.status_code)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        assert errors == [404, 404]
+        assert flight.do("profil:2", lambda: "ok") == "ok"
+
+    def test_distinct_keys_run_separately(self):
+        """Des clés différentes ne sont pas regroupées"""
+        flight = SingleFlight()
+
+        assert flight.do(("profil:1", 1), lambda: 1) == 1
+        assert flight.do(("profil:1", 2), lambda: 2) == 2
+        assert flight.stats()["executions"] == 2
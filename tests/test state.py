@@ -0,0 +1,242 @@
+import fnmatch
+import socketserver
+import threading
+import time
+
+import pytest
+from fastapi import status
+from state import MemoryBackend, RedisBackend, SQLiteBackend, StateBackend
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Serveur minimal parlant le protocole Redis, pour tester le client sans Redis installé"""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            data = b"$-1\r\n"
+        elif isinstance(value, int):
+            data = b":%d\r\n" % value
+        elif isinstance(value, str):
+            data = b"+" + value.encode() + b"\r\n"
+        elif isinstance(value, list):
+            self.wfile.write(b"*%d\r\n" % len(value))
+            for item in value:
+                self.reply(item)
+            return
+        else:
+            data = b"$%d\r\n%s\r\n" % (len(value), value)
+        self.wfile.write(data)
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name, args = args[0].decode().upper(), args[1:]
+            with server.lock:
+                now = time.time()
+                for key in [k for k, (_, exp) in server.data.items() if exp is not None and exp <= now]:
+                    del server.data[key]
+                server.calls.append(name)
+                result = self.execute(server.data, name, args)
+                if name in server.drop_reply:
+                    # Commande exécutée puis connexion coupée avant la réponse
+                    server.drop_reply.discard(name)
+                    return
+                self.reply(result)
+                if server.close_after_reply:
+                    server.close_after_reply = False
+                    return
+
+    def execute(self, data, name, args):
+        if name in ("PING", "AUTH", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return data.get(args[0], (None,))[0]
+        if name == "GETDEL":
+            return data.pop(args[0], (None,))[0]
+        if name == "DEL":
+            return sum(data.pop(key, None) is not None for key in args)
+        if name == "SET":
+            options = [arg.decode().upper() for arg in args[2:]]
+            if "NX" in options and args[0] in data:
+                return None
+            expires = time.time() + int(options[options.index("PX") + 1]) / 1000 if "PX" in options else None
+            data[args[0]] = (args[1], expires)
+            return "OK"
+        if name == "INCRBY":
+            value, expires = data.get(args[0], (b"0", None))
+            total = int(value) + int(args[1])
+            data[args[0]] = (str(total).encode(), expires)
+            return total
+        if name == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode()
+            return [b"0", [key for key in data if fnmatch.fnmatchcase(key.decode(), pattern)]]
+        raise AssertionError(f"Commande non prise en charge : {name}")
+
+
+@pytest.fixture
+def fake_redis():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.data, server.lock = {}, threading.Lock()
+    server.calls, server.drop_reply, server.close_after_reply = [], set(), False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "state.db"))
+    server = request.getfixturevalue("fake_redis")
+    return RedisBackend(*server.server_address, db=1, password="secret")
+
+
+class TestStateBackends:
+    """Tests communs aux trois implémentations de l'état partagé"""
+
+    def test_values_round_trip_as_json(self, backend):
+        """Les valeurs sont relues telles qu'écrites"""
+        backend.set("token", {"user_id": 3, "expires_at": 12.5})
+
+        assert backend.get("token") == {"user_id": 3, "expires_at": 12.5}
+        assert backend.get("absent") is None
+
+    def test_ttl_expires_keys(self, backend):
+        """Une clé expirée n'est plus lue, et add peut la recréer"""
+        backend.set("court", 1, ttl=0.05)
+        backend.set("long", 2, ttl=60)
+        time.sleep(0.1)
+
+        assert backend.get("court") is None
+        assert backend.get("long") == 2
+        assert backend.add("court", 3) is True
+        assert backend.add("court", 4) is False
+        assert backend.get("court") == 3
+
+    def test_pop_hands_the_value_to_a_single_caller(self, backend):
+        """Lecture et suppression atomiques : un seul thread obtient la valeur"""
+        backend.set("token", "valeur")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(backend.pop("token"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(results, key=str) == [None] * 7 + ["valeur"]
+
+    def test_counters_and_prefix_clear(self, backend):
+        """Les compteurs sont incrémentés sans perte et clear respecte le préfixe"""
+        threads = [threading.Thread(target=lambda: [backend.incr("version:a") for _ in range(25)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        backend.set("total:a", 7)
+
+        assert backend.get("version:a") == 100
+        backend.clear("total:")
+        assert backend.get("total:a") is None and backend.get("version:a") == 100
+
+    def test_sweep_removes_expired_rows(self, tmp_path):
+        """Le nettoyage supprime les clés expirées des implémentations locales"""
+        for backend in (MemoryBackend(), SQLiteBackend(str(tmp_path / "state.db"))):
+            backend.set("a", 1, ttl=0.01)
+            backend.set("b", 2)
+            time.sleep(0.05)
+            assert backend.sweep() == 1
+            assert backend.get("b") == 2
+
+    def test_incomplete_backend_fails_when_built(self):
+        """Un backend qui n'implémente pas toutes les opérations échoue dès sa construction"""
+        class WithoutPop(StateBackend):
+            def get(self, key):
+                return None
+
+            def set(self, key, value, ttl=None):
+                pass
+
+            def add(self, key, value, ttl=None):
+                return True
+
+            def delete(self, key):
+                pass
+
+            def incr(self, key, amount=1, ttl=None):
+                return amount
+
+            def clear(self, prefix=""):
+                pass
+
+        with pytest.raises(TypeError):
+            WithoutPop()
+
+    def test_workers_share_a_sqlite_file(self, tmp_path):
+        """Deux connexions au même fichier voient les mêmes clés"""
+        path = str(tmp_path / "state.db")
+        first, second = SQLiteBackend(path), SQLiteBackend(path)
+        first.set("token", "x", ttl=60)
+
+        assert second.pop("token") == "x"
+        assert first.get("token") is None
+
+
+class TestRedisReconnection:
+    """Tests de la reconnexion du client Redis"""
+
+    def test_reconnects_after_server_closed_idle_connection(self, fake_redis):
+        """Une connexion fermée par le serveur entre deux commandes est rouverte sans erreur"""
+        backend = RedisBackend(*fake_redis.server_address)
+        fake_redis.close_after_reply = True
+        backend.set("a", 1)
+        time.sleep(0.05)
+
+        assert backend.get("a") == 1
+
+    def test_sent_command_is_not_resent(self, fake_redis):
+        """Une commande partie avant la coupure n'est pas rejouée : le jeton n'est consommé qu'une fois"""
+        backend = RedisBackend(*fake_redis.server_address)
+        backend.set("token", "valeur")
+        backend.set("version:a", 1)
+        fake_redis.drop_reply.update({"GETDEL", "INCRBY"})
+
+        with pytest.raises(ConnectionError):
+            backend.pop("token")
+        with pytest.raises(ConnectionError):
+            backend.incr("version:a")
+
+        assert fake_redis.calls.count("GETDEL") == 1 and fake_redis.calls.count("INCRBY") == 1
+        assert backend.get("version:a") == 2
+
+
+@pytest.mark.integration
+class TestPaymentTokens:
+    """Tests des tokens de paiement stockés dans l'état partagé"""
+
+    def test_token_can_only_be_used_once(self, client, created_user, auth_headers):
+        """Un token consommé n'est plus accepté"""
+        token = client.post("/users/request-payment-token", headers=auth_headers).json()["payment_token"]
+
+        first = client.post("/users/upgrade-premium", json={"payment_token": token}, headers=auth_headers)
+        second = client.post("/users/upgrade-premium", json={"payment_token": token}, headers=auth_headers)
+
+        assert first.status_code == status.HTTP_200_OK and first.json()["role"] == "Riche"
+        assert second.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from models import User, BibliothequePersonnelle
+from schemas import User as UserSchema
+from streaming import stream_json_list
+
+
+@pytest.mark.integration
+class TestStreamingResponses:
+    """Tests des réponses JSON encodées en flux"""
+
+    def test_streamed_page_matches_regular_page(self, client, db_session, created_user, auth_headers):
+        """stream=true renvoie exactement le même JSON que la réponse classique"""
+        for i in range(7):
+            db_session.add(BibliothequePersonnelle(user_id=created_user.id, title=f"Livre {i}", authors=["Auteur"]))
+        db_session.commit()
+
+        regular = client.get("/bibliotheque-personnelle/me?page=2&page_size=3", headers=auth_headers)
+        streamed = client.get("/bibliotheque-personnelle/me?page=2&page_size=3&stream=true", headers=auth_headers)
+
+        assert streamed.status_code == status.HTTP_200_OK
+        assert streamed.headers["content-type"] == "application/json"
+        assert streamed.json() == regular.json()
+
+    def test_admin_lists_are_streamed(self, client, db_session, created_user, created_admin_user, admin_auth_headers):
+        """Les listes d'administration restent des tableaux JSON valides"""
+        created_user.signalement = 3
+        db_session.commit()
+
+        users = client.get("/users/", headers=admin_auth_headers).json()
+        report = client.get("/users/admin/users-report", headers=admin_auth_headers).json()
+
+        assert [user["id"] for user in users] == [created_user.id, created_admin_user.id]
+        assert report[0]["email"] == created_user.email and report[0]["signalement"] == 3
+        assert "mdp" not in report[0]
+
+    def test_batches_are_flushed_incrementally(self, db_session, created_user):
+        """Les lignes sont envoyées par lots, sans attendre la fin de la requête"""
+        for i in range(4):
+            db_session.add(User(name=f"U{i}", surname="S", email=f"u{i}@test.com", mdp="x", age=30, villes="Lyon", role="Pauvre"))
+        db_session.commit()
+
+        response = stream_json_list(db_session.query(User).order_by(User.id), UserSchema, batch_size=2)
+        chunks = []
+
+        async def collect():
+            async for chunk in response.body_iterator:
+                chunks.append(chunk)
+
+        asyncio.run(collect())
+
+        assert len(chunks) == 5  # "[", trois lots de deux utilisateurs au plus, "]"
+        assert b"".join(chunks).count(b'"email"') == 5
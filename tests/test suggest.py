@@ -0,0 +1,76 @@
+import pytest
+from fastapi import status
+from models import Livre, BibliothequePersonnelle
+from suggest import SuggestIndex, suggest_index
+
+
+@pytest.fixture(autouse=True)
+def reset_suggest_index():
+    """Repart d'un index vide : la base de test est recréée à chaque test"""
+    suggest_index.reset()
+    yield
+    suggest_index.reset()
+
+
+@pytest.mark.integration
+class TestSuggestRoute:
+    """Tests de l'autocomplétion du catalogue"""
+
+    def test_prefix_completion_ranked_by_owners(self, client, db_session, created_user, created_premium_user):
+        """Les titres les plus possédés sont proposés en premier"""
+        db_session.add(Livre(nom="Le Petit Prince", auteur="Antoine de Saint-Exupéry", genre="Conte"))
+        db_session.add(Livre(nom="Le Père Goriot", auteur="Honoré de Balzac", genre="Roman"))
+        for user in (created_user, created_premium_user):
+            db_session.add(BibliothequePersonnelle(user_id=user.id, title="Le Petit Prince", authors=["Antoine de Saint-Exupéry"]))
+        db_session.commit()
+
+        response = client.get("/livres/suggest?q=le p")
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data[0] == {"text": "Le Petit Prince", "type": "title", "count": 3}
+        assert data[1]["text"] == "Le Père Goriot"
+
+    def test_matches_without_article_and_author_surname(self, client, db_session):
+        """Un titre se complète sans son article, un auteur depuis son nom"""
+        db_session.add(Livre(nom="Les Misérables", auteur="Victor Hugo", genre="Roman"))
+        db_session.commit()
+
+        assert client.get("/livres/suggest?q=miser").json()[0]["text"] == "Les Misérables"
+        assert client.get("/livres/suggest?q=hug").json()[0] == {"text": "Victor Hugo", "type": "author", "count": 1}
+
+    def test_index_follows_deletes(self, client, db_session, created_user):
+        """Un titre retiré de toutes les bibliothèques n'est plus proposé"""
+        book = BibliothequePersonnelle(user_id=created_user.id, title="Dune")
+        db_session.add(book)
+        db_session.commit()
+        assert client.get("/livres/suggest?q=dun").json()
+
+        db_session.delete(book)
+        db_session.commit()
+
+        assert client.get("/livres/suggest?q=dun").json() == []
+
+
+@pytest.mark.unit
+class TestSuggestRankingCache:
+    """Tests du cache de classement des préfixes fréquents"""
+
+    def test_cached_prefix_follows_weight_changes(self, monkeypatch):
+        """Le classement mis en cache reste exact après ajouts et retraits"""
+        monkeypatch.setattr("suggest.SCAN_LIMIT", 5)
+        index = SuggestIndex()
+        index.version = 0
+        for row_id in range(30):
+            index.add_row("perso", row_id, f"Livre {row_id:02d}", None)
+        assert index.suggest("livre", limit=1)[0]["text"] == "Livre 00"
+        assert "livre" in index.top
+
+        index.add_row("perso", 100, "Livre 29", None)
+        index.add_row("perso", 101, "Livre 29", None)
+        assert index.suggest("livre", limit=1) == [{"text": "Livre 29", "type": "title", "count": 3}]
+
+        index.remove_row("perso", 100)
+        index.remove_row("perso", 101)
+        index.remove_row("perso", 29)
+        assert [s["text"] for s in index.suggest("livre", limit=3)] == ["Livre 00", "Livre 01", "Livre 02"]
@@ -0,0 +1,71 @@
+import pytest
+from fastapi import status
+from models import User, BibliothequePersonnelle
+from trigram_index import trigram_index, trigrams
+
+
+@pytest.fixture(autouse=True)
+def reset_trigram_index():
+    """Repart d'un index vide : la base de test est recréée à chaque test"""
+    trigram_index.reset()
+    yield
+    trigram_index.reset()
+
+
+def add_owner(db_session, email, title):
+    user = User(name=email.split("@")[0], surname="Owner", email=email, mdp="x", villes="Lyon", age=30, role="Pauvre")
+    db_session.add(user)
+    db_session.flush()
+    book = BibliothequePersonnelle(user_id=user.id, title=title, source="ai_detection")
+    db_session.add(book)
+    db_session.commit()
+    return user, book
+
+
+@pytest.mark.unit
+class TestTrigrams:
+    """Tests du découpage en trigrammes"""
+
+    def test_trigrams_are_accent_and_case_insensitive(self):
+        """Les trigrammes sont calculés sur le texte normalisé"""
+        assert trigrams("Étoile") == trigrams("etoile")
+        assert "  e" in trigrams("Étoile")
+        assert "le " in trigrams("Étoile")
+
+
+@pytest.mark.integration
+class TestSimilarTitles:
+    """Tests de la recherche de titres proches"""
+
+    def test_finds_owners_despite_typos(self, client, db_session, created_user, auth_headers):
+        """Une faute de frappe ou d'OCR retrouve quand même le livre"""
+        owner, _ = add_owner(db_session, "alice@test.com", "Le Petit Prince")
+        add_owner(db_session, "bob@test.com", "Les Misérables")
+
+        response = client.get("/bibliotheque-personnelle/similar?title=le petit prnce", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [match["title"] for match in data] == ["Le Petit Prince"]
+        assert data[0]["owners"][0]["ID"] == owner.id
+        assert 0.3 <= data[0]["similarity"] < 1
+
+    def test_current_user_is_not_listed(self, client, db_session, created_user, auth_headers):
+        """L'utilisateur ne se voit pas parmi les propriétaires"""
+        db_session.add(BibliothequePersonnelle(user_id=created_user.id, title="Le Petit Prince"))
+        db_session.commit()
+
+        data = client.get("/bibliotheque-personnelle/similar?title=petit prince", headers=auth_headers).json()
+
+        assert data[0]["owner_count"] == 1
+        assert data[0]["owners"] == []
+
+    def test_index_follows_deletes(self, client, db_session, created_user, auth_headers):
+        """Un titre supprimé de toutes les bibliothèques disparaît des résultats"""
+        _, book = add_owner(db_session, "alice@test.com", "Vingt mille lieues sous les mers")
+        assert client.get("/bibliotheque-personnelle/similar?title=vingt mile lieux", headers=auth_headers).json()
+
+        db_session.delete(book)
+        db_session.commit()
+
+        assert client.get("/bibliotheque-personnelle/similar?title=vingt mile lieux", headers=auth_headers).json() == []